@@ -7,7 +7,8 @@ happen in parallel.
 
 The test performs read queries similar to query_dc_benchmark.py, using the same
 query types and weights. Sample data (node_ids, workload_ids, entity_keys) is
-pre-loaded globally once when the test starts.
+loaded once by the master when the test starts and broadcast to all workers
+(see stress.tools.sample_data).
 
 Write operations generate nodes and workloads using the same logic as append_dc_data.py
 and send them to the op-geth-simulator's POST /entities endpoint.
@@ -16,29 +17,24 @@ Usage:
     locust -f locust/dc_read_and_write.py --host=http://localhost:3000
 """
 
+import logging
 import os
 import random
+import socket
 import sys
 import time
+from datetime import timedelta
 from itertools import islice
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Mapping, Optional
 
-import web3
 from web3.types import TxParams
 from arkiv import Arkiv
 from arkiv.account import NamedAccount
 from arkiv.types import Operations
-try:
-    from arkiv.types import ATTRIBUTES, KEY
-    _QUERY_FIELDS = KEY | ATTRIBUTES
-except Exception:
-    from arkiv.types import KEY
-
-    _QUERY_FIELDS = KEY
-from arkiv.utils import to_create_op, to_query_options, to_tx_params
-from arkiv.types import Operations, TxHash, HexStr
-from eth_account import Account
+from arkiv.types import KEY
+from arkiv.utils import to_create_op, to_query_options, to_receipt, to_tx_params
+from arkiv.types import Operations, TxHash, HexStr, CREATED_AT
 from eth_account.signers.local import LocalAccount
 from locust import constant, events, task
 from web3 import Web3
@@ -50,31 +46,29 @@ if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
 import stress.tools.config as config
+from stress.tools.account_registry import AccountRegistry
+from stress.tools.fan_out import run_fan_out
 from stress.tools.json_rpc_user import JsonRpcUser
-from stress.tools.utils import build_account_path
+from stress.tools.metrics import Metrics
+from stress.tools.query_grammar import QueryGrammar
+from stress.tools.sample_data import GlobalSampleData
+from stress.tools.shadow_index import OracleResult, ShadowIndex
 
 # Add parent directory to path (kept for backwards compat)
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
 from stress.tools.dc_data import (
-    NODE,
-    WORKLOAD,
-    NodeEntity,
-    WorkloadEntity,
     create_node,
     create_workload,
+    node_to_arkiv_attributes,
+    workload_to_arkiv_attributes,
 )
 
-Account.enable_unaudited_hdwallet_features()
-
 
 # =============================================================================
 # Configuration
 # =============================================================================
 
-# Logging level: DEBUG, INFO, WARNING, ERROR, or NONE (to disable all debug logs)
-LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG").upper()
-
 # Read/Write task ratio (0.0 to 1.0, where 1.0 = 100% reads)
 # Default: 0.6 means 60% reads, 40% writes
 READ_WRITE_RATIO = float(os.getenv("READ_WRITE_RATIO", "0.8"))
@@ -89,10 +83,6 @@ QUERY_MIX = {
     "workload_specific": 0.15, # 15% - Find pending workloads with filters
 }
 
-# Sample sizes for pre-loading IDs
-SAMPLE_SIZE_IDS = 1000
-SAMPLE_SIZE_KEYS = 1000
-
 # Regions and VM types for filter queries
 REGIONS = ["eu-west", "us-east", "asia-pac"]
 VM_TYPES = ["cpu", "gpu", "gpu_large"]
@@ -100,6 +90,30 @@ VM_TYPES = ["cpu", "gpu", "gpu_large"]
 # Default result set limits
 DEFAULT_NODE_LIMIT = 100
 DEFAULT_WORKLOAD_LIMIT = 100
+DEFAULT_GRAMMAR_LIMIT = 100
+
+# Grammar-generated queries (see stress.tools.query_grammar). Weight 0 disables them.
+# The weight is in percent of the read mix, as in dc_read_only (where the read
+# tasks sum to 100), so the same value gives grammar queries the same share of reads.
+GRAMMAR_QUERY_WEIGHT = int(os.getenv("DC_W_GRAMMAR_QUERY", "0"))
+GRAMMAR_QUERY_SHARE = GRAMMAR_QUERY_WEIGHT / 100  # on the scale of QUERY_MIX
+GRAMMAR_MAX_DEPTH = int(os.getenv("DC_GRAMMAR_MAX_DEPTH", "1"))
+GRAMMAR_MAX_TERMS = int(os.getenv("DC_GRAMMAR_MAX_TERMS", "3"))
+
+# Fan-out mode: a user fires DC_FAN_OUT_SIZE queries from QUERY_MIX at once
+# (see stress.tools.fan_out). Weight 0 disables it. In percent of the read mix, like
+# the grammar query weight.
+FAN_OUT_WEIGHT = int(os.getenv("DC_W_FAN_OUT", "0"))
+FAN_OUT_SHARE = FAN_OUT_WEIGHT / 100  # on the scale of QUERY_MIX
+FAN_OUT_SIZE = int(os.getenv("DC_FAN_OUT_SIZE", "20"))
+# Connections per user shared by concurrent queries (locust's default is 10)
+FAN_OUT_CONNECTIONS = int(os.getenv("DC_FAN_OUT_CONNECTIONS", "10"))
+
+# Fraction of grammar queries verified against the worker's shadow index of written
+# entities (see stress.tools.shadow_index). 0 disables the oracle and the index.
+ORACLE_SAMPLE_RATE = float(os.getenv("DC_ORACLE_SAMPLE_RATE", "0.05"))
+# Writers only maintain the index when grammar queries run and some get verified
+SHADOW_INDEX_ENABLED = ORACLE_SAMPLE_RATE > 0 and GRAMMAR_QUERY_WEIGHT > 0
 
 # Write operation configuration
 DEFAULT_CREATOR_ADDRESS = "0x0000000000000000000000000000000000dc0001"
@@ -111,143 +125,6 @@ DEFAULT_BLOCK_DURATION_SECONDS = 2
 MAX_RESULTS_PER_PAGE: int = 1_000_000_000
 
 
-# =============================================================================
-# Logging Helper
-# =============================================================================
-
-def debug_log(message: str) -> None:
-    """Print debug message if LOG_LEVEL is DEBUG."""
-    if LOG_LEVEL == "DEBUG":
-        print(message)
-
-
-# =============================================================================
-# Global Sample Data (loaded once at test start)
-# =============================================================================
-
-class GlobalSampleData:
-    """Global sample data loaded once at test start."""
-    
-    node_ids: List[str] = []
-    workload_ids: List[str] = []
-    entity_keys: List[str] = []  # Stored as hex strings for API
-    initialized: bool = False
-    
-    @classmethod
-    def load_from_arkiv(cls, w3: Arkiv) -> None:
-        """Load sample data by querying Arkiv (no local DB dependency)."""
-        if cls.initialized:
-            return
-
-        # Query nodes and workloads and extract their ids from attributes.
-        try:
-            node_iter = w3.arkiv.query_entities(
-                query='type="node"',
-                options=to_query_options(
-                    fields=_QUERY_FIELDS, max_results_per_page=MAX_RESULTS_PER_PAGE
-                ),
-            )
-            for entity in islice(node_iter, SAMPLE_SIZE_IDS):
-                key = getattr(entity, "key", None)
-                if key:
-                    cls.entity_keys.append(str(key))
-                attrs = getattr(entity, "attributes", {}) or {}
-                node_id = attrs.get("node_id")
-                if node_id:
-                    cls.node_ids.append(str(node_id))
-        except Exception as e:
-            print(f"Error loading node samples from Arkiv: {e}")
-
-        try:
-            workload_iter = w3.arkiv.query_entities(
-                query='type="workload"',
-                options=to_query_options(
-                    fields=_QUERY_FIELDS, max_results_per_page=MAX_RESULTS_PER_PAGE
-                ),
-            )
-            for entity in islice(workload_iter, SAMPLE_SIZE_IDS):
-                key = getattr(entity, "key", None)
-                if key:
-                    cls.entity_keys.append(str(key))
-                attrs = getattr(entity, "attributes", {}) or {}
-                workload_id = attrs.get("workload_id")
-                if workload_id:
-                    cls.workload_ids.append(str(workload_id))
-        except Exception as e:
-            print(f"Error loading workload samples from Arkiv: {e}")
-
-        # Keep only a small set of keys for point lookups (but ensure at least 1 if available)
-        if cls.entity_keys:
-            random.shuffle(cls.entity_keys)
-            cls.entity_keys = cls.entity_keys[: max(1, min(SAMPLE_SIZE_KEYS, len(cls.entity_keys)))]
-
-        print(
-            f"Loaded {len(cls.node_ids)} node IDs, {len(cls.workload_ids)} workload IDs, "
-            f"{len(cls.entity_keys)} entity keys from Arkiv"
-        )
-        cls.initialized = True
-
-
-# =============================================================================
-# Entity Transformation
-# =============================================================================
-
-def node_to_arkiv_attributes(node: NodeEntity, creator_address: str) -> Dict[str, Any]:
-    """
-    Build Arkiv attributes for a NodeEntity.
-
-    Note: we keep the same attribute names as the previous HTTP endpoint payloads.
-    """
-    # String attributes
-    string_annotations = {
-        "dc_id": node.dc_id,
-        "type": NODE,
-        "node_id": node.node_id,
-        "region": node.region,
-        "status": node.status,
-        "vm_type": node.vm_type,
-    }
-    
-    # Numeric attributes
-    numeric_annotations = {
-        "cpu_count": node.cpu_count,
-        "ram_gb": node.ram_gb,
-        "price_hour": node.price_hour,
-        "avail_hours": node.avail_hours,
-    }
-
-    return {**string_annotations, **numeric_annotations}
-
-
-def workload_to_arkiv_attributes(
-    workload: WorkloadEntity, creator_address: str
-) -> Dict[str, Any]:
-    """
-    Build Arkiv attributes for a WorkloadEntity.
-
-    Note: we keep the same attribute names as the previous HTTP endpoint payloads.
-    """
-    # String attributes
-    string_annotations = {
-        "dc_id": workload.dc_id,
-        "type": WORKLOAD,
-        "workload_id": workload.workload_id,
-        "status": workload.status,
-        "assigned_node": workload.assigned_node,
-        "region": workload.region,
-        "vm_type": workload.vm_type,
-    }
-    
-    # Numeric attributes
-    numeric_annotations = {
-        "req_cpu": workload.req_cpu,
-        "req_ram": workload.req_ram,
-        "max_hours": workload.max_hours,
-    }
-
-    return {**string_annotations, **numeric_annotations}
-
-
 # =============================================================================
 # Locust User Class
 # =============================================================================
@@ -260,6 +137,7 @@ class DataCenterReadWriteUser(JsonRpcUser):
     Read tasks are further weighted by QUERY_MIX weights.
     """
     wait_time = constant(1)
+    concurrency = FAN_OUT_CONNECTIONS
     
     # Per-user state for write operations
     node_counter: int = 0
@@ -277,10 +155,9 @@ class DataCenterReadWriteUser(JsonRpcUser):
 
     def _initialize_account_and_w3(self) -> Arkiv:
         if self.account is None or self.w3 is None:
-            account_path = build_account_path(self.id)
-            self.account = Account.from_mnemonic(config.mnemonic, account_path=account_path)
+            self.account = AccountRegistry.get().account(self.id)
             self.w3 = Arkiv(
-                web3.HTTPProvider(endpoint_uri=self.client.base_url, session=self.client),
+                self.rpc_provider(),
                 NamedAccount(name="LocalSigner", account=self.account),
             )
             if not self.w3.is_connected():
@@ -301,11 +178,10 @@ class DataCenterReadWriteUser(JsonRpcUser):
         if self.w3 is None or self.account is None:
             return
         try:
-            accounts = self.w3.eth.accounts
             balance = Web3.from_wei(self.w3.eth.get_balance(self.account.address), "ether")
             if balance < 0.1:
                 tx_hash = self.w3.eth.send_transaction(
-                    {"from": accounts[0], "to": self.account.address, "value": Web3.to_wei(10, "ether")}
+                    {"from": self.w3.eth.accounts[0], "to": self.account.address, "value": Web3.to_wei(10, "ether")}
                 )
                 self.w3.eth.wait_for_transaction_receipt(tx_hash)
         except Exception:
@@ -315,22 +191,38 @@ class DataCenterReadWriteUser(JsonRpcUser):
         return max(1, int(ttl_blocks) * int(self.block_duration_seconds))
 
     def _fire_locust_request(self, name: str, fn) -> Any:
+        start_time = time.time()
         start = time.perf_counter()
         exc: Optional[BaseException] = None
+        result = None
+        # RPC calls made by fn are attributed to this task (unless a task is already set)
+        own_task = "task" not in self.request_context
+        if own_task:
+            self.request_context["task"] = name
         try:
-            return fn()
+            result = fn()
+            return result
         except BaseException as e:
             exc = e
             raise
         finally:
+            context = self.context()
+            if own_task:
+                del self.request_context["task"]
+            if isinstance(result, int):
+                context["result_size"] = result
+            elif isinstance(result, Mapping) and "blockNumber" in result:
+                context["block_number"] = result["blockNumber"]
+                context["gas_used"] = result.get("gasUsed")
             events.request.fire(
                 request_type="arkiv",
                 name=name,
                 response_time=(time.perf_counter() - start) * 1000,
                 response_length=0,
                 exception=exc,
-                context={},
+                context=context,
                 response=None,
+                start_time=start_time,
             )
 
     def _is_not_found(self, e: BaseException) -> bool:
@@ -353,8 +245,7 @@ class DataCenterReadWriteUser(JsonRpcUser):
         w3 = self._initialize_account_and_w3()
 
         # Ensure global data is loaded for read operations
-        if not GlobalSampleData.initialized:
-            GlobalSampleData.load_from_arkiv(w3)
+        GlobalSampleData.ensure_loaded(w3)
         
         # Initialize write operation state
         self.seed = self.id
@@ -441,9 +332,40 @@ class DataCenterReadWriteUser(JsonRpcUser):
         w3 = self._initialize_account_and_w3()
         operations = Operations(creates=create_ops)
         nonce = w3.eth.get_transaction_count(self.account.address)
-        self._fire_locust_request(
-            "write_node_with_workloads", lambda: custom_execute(w3, operations, TxParams(nonce=nonce))
-        )
+        write_fields = {
+            "entity_count": len(create_ops),
+            "payload_bytes": sum(len(op.payload) for op in create_ops),
+        }
+
+        if not SHADOW_INDEX_ENABLED:
+            with self.request_fields(**write_fields):
+                self._fire_locust_request(
+                    "write_node_with_workloads", lambda: custom_execute(w3, operations, TxParams(nonce=nonce))
+                )
+            return
+
+        # Keep the shadow index in sync so sampled queries can be verified
+        shadow = ShadowIndex.get()
+        shadow.begin_write(self.account.address)
+        failed = True
+        try:
+            with self.request_fields(**write_fields):
+                tx_receipt = self._fire_locust_request(
+                    "write_node_with_workloads", lambda: custom_execute(w3, operations, TxParams(nonce=nonce))
+                )
+            receipt = to_receipt(w3.arkiv.contract, tx_receipt["transactionHash"], tx_receipt)
+            for create_op, created in zip(create_ops, receipt.creates):
+                shadow.record_create(
+                    self.account.address,
+                    created.key,
+                    create_op.attributes,
+                    receipt.block_number,
+                    created.expiration_block,
+                )
+            failed = False
+        finally:
+            shadow.end_write(self.account.address, failed=failed)
+        shadow.purge_expired(receipt.block_number)
 
     # =========================================================================
     # Read Tasks
@@ -473,14 +395,14 @@ class DataCenterReadWriteUser(JsonRpcUser):
         if not entity_id:
             return
         
-        debug_log(f"[DEBUG] point_by_id: querying {id_key}={entity_id}")
+        logging.debug("point_by_id: querying %s=%s", id_key, entity_id)
 
         query = f'{id_key}="{entity_id}"'
         try:
             count = self._fire_locust_request("point_by_id", lambda: self._query_count(query))
-            debug_log(f"[DEBUG] point_by_id: SUCCESS - found {count} entities for {id_key}={entity_id}")
+            logging.debug("point_by_id: SUCCESS - found %s entities for %s=%s", count, id_key, entity_id)
         except Exception as e:
-            debug_log(f"[DEBUG] point_by_id: FAILED - error={e}, entity_id={entity_id}")
+            logging.debug("point_by_id: FAILED - error=%s, entity_id=%s", e, entity_id)
             raise
     
     @task(int(READ_WRITE_RATIO * 100 * QUERY_MIX["point_by_key"]))
@@ -494,36 +416,36 @@ class DataCenterReadWriteUser(JsonRpcUser):
         if not entity_key:
             return
         
-        debug_log(f"[DEBUG] point_by_key: querying entity_key={entity_key[:20]}...")
+        logging.debug("point_by_key: querying entity_key=%s...", entity_key[:20])
 
         w3 = self._initialize_account_and_w3()
         try:
             entity = self._fire_locust_request("point_by_key", lambda: w3.arkiv.get_entity(entity_key))
             key = getattr(entity, "key", "unknown")
-            debug_log(f"[DEBUG] point_by_key: SUCCESS - found entity key={str(key)[:20]}...")
+            logging.debug("point_by_key: SUCCESS - found entity key=%s...", str(key)[:20])
         except Exception as e:
             if self._is_not_found(e):
-                debug_log(f"[DEBUG] point_by_key: NOT_FOUND - entity_key={entity_key[:20]}...")
+                logging.debug("point_by_key: NOT_FOUND - entity_key=%s...", entity_key[:20])
                 return
-            debug_log(f"[DEBUG] point_by_key: FAILED - error={e}, entity_key={entity_key[:20]}...")
+            logging.debug("point_by_key: FAILED - error=%s, entity_key=%s...", e, entity_key[:20])
             raise
     
     @task(int(READ_WRITE_RATIO * 100 * QUERY_MIX["point_miss"]))
     def point_miss(self):
         """Lookup non-existent entity (guaranteed miss)."""
         nonexistent_key = "0x0000000000000000000000000000000000000000000000000000000000000001"
-        debug_log(f"[DEBUG] point_miss: querying non-existent entity_key={nonexistent_key[:20]}...")
+        logging.debug("point_miss: querying non-existent entity_key=%s...", nonexistent_key[:20])
         
         w3 = self._initialize_account_and_w3()
         try:
             _ = self._fire_locust_request("point_miss", lambda: w3.arkiv.get_entity(nonexistent_key))
-            debug_log(f"[DEBUG] point_miss: FAILED - unexpectedly found key={nonexistent_key[:20]}...")
+            logging.debug("point_miss: FAILED - unexpectedly found key=%s...", nonexistent_key[:20])
             raise RuntimeError("Expected entity to be missing, but it existed")
         except Exception as e:
             if self._is_not_found(e):
-                debug_log(f"[DEBUG] point_miss: SUCCESS - got expected not-found for key={nonexistent_key[:20]}...")
+                logging.debug("point_miss: SUCCESS - got expected not-found for key=%s...", nonexistent_key[:20])
                 return
-            debug_log(f"[DEBUG] point_miss: FAILED - unexpected error={e} for key={nonexistent_key[:20]}...")
+            logging.debug("point_miss: FAILED - unexpected error=%s for key=%s...", e, nonexistent_key[:20])
             raise
     
     @task(int(READ_WRITE_RATIO * 100 * QUERY_MIX["node_filter"]))
@@ -539,8 +461,10 @@ class DataCenterReadWriteUser(JsonRpcUser):
         min_cpu = rng.choice([4, 8, 16, 32])
         min_ram = rng.choice([16, 32, 64, 128])
         
-        debug_log(f"[DEBUG] node_filter: querying status=available, type=node, region={region}, "
-              f"vm_type={vm_type}, cpu_count>={min_cpu}, ram_gb>={min_ram}")
+        logging.debug(
+            "node_filter: querying status=available, type=node, region=%s, vm_type=%s, cpu_count>=%s, ram_gb>=%s",
+            region, vm_type, min_cpu, min_ram,
+        )
 
         query_str = (
             f'status="available" && type="node" && region="{region}" && vm_type="{vm_type}"'
@@ -550,15 +474,15 @@ class DataCenterReadWriteUser(JsonRpcUser):
             count = self._fire_locust_request(
                 "node_filter", lambda: self._query_count(query_str, limit=DEFAULT_NODE_LIMIT)
             )
-            debug_log(f"[DEBUG] node_filter: SUCCESS - found {count} nodes")
+            logging.debug("node_filter: SUCCESS - found %s nodes", count)
         except Exception as e:
-            debug_log(f"[DEBUG] node_filter: FAILED - error={e}")
+            logging.debug("node_filter: FAILED - error=%s", e)
             raise
     
     @task(int(READ_WRITE_RATIO * 100 * QUERY_MIX["workload_simple"]))
     def workload_simple(self):
         """Find pending workloads (status filter only)."""
-        debug_log(f"[DEBUG] workload_simple: querying status=pending, type=workload")
+        logging.debug("workload_simple: querying status=pending, type=workload")
 
         query_str = 'status="pending" && type="workload"'
         try:
@@ -566,9 +490,9 @@ class DataCenterReadWriteUser(JsonRpcUser):
                 "workload_simple",
                 lambda: self._query_count(query_str, limit=DEFAULT_WORKLOAD_LIMIT),
             )
-            debug_log(f"[DEBUG] workload_simple: SUCCESS - found {count} workloads")
+            logging.debug("workload_simple: SUCCESS - found %s workloads", count)
         except Exception as e:
-            debug_log(f"[DEBUG] workload_simple: FAILED - error={e}")
+            logging.debug("workload_simple: FAILED - error=%s", e)
             raise
     
     @task(int(READ_WRITE_RATIO * 100 * QUERY_MIX["workload_specific"]))
@@ -579,8 +503,10 @@ class DataCenterReadWriteUser(JsonRpcUser):
         region = rng.choice(REGIONS)
         vm_type = rng.choice(VM_TYPES)
         
-        debug_log(f"[DEBUG] workload_specific: querying status=pending, type=workload, "
-              f"region={region}, vm_type={vm_type}")
+        logging.debug(
+            "workload_specific: querying status=pending, type=workload, region=%s, vm_type=%s",
+            region, vm_type,
+        )
 
         query_str = (
             f'status="pending" && type="workload" && region="{region}" && vm_type="{vm_type}"'
@@ -590,10 +516,122 @@ class DataCenterReadWriteUser(JsonRpcUser):
                 "workload_specific",
                 lambda: self._query_count(query_str, limit=DEFAULT_WORKLOAD_LIMIT),
             )
-            debug_log(f"[DEBUG] workload_specific: SUCCESS - found {count} workloads")
+            logging.debug("workload_specific: SUCCESS - found %s workloads", count)
+        except Exception as e:
+            logging.debug("workload_specific: FAILED - error=%s", e)
+            raise
+
+    @task(round(READ_WRITE_RATIO * 100 * FAN_OUT_SHARE))
+    def fan_out(self):
+        """Fire FAN_OUT_SIZE queries from QUERY_MIX concurrently and time the whole batch."""
+        names = random.choices(list(QUERY_MIX), weights=list(QUERY_MIX.values()), k=FAN_OUT_SIZE)
+        with self.request_fields(task="fan_out"):
+            failures = run_fan_out(f"fan_out[{FAN_OUT_SIZE}]", [getattr(self, name) for name in names])
+        logging.debug("fan_out: %s/%s queries succeeded", FAN_OUT_SIZE - failures, FAN_OUT_SIZE)
+
+    @task(round(READ_WRITE_RATIO * 100 * GRAMMAR_QUERY_SHARE))
+    def grammar_query(self):
+        """Run a query generated from the Arkiv query grammar, reported per query shape."""
+        grammar = QueryGrammar(
+            max_depth=GRAMMAR_MAX_DEPTH,
+            max_terms=GRAMMAR_MAX_TERMS,
+            id_pools={"node": GlobalSampleData.node_ids, "workload": GlobalSampleData.workload_ids},
+        )
+        generated = grammar.generate()
+
+        logging.debug("grammar_query: shape=%s, query=%s", generated.shape, generated.query)
+
+        if SHADOW_INDEX_ENABLED and random.random() < ORACLE_SAMPLE_RATE:
+            if self._oracle_check(generated):
+                return
+
+        start = time.perf_counter()
+        try:
+            count = self._fire_locust_request(
+                f"grammar_query[{generated.shape}]",
+                lambda: self._query_count(generated.query, limit=DEFAULT_GRAMMAR_LIMIT),
+            )
+            logging.debug("grammar_query: SUCCESS - found %s entities", count)
         except Exception as e:
-            debug_log(f"[DEBUG] workload_specific: FAILED - error={e}")
+            logging.debug("grammar_query: FAILED - error=%s, query=%s", e, generated.query)
             raise
+        duration = timedelta(seconds=time.perf_counter() - start)
+        Metrics.get_metrics().record_query_shape(generated.shape, duration, count)
+
+    def _oracle_check(self, generated) -> bool:
+        """
+        Run `generated` scoped to one owner tracked by the shadow index and verify the result.
+
+        Returns False if no owner could be checked (the caller then runs the plain query).
+        """
+        shadow = ShadowIndex.get()
+        picked = shadow.pick_owner()
+        if picked is None:
+            return False
+        owner, generation = picked
+
+        w3 = self._initialize_account_and_w3()
+        query = f"$owner = {owner.lower()} && ({generated.query})"
+        options = to_query_options(fields=KEY | CREATED_AT, max_results_per_page=MAX_RESULTS_PER_PAGE)
+
+        start_time = time.time()
+        start = time.perf_counter()
+        try:
+            page = w3.arkiv.query_entities_page(query, options=options)
+            block = page.block_number
+            returned = [(entity.key, entity.created_at_block) for entity in page.entities]
+            while page.has_more():
+                options = to_query_options(
+                    fields=KEY | CREATED_AT,
+                    max_results_per_page=MAX_RESULTS_PER_PAGE,
+                    at_block=block,
+                    cursor=page.cursor,
+                )
+                page = w3.arkiv.query_entities_page(query, options=options)
+                returned.extend((entity.key, entity.created_at_block) for entity in page.entities)
+        except Exception as e:
+            logging.debug("oracle: FAILED - error=%s, query=%s", e, query)
+            self._fire_oracle_request(generated.shape, start_time, (time.perf_counter() - start) * 1000, 0, e)
+            return True
+        response_time = (time.perf_counter() - start) * 1000
+
+        result = shadow.check(owner, generation, generated.expr, block, returned)
+        if result is None:
+            Metrics.get_metrics().record_oracle_check(None)
+            return True
+        Metrics.get_metrics().record_oracle_check(result)
+
+        exception = None
+        if not result.ok:
+            exception = OracleMismatch(generated.query, block, result)
+            logging.warning("oracle: MISMATCH (user: %s) - %s", self.id, exception)
+        self._fire_oracle_request(generated.shape, start_time, response_time, result.returned, exception)
+        return True
+
+    def _fire_oracle_request(
+        self, shape: str, start_time: float, response_time: float, returned: int, exception: Optional[BaseException]
+    ) -> None:
+        events.request.fire(
+            request_type="oracle",
+            name=f"oracle[{shape}]",
+            response_time=response_time,
+            response_length=returned,
+            exception=exception,
+            context=self.context(),
+            response=None,
+            start_time=start_time,
+        )
+
+
+class OracleMismatch(Exception):
+    """Query result differs from the shadow index."""
+
+    def __init__(self, query: str, block: int, result: OracleResult):
+        super().__init__(
+            f"query {query!r} at block {block}: expected {result.expected}, returned {result.returned}, "
+            f"missing {len(result.missing)}, unexpected {len(result.unexpected)}"
+        )
+        self.result = result
 
 
 # =============================================================================
@@ -603,16 +641,30 @@ class DataCenterReadWriteUser(JsonRpcUser):
 @events.test_start.add_listener
 def on_test_start(environment, **kwargs):
     """Load sample data once when test starts."""
+    Metrics.reset_global_metrics()
+    metrics = Metrics.get_metrics()
+    metrics.initialize(instance_id=socket.gethostname())
+    metrics.set_loadtest_status("running")
+
     print("=" * 60)
     print("Initializing read-and-write stress test")
     print("=" * 60)
     print(f"Read/Write ratio: {READ_WRITE_RATIO:.1%} reads, {1.0 - READ_WRITE_RATIO:.1%} writes")
     print(f"Query mix: {QUERY_MIX}")
+    print(f"Grammar query weight: {GRAMMAR_QUERY_WEIGHT}")
+    print(f"Fan-out weight: {FAN_OUT_WEIGHT} (batch size {FAN_OUT_SIZE}, {FAN_OUT_CONNECTIONS} connections per user)")
     print()
-    print("Sample data will be loaded from Arkiv on first user start.")
+    print("Sample data is loaded from Arkiv once and broadcast to all workers.")
     print()
 
 
+@events.test_stop.add_listener
+def on_test_stop(environment, **kwargs):
+    metrics = Metrics.get_metrics()
+    if metrics:
+        metrics.set_loadtest_status("stopped")
+
+
 def custom_execute(w3: Arkiv, operations: Operations, tx_params: TxParams) -> Any:
         tx_params = to_tx_params(operations, tx_params)
 
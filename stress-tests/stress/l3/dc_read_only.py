@@ -3,7 +3,8 @@ Locust stress test for op-geth-simulator read/query endpoints.
 
 This test performs read queries similar to query_dc_benchmark.py, using the same
 query types and weights. Sample data (node_ids, workload_ids, entity_keys) is
-pre-loaded globally once when the test starts.
+loaded once by the master when the test starts and broadcast to all workers
+(see stress.tools.sample_data).
 
 The test uses range queries for numeric annotations (>=, <=, >, <, !=) where
 appropriate, leveraging the extended queryEntities API that supports Arkiv query
@@ -13,28 +14,21 @@ Usage:
     locust -f locust/read_only.py --host=http://localhost:3000
 """
 
+import logging
 import os
 import random
+import socket
 import sys
 import time
+from datetime import timedelta
 from itertools import islice
 from pathlib import Path
-from typing import Any, List, Optional
+from typing import Any, Mapping, Optional
 
-import web3
 from arkiv import Arkiv
 from arkiv.account import NamedAccount
-try:
-    from arkiv.types import ATTRIBUTES, KEY
-    _QUERY_FIELDS = KEY | ATTRIBUTES
-except Exception:
-    # Older SDKs may not expose ATTRIBUTES. Reads may still work, but sampling ids
-    # from attributes will be limited.
-    from arkiv.types import KEY
-
-    _QUERY_FIELDS = KEY
+from arkiv.types import KEY
 from arkiv.utils import to_query_options
-from eth_account import Account
 from eth_account.signers.local import LocalAccount
 from locust import constant, events, task
 
@@ -44,23 +38,21 @@ project_root = file_dir.parent.parent  # l3/ -> stress/ -> stress-tests/
 if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
-import stress.tools.config as config
+from stress.tools.account_registry import AccountRegistry
+from stress.tools.fan_out import run_fan_out
 from stress.tools.json_rpc_user import JsonRpcUser
-from stress.tools.utils import build_account_path
+from stress.tools.metrics import Metrics
+from stress.tools.query_grammar import QueryGrammar
+from stress.tools.sample_data import GlobalSampleData
 
 # Add parent directory to path (kept for backwards compat)
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
-Account.enable_unaudited_hdwallet_features()
-
 
 # =============================================================================
 # Configuration
 # =============================================================================
 
-# Logging level: DEBUG, INFO, WARNING, ERROR, or NONE (to disable all debug logs)
-LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG").upper()
-
 # Query mix weights (must sum to 1.0)
 QUERY_MIX = {
     "point_by_id": 0.20,       # 20% - Point lookup by node_id/workload_id
@@ -71,10 +63,6 @@ QUERY_MIX = {
     "workload_specific": 0.15, # 15% - Find pending workloads with filters
 }
 
-# Sample sizes for pre-loading IDs
-SAMPLE_SIZE_IDS = 1000
-SAMPLE_SIZE_KEYS = 1000
-
 # Regions and VM types for filter queries
 REGIONS = ["eu-west", "us-east", "asia-pac"]
 VM_TYPES = ["cpu", "gpu", "gpu_large"]
@@ -82,87 +70,23 @@ VM_TYPES = ["cpu", "gpu", "gpu_large"]
 # Default result set limits
 DEFAULT_NODE_LIMIT = 100
 DEFAULT_WORKLOAD_LIMIT = 100
+DEFAULT_GRAMMAR_LIMIT = 100
 
-DEFAULT_BLOCK_DURATION_SECONDS = 2
-MAX_RESULTS_PER_PAGE: int = 1_000_000_000
-
-
-# =============================================================================
-# Logging Helper
-# =============================================================================
-
-def debug_log(message: str) -> None:
-    """Print debug message if LOG_LEVEL is DEBUG."""
-    if LOG_LEVEL == "DEBUG":
-        print(message)
-
+# Grammar-generated queries (see stress.tools.query_grammar). Weight 0 disables them.
+# The weight is in percent of the read mix: the other read tasks sum to 100.
+GRAMMAR_QUERY_WEIGHT = int(os.getenv("DC_W_GRAMMAR_QUERY", "0"))
+GRAMMAR_MAX_DEPTH = int(os.getenv("DC_GRAMMAR_MAX_DEPTH", "1"))
+GRAMMAR_MAX_TERMS = int(os.getenv("DC_GRAMMAR_MAX_TERMS", "3"))
 
-# =============================================================================
-# Global Sample Data (loaded once at test start)
-# =============================================================================
-
-class GlobalSampleData:
-    """Global sample data loaded once at test start."""
-    
-    node_ids: List[str] = []
-    workload_ids: List[str] = []
-    entity_keys: List[str] = []  # Stored as hex strings for API
-    initialized: bool = False
-    
-    @classmethod
-    def load_from_arkiv(cls, w3: Arkiv) -> None:
-        """Load sample data by querying Arkiv (no local DB dependency)."""
-        if cls.initialized:
-            return
+# Fan-out mode: a user fires DC_FAN_OUT_SIZE queries from QUERY_MIX at once
+# (see stress.tools.fan_out). Weight 0 disables it. In percent of the read mix.
+FAN_OUT_WEIGHT = int(os.getenv("DC_W_FAN_OUT", "0"))
+FAN_OUT_SIZE = int(os.getenv("DC_FAN_OUT_SIZE", "20"))
+# Connections per user shared by concurrent queries (locust's default is 10)
+FAN_OUT_CONNECTIONS = int(os.getenv("DC_FAN_OUT_CONNECTIONS", "10"))
 
-        # Query nodes and workloads and extract their ids from attributes.
-        # Note: requires ATTRIBUTES field support in SDK to populate ids from entity.attributes.
-        try:
-            node_iter = w3.arkiv.query_entities(
-                query='type="node"',
-                options=to_query_options(
-                    fields=_QUERY_FIELDS, max_results_per_page=MAX_RESULTS_PER_PAGE
-                ),
-            )
-            for entity in islice(node_iter, SAMPLE_SIZE_IDS):
-                key = getattr(entity, "key", None)
-                if key:
-                    cls.entity_keys.append(str(key))
-                attrs = getattr(entity, "attributes", {}) or {}
-                node_id = attrs.get("node_id")
-                if node_id:
-                    cls.node_ids.append(str(node_id))
-        except Exception as e:
-            print(f"Error loading node samples from Arkiv: {e}")
-
-        try:
-            workload_iter = w3.arkiv.query_entities(
-                query='type="workload"',
-                options=to_query_options(
-                    fields=_QUERY_FIELDS, max_results_per_page=MAX_RESULTS_PER_PAGE
-                ),
-            )
-            for entity in islice(workload_iter, SAMPLE_SIZE_IDS):
-                key = getattr(entity, "key", None)
-                if key:
-                    cls.entity_keys.append(str(key))
-                attrs = getattr(entity, "attributes", {}) or {}
-                workload_id = attrs.get("workload_id")
-                if workload_id:
-                    cls.workload_ids.append(str(workload_id))
-        except Exception as e:
-            print(f"Error loading workload samples from Arkiv: {e}")
-
-        # Keep only a small set of keys for point lookups (but ensure at least 1 if available)
-        if cls.entity_keys:
-            random.shuffle(cls.entity_keys)
-            cls.entity_keys = cls.entity_keys[: max(1, min(SAMPLE_SIZE_KEYS, len(cls.entity_keys)))]
-
-        print(
-            f"Loaded {len(cls.node_ids)} node IDs, {len(cls.workload_ids)} workload IDs, "
-            f"{len(cls.entity_keys)} entity keys from Arkiv"
-        )
-        cls.initialized = True
+DEFAULT_BLOCK_DURATION_SECONDS = 2
+MAX_RESULTS_PER_PAGE: int = 1_000_000_000
 
 
 # =============================================================================
@@ -176,16 +100,16 @@ class DataCenterReadUser(JsonRpcUser):
     Each user randomly selects query types based on QUERY_MIX weights.
     """
     wait_time = constant(1)
+    concurrency = FAN_OUT_CONNECTIONS
 
     account: Optional[LocalAccount] = None
     w3: Optional[Arkiv] = None
 
     def _initialize_account_and_w3(self) -> Arkiv:
         if self.account is None or self.w3 is None:
-            account_path = build_account_path(self.id)
-            self.account = Account.from_mnemonic(config.mnemonic, account_path=account_path)
+            self.account = AccountRegistry.get().account(self.id)
             self.w3 = Arkiv(
-                web3.HTTPProvider(endpoint_uri=self.client.base_url, session=self.client),
+                self.rpc_provider(),
                 NamedAccount(name="LocalSigner", account=self.account),
             )
             if not self.w3.is_connected():
@@ -193,22 +117,38 @@ class DataCenterReadUser(JsonRpcUser):
         return self.w3
 
     def _fire_locust_request(self, name: str, fn) -> Any:
+        start_time = time.time()
         start = time.perf_counter()
         exc: Optional[BaseException] = None
+        result = None
+        # RPC calls made by fn are attributed to this task (unless a task is already set)
+        own_task = "task" not in self.request_context
+        if own_task:
+            self.request_context["task"] = name
         try:
-            return fn()
+            result = fn()
+            return result
         except BaseException as e:
             exc = e
             raise
         finally:
+            context = self.context()
+            if own_task:
+                del self.request_context["task"]
+            if isinstance(result, int):
+                context["result_size"] = result
+            elif isinstance(result, Mapping) and "blockNumber" in result:
+                context["block_number"] = result["blockNumber"]
+                context["gas_used"] = result.get("gasUsed")
             events.request.fire(
                 request_type="arkiv",
                 name=name,
                 response_time=(time.perf_counter() - start) * 1000,
                 response_length=0,
                 exception=exc,
-                context={},
+                context=context,
                 response=None,
+                start_time=start_time,
             )
 
     def _is_not_found(self, e: BaseException) -> bool:
@@ -231,8 +171,7 @@ class DataCenterReadUser(JsonRpcUser):
         w3 = self._initialize_account_and_w3()
 
         # Ensure global data is loaded
-        if not GlobalSampleData.initialized:
-            GlobalSampleData.load_from_arkiv(w3)
+        GlobalSampleData.ensure_loaded(w3)
     
     @task(20)  # 20% weight
     def point_by_id(self):
@@ -258,14 +197,14 @@ class DataCenterReadUser(JsonRpcUser):
         if not entity_id:
             return
         
-        debug_log(f"[DEBUG] point_by_id: querying {id_key}={entity_id}")
+        logging.debug("point_by_id: querying %s=%s", id_key, entity_id)
 
         query = f'{id_key}="{entity_id}"'
         try:
             count = self._fire_locust_request("point_by_id", lambda: self._query_count(query))
-            debug_log(f"[DEBUG] point_by_id: SUCCESS - found {count} entities for {id_key}={entity_id}")
+            logging.debug("point_by_id: SUCCESS - found %s entities for %s=%s", count, id_key, entity_id)
         except Exception as e:
-            debug_log(f"[DEBUG] point_by_id: FAILED - error={e}, entity_id={entity_id}")
+            logging.debug("point_by_id: FAILED - error=%s, entity_id=%s", e, entity_id)
             raise
     
     @task(15)  # 15% weight
@@ -276,18 +215,18 @@ class DataCenterReadUser(JsonRpcUser):
         
         # Use the single entity key (or first one if multiple somehow)
         entity_key = GlobalSampleData.entity_keys[0]
-        debug_log(f"[DEBUG] point_by_key: querying entity_key={entity_key[:20]}...")
+        logging.debug("point_by_key: querying entity_key=%s...", entity_key[:20])
 
         w3 = self._initialize_account_and_w3()
         try:
             entity = self._fire_locust_request("point_by_key", lambda: w3.arkiv.get_entity(entity_key))
             key = getattr(entity, "key", "unknown")
-            debug_log(f"[DEBUG] point_by_key: SUCCESS - found entity key={str(key)[:20]}...")
+            logging.debug("point_by_key: SUCCESS - found entity key=%s...", str(key)[:20])
         except Exception as e:
             if self._is_not_found(e):
-                debug_log(f"[DEBUG] point_by_key: NOT_FOUND - entity_key={entity_key[:20]}...")
+                logging.debug("point_by_key: NOT_FOUND - entity_key=%s...", entity_key[:20])
                 return
-            debug_log(f"[DEBUG] point_by_key: FAILED - error={e}, entity_key={entity_key[:20]}...")
+            logging.debug("point_by_key: FAILED - error=%s, entity_key=%s...", e, entity_key[:20])
             raise
     
     @task(10)  # 10% weight
@@ -296,18 +235,18 @@ class DataCenterReadUser(JsonRpcUser):
         # Generate a random UUID that doesn't exist
         import uuid
         nonexistent_key = "0x0000000000000000000000000000000000000000000000000000000000000001"
-        debug_log(f"[DEBUG] point_miss: querying non-existent entity_key={nonexistent_key[:20]}...")
+        logging.debug("point_miss: querying non-existent entity_key=%s...", nonexistent_key[:20])
 
         w3 = self._initialize_account_and_w3()
         try:
             _ = self._fire_locust_request("point_miss", lambda: w3.arkiv.get_entity(nonexistent_key))
-            debug_log(f"[DEBUG] point_miss: FAILED - unexpectedly found key={nonexistent_key[:20]}...")
+            logging.debug("point_miss: FAILED - unexpectedly found key=%s...", nonexistent_key[:20])
             raise RuntimeError("Expected entity to be missing, but it existed")
         except Exception as e:
             if self._is_not_found(e):
-                debug_log(f"[DEBUG] point_miss: SUCCESS - got expected not-found for key={nonexistent_key[:20]}...")
+                logging.debug("point_miss: SUCCESS - got expected not-found for key=%s...", nonexistent_key[:20])
                 return
-            debug_log(f"[DEBUG] point_miss: FAILED - unexpected error={e} for key={nonexistent_key[:20]}...")
+            logging.debug("point_miss: FAILED - unexpected error=%s for key=%s...", e, nonexistent_key[:20])
             raise
     
     @task(25)  # 25% weight
@@ -323,8 +262,10 @@ class DataCenterReadUser(JsonRpcUser):
         min_cpu = rng.choice([4, 8, 16, 32])
         min_ram = rng.choice([16, 32, 64, 128])
         
-        debug_log(f"[DEBUG] node_filter: querying status=available, type=node, region={region}, "
-              f"vm_type={vm_type}, cpu_count>={min_cpu}, ram_gb>={min_ram}")
+        logging.debug(
+            "node_filter: querying status=available, type=node, region=%s, vm_type=%s, cpu_count>=%s, ram_gb>=%s",
+            region, vm_type, min_cpu, min_ram,
+        )
 
         query_str = (
             f'status="available" && type="node" && region="{region}" && vm_type="{vm_type}"'
@@ -334,15 +275,15 @@ class DataCenterReadUser(JsonRpcUser):
             count = self._fire_locust_request(
                 "node_filter", lambda: self._query_count(query_str, limit=DEFAULT_NODE_LIMIT)
             )
-            debug_log(f"[DEBUG] node_filter: SUCCESS - found {count} nodes")
+            logging.debug("node_filter: SUCCESS - found %s nodes", count)
         except Exception as e:
-            debug_log(f"[DEBUG] node_filter: FAILED - error={e}")
+            logging.debug("node_filter: FAILED - error=%s", e)
             raise
     
     @task(15)  # 15% weight
     def workload_simple(self):
         """Find pending workloads (status filter only)."""
-        debug_log(f"[DEBUG] workload_simple: querying status=pending, type=workload")
+        logging.debug("workload_simple: querying status=pending, type=workload")
 
         query_str = 'status="pending" && type="workload"'
         try:
@@ -350,9 +291,9 @@ class DataCenterReadUser(JsonRpcUser):
                 "workload_simple",
                 lambda: self._query_count(query_str, limit=DEFAULT_WORKLOAD_LIMIT),
             )
-            debug_log(f"[DEBUG] workload_simple: SUCCESS - found {count} workloads")
+            logging.debug("workload_simple: SUCCESS - found %s workloads", count)
         except Exception as e:
-            debug_log(f"[DEBUG] workload_simple: FAILED - error={e}")
+            logging.debug("workload_simple: FAILED - error=%s", e)
             raise
     
     @task(15)  # 15% weight
@@ -363,8 +304,10 @@ class DataCenterReadUser(JsonRpcUser):
         region = rng.choice(REGIONS)
         vm_type = rng.choice(VM_TYPES)
         
-        debug_log(f"[DEBUG] workload_specific: querying status=pending, type=workload, "
-              f"region={region}, vm_type={vm_type}")
+        logging.debug(
+            "workload_specific: querying status=pending, type=workload, region=%s, vm_type=%s",
+            region, vm_type,
+        )
 
         query_str = (
             f'status="pending" && type="workload" && region="{region}" && vm_type="{vm_type}"'
@@ -374,11 +317,44 @@ class DataCenterReadUser(JsonRpcUser):
                 "workload_specific",
                 lambda: self._query_count(query_str, limit=DEFAULT_WORKLOAD_LIMIT),
             )
-            debug_log(f"[DEBUG] workload_specific: SUCCESS - found {count} workloads")
+            logging.debug("workload_specific: SUCCESS - found %s workloads", count)
         except Exception as e:
-            debug_log(f"[DEBUG] workload_specific: FAILED - error={e}")
+            logging.debug("workload_specific: FAILED - error=%s", e)
             raise
 
+    @task(FAN_OUT_WEIGHT)
+    def fan_out(self):
+        """Fire FAN_OUT_SIZE queries from QUERY_MIX concurrently and time the whole batch."""
+        names = random.choices(list(QUERY_MIX), weights=list(QUERY_MIX.values()), k=FAN_OUT_SIZE)
+        with self.request_fields(task="fan_out"):
+            failures = run_fan_out(f"fan_out[{FAN_OUT_SIZE}]", [getattr(self, name) for name in names])
+        logging.debug("fan_out: %s/%s queries succeeded", FAN_OUT_SIZE - failures, FAN_OUT_SIZE)
+
+    @task(GRAMMAR_QUERY_WEIGHT)
+    def grammar_query(self):
+        """Run a query generated from the Arkiv query grammar, reported per query shape."""
+        grammar = QueryGrammar(
+            max_depth=GRAMMAR_MAX_DEPTH,
+            max_terms=GRAMMAR_MAX_TERMS,
+            id_pools={"node": GlobalSampleData.node_ids, "workload": GlobalSampleData.workload_ids},
+        )
+        generated = grammar.generate()
+
+        logging.debug("grammar_query: shape=%s, query=%s", generated.shape, generated.query)
+
+        start = time.perf_counter()
+        try:
+            count = self._fire_locust_request(
+                f"grammar_query[{generated.shape}]",
+                lambda: self._query_count(generated.query, limit=DEFAULT_GRAMMAR_LIMIT),
+            )
+            logging.debug("grammar_query: SUCCESS - found %s entities", count)
+        except Exception as e:
+            logging.debug("grammar_query: FAILED - error=%s, query=%s", e, generated.query)
+            raise
+        duration = timedelta(seconds=time.perf_counter() - start)
+        Metrics.get_metrics().record_query_shape(generated.shape, duration, count)
+
 
 # =============================================================================
 # Test Initialization Hook
@@ -387,11 +363,24 @@ class DataCenterReadUser(JsonRpcUser):
 @events.test_start.add_listener
 def on_test_start(environment, **kwargs):
     """Load sample data once when test starts."""
+    Metrics.reset_global_metrics()
+    metrics = Metrics.get_metrics()
+    metrics.initialize(instance_id=socket.gethostname())
+    metrics.set_loadtest_status("running")
+
     print("=" * 60)
     print("Initializing read-only stress test")
     print("=" * 60)
     print(f"Query mix: {QUERY_MIX}")
+    print(f"Grammar query weight: {GRAMMAR_QUERY_WEIGHT}")
+    print(f"Fan-out weight: {FAN_OUT_WEIGHT} (batch size {FAN_OUT_SIZE}, {FAN_OUT_CONNECTIONS} connections per user)")
     print()
-    print("Sample data will be loaded from Arkiv on first user start.")
+    print("Sample data is loaded from Arkiv once and broadcast to all workers.")
     print()
 
+
+@events.test_stop.add_listener
+def on_test_stop(environment, **kwargs):
+    metrics = Metrics.get_metrics()
+    if metrics:
+        metrics.set_loadtest_status("stopped")
@@ -25,12 +25,11 @@ import sys
 import time
 from dataclasses import replace
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Mapping, Dict, List, Optional
 
-import web3
 from arkiv import Arkiv
 from arkiv.account import NamedAccount
-from eth_account import Account
+from arkiv.types import TransactionReceipt
 from eth_account.signers.local import LocalAccount
 from locust import constant, events, task
 from web3 import Web3
@@ -42,23 +41,21 @@ if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
 import stress.tools.config as config
+from stress.tools.account_registry import AccountRegistry
 from stress.tools.json_rpc_user import JsonRpcUser
-from stress.tools.utils import build_account_path
 
 # Add parent directory to path for backwards-compat imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
 from stress.tools.dc_data import (
-    NODE,
-    WORKLOAD,
     NodeEntity,
     WorkloadEntity,
     create_node,
     create_workload,
+    node_to_arkiv_attributes,
+    workload_to_arkiv_attributes,
 )
 
-Account.enable_unaudited_hdwallet_features()
-
 # =============================================================================
 # Configuration (env-overridable)
 # =============================================================================
@@ -85,64 +82,6 @@ W_UPDATE_WORKLOAD = int(os.getenv("DC_W_UPDATE_WORKLOAD", "20"))
 DEFAULT_BLOCK_DURATION_SECONDS = 2
 
 
-# =============================================================================
-# Entity Transformation (Arkiv attributes)
-# =============================================================================
-
-def node_to_arkiv_attributes(node: NodeEntity, creator_address: str) -> Dict[str, Any]:
-    """
-    Build Arkiv attributes for a NodeEntity.
-
-    Note: we keep the same attribute names as the previous HTTP endpoint payloads.
-    """
-    # Keep attributes consistent with other dc_* tests (no $system fields here)
-    string_annotations = {
-        "dc_id": node.dc_id,
-        "type": NODE,
-        "node_id": node.node_id,
-        "region": node.region,
-        "status": node.status,
-        "vm_type": node.vm_type,
-    }
-
-    numeric_annotations = {
-        "cpu_count": node.cpu_count,
-        "ram_gb": node.ram_gb,
-        "price_hour": node.price_hour,
-        "avail_hours": node.avail_hours,
-    }
-
-    return {**string_annotations, **numeric_annotations}
-
-
-def workload_to_arkiv_attributes(
-    workload: WorkloadEntity, creator_address: str
-) -> Dict[str, Any]:
-    """
-    Build Arkiv attributes for a WorkloadEntity.
-
-    Note: we keep the same attribute names as the previous HTTP endpoint payloads.
-    """
-    # Keep attributes consistent with other dc_* tests (no $system fields here)
-    string_annotations = {
-        "dc_id": workload.dc_id,
-        "type": WORKLOAD,
-        "workload_id": workload.workload_id,
-        "status": workload.status,
-        "assigned_node": workload.assigned_node,
-        "region": workload.region,
-        "vm_type": workload.vm_type,
-    }
-
-    numeric_annotations = {
-        "req_cpu": workload.req_cpu,
-        "req_ram": workload.req_ram,
-        "max_hours": workload.max_hours,
-    }
-
-    return {**string_annotations, **numeric_annotations}
-
-
 # =============================================================================
 # Locust User
 # =============================================================================
@@ -205,11 +144,10 @@ class DataCenterWriteAndUpdateUser(JsonRpcUser):
 
     def _initialize_account_and_w3(self) -> Arkiv:
         if self.account is None or self.w3 is None:
-            account_path = build_account_path(self.id)
-            self.account = Account.from_mnemonic(config.mnemonic, account_path=account_path)
+            self.account = AccountRegistry.get().account(self.id)
 
             self.w3 = Arkiv(
-                web3.HTTPProvider(endpoint_uri=self.client.base_url, session=self.client),
+                self.rpc_provider(),
                 NamedAccount(name="LocalSigner", account=self.account),
             )
             if not self.w3.is_connected():
@@ -233,11 +171,10 @@ class DataCenterWriteAndUpdateUser(JsonRpcUser):
         if self.w3 is None or self.account is None:
             return
         try:
-            accounts = self.w3.eth.accounts
             balance = Web3.from_wei(self.w3.eth.get_balance(self.account.address), "ether")
             if balance < 0.1:
                 tx_hash = self.w3.eth.send_transaction(
-                    {"from": accounts[0], "to": self.account.address, "value": Web3.to_wei(10, "ether")}
+                    {"from": self.w3.eth.accounts[0], "to": self.account.address, "value": Web3.to_wei(10, "ether")}
                 )
                 self.w3.eth.wait_for_transaction_receipt(tx_hash)
         except Exception:
@@ -247,22 +184,40 @@ class DataCenterWriteAndUpdateUser(JsonRpcUser):
         return max(1, int(ttl_blocks) * int(self.block_duration_seconds))
 
     def _fire_locust_request(self, name: str, fn) -> Any:
+        start_time = time.time()
         start = time.perf_counter()
         exc: Optional[BaseException] = None
+        result = None
+        # RPC calls made by fn are attributed to this task (unless a task is already set)
+        own_task = "task" not in self.request_context
+        if own_task:
+            self.request_context["task"] = name
         try:
-            return fn()
+            result = fn()
+            return result
         except BaseException as e:
             exc = e
             raise
         finally:
+            context = self.context()
+            if own_task:
+                del self.request_context["task"]
+            if isinstance(result, int):
+                context["result_size"] = result
+            elif isinstance(result, Mapping) and "blockNumber" in result:
+                context["block_number"] = result["blockNumber"]
+                context["gas_used"] = result.get("gasUsed")
+            elif isinstance(result, TransactionReceipt):
+                context["block_number"] = result.block_number
             events.request.fire(
                 request_type="arkiv",
                 name=name,
                 response_time=(time.perf_counter() - start) * 1000,
                 response_length=0,
                 exception=exc,
-                context={},
+                context=context,
                 response=None,
+                start_time=start_time,
             )
 
     # -------------------------------------------------------------------------
@@ -330,15 +285,16 @@ class DataCenterWriteAndUpdateUser(JsonRpcUser):
         ttl_blocks = self.rng.randint(100, 1000)
         expires_in = self._expires_in_seconds_from_blocks(ttl_blocks)
         w3 = self._initialize_account_and_w3()
-        self._fire_locust_request(
-            name,
-            lambda: w3.arkiv.create_entity(
-                payload=payload,
-                content_type="application/octet-stream",
-                attributes=attributes,
-                expires_in=expires_in,
-            ),
-        )
+        with self.request_fields(entity_count=1, payload_bytes=len(payload)):
+            self._fire_locust_request(
+                name,
+                lambda: w3.arkiv.create_entity(
+                    payload=payload,
+                    content_type="application/octet-stream",
+                    attributes=attributes,
+                    expires_in=expires_in,
+                )[1],  # the receipt
+            )
 
     def _update_entity(
         self, entity_key: str, payload: bytes, attributes: Dict[str, Any], name: str
@@ -346,15 +302,16 @@ class DataCenterWriteAndUpdateUser(JsonRpcUser):
         ttl_blocks = self.rng.randint(100, 1000)
         expires_in = self._expires_in_seconds_from_blocks(ttl_blocks)
         w3 = self._initialize_account_and_w3()
-        self._fire_locust_request(
-            name,
-            lambda: w3.arkiv.update_entity(
-                entity_key,
-                payload=payload,
-                attributes=attributes,
-                expires_in=expires_in,
-            ),
-        )
+        with self.request_fields(entity_count=1, payload_bytes=len(payload)):
+            self._fire_locust_request(
+                name,
+                lambda: w3.arkiv.update_entity(
+                    entity_key,
+                    payload=payload,
+                    attributes=attributes,
+                    expires_in=expires_in,
+                ),
+            )
 
     # -------------------------------------------------------------------------
     # Tasks (frequency: add_node < update_node < add_workload < update_workload)
@@ -14,15 +14,13 @@ import sys
 import time
 from pathlib import Path
 import logging
-from typing import Any, Dict, Optional
+from typing import Any, Mapping, Optional
 
-import web3
 from web3.types import TxParams
 from arkiv import Arkiv
 from arkiv.account import NamedAccount
 from arkiv.types import Operations, TxHash, HexStr
 from arkiv.utils import to_create_op, to_tx_params
-from eth_account import Account
 from eth_account.signers.local import LocalAccount
 from locust import constant, events, task
 from web3 import Web3
@@ -34,23 +32,19 @@ if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
 import stress.tools.config as config
+from stress.tools.account_registry import AccountRegistry
 from stress.tools.json_rpc_user import JsonRpcUser
-from stress.tools.utils import build_account_path
 
 # Add parent directory to path to import from src.db.append_dc_data (kept for backwards compat)
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
 from stress.tools.dc_data import (
-    NODE,
-    WORKLOAD,
-    NodeEntity,
-    WorkloadEntity,
     create_node,
     create_workload,
+    node_to_arkiv_attributes,
+    workload_to_arkiv_attributes,
 )
 
-Account.enable_unaudited_hdwallet_features()
-
 
 # =============================================================================
 # Configuration
@@ -65,72 +59,6 @@ DEFAULT_BLOCK = 1  # Starting block number (will be incremented per user)
 DEFAULT_BLOCK_DURATION_SECONDS = 2
 
 
-# =============================================================================
-# Entity Transformation (Arkiv attributes)
-# =============================================================================
-
-def node_to_arkiv_attributes(node: NodeEntity, creator_address: str) -> Dict[str, Any]:
-    """
-    Build Arkiv attributes for a NodeEntity.
-
-    Note: we keep the same attribute names as the previous HTTP endpoint payloads.
-    """
-    entity_key = node.entity_key
-    block = node.block
-
-    # String attributes
-    string_attrs: Dict[str, Any] = {
-        "dc_id": node.dc_id,
-        "type": NODE,
-        "node_id": node.node_id,
-        "region": node.region,
-        "status": node.status,
-        "vm_type": node.vm_type,
-    }
-
-    # Numeric attributes
-    numeric_attrs: Dict[str, Any] = {
-        "cpu_count": node.cpu_count,
-        "ram_gb": node.ram_gb,
-        "price_hour": node.price_hour,
-        "avail_hours": node.avail_hours,
-    }
-
-    return {**string_attrs, **numeric_attrs}
-
-
-def workload_to_arkiv_attributes(
-    workload: WorkloadEntity, creator_address: str
-) -> Dict[str, Any]:
-    """
-    Build Arkiv attributes for a WorkloadEntity.
-
-    Note: we keep the same attribute names as the previous HTTP endpoint payloads.
-    """
-    entity_key = workload.entity_key
-    block = workload.block
-
-    # String attributes
-    string_attrs: Dict[str, Any] = {
-        "dc_id": workload.dc_id,
-        "type": WORKLOAD,
-        "workload_id": workload.workload_id,
-        "status": workload.status,
-        "assigned_node": workload.assigned_node,
-        "region": workload.region,
-        "vm_type": workload.vm_type
-    }
-
-    # Numeric attributes
-    numeric_attrs: Dict[str, Any] = {
-        "req_cpu": workload.req_cpu,
-        "req_ram": workload.req_ram,
-        "max_hours": workload.max_hours,
-    }
-
-    return {**string_attrs, **numeric_attrs}
-
-
 # =============================================================================
 # Locust User Class
 # =============================================================================
@@ -165,11 +93,10 @@ class DataCenterUser(JsonRpcUser):
 
     def _initialize_account_and_w3(self) -> Arkiv:
         if self.account is None or self.w3 is None:
-            account_path = build_account_path(self.id)
-            self.account = Account.from_mnemonic(config.mnemonic, account_path=account_path)
+            self.account = AccountRegistry.get().account(self.id)
 
             self.w3 = Arkiv(
-                web3.HTTPProvider(endpoint_uri=self.client.base_url, session=self.client),
+                self.rpc_provider(),
                 NamedAccount(name="LocalSigner", account=self.account),
             )
             if not self.w3.is_connected():
@@ -191,11 +118,10 @@ class DataCenterUser(JsonRpcUser):
         if self.w3 is None or self.account is None:
             return
         try:
-            accounts = self.w3.eth.accounts
             balance = Web3.from_wei(self.w3.eth.get_balance(self.account.address), "ether")
             if balance < 0.1:
                 tx_hash = self.w3.eth.send_transaction(
-                    {"from": accounts[0], "to": self.account.address, "value": Web3.to_wei(10, "ether")}
+                    {"from": self.w3.eth.accounts[0], "to": self.account.address, "value": Web3.to_wei(10, "ether")}
                 )
                 self.w3.eth.wait_for_transaction_receipt(tx_hash)
         except Exception:
@@ -206,22 +132,38 @@ class DataCenterUser(JsonRpcUser):
         return max(1, int(ttl_blocks) * int(self.block_duration_seconds))
 
     def _fire_locust_request(self, name: str, fn) -> Any:
+        start_time = time.time()
         start = time.perf_counter()
         exc: Optional[BaseException] = None
+        result = None
+        # RPC calls made by fn are attributed to this task (unless a task is already set)
+        own_task = "task" not in self.request_context
+        if own_task:
+            self.request_context["task"] = name
         try:
-            return fn()
+            result = fn()
+            return result
         except BaseException as e:
             exc = e
             raise
         finally:
+            context = self.context()
+            if own_task:
+                del self.request_context["task"]
+            if isinstance(result, int):
+                context["result_size"] = result
+            elif isinstance(result, Mapping) and "blockNumber" in result:
+                context["block_number"] = result["blockNumber"]
+                context["gas_used"] = result.get("gasUsed")
             events.request.fire(
                 request_type="arkiv",
                 name=name,
                 response_time=(time.perf_counter() - start) * 1000,
                 response_length=0,
                 exception=exc,
-                context={},
+                context=context,
                 response=None,
+                start_time=start_time,
             )
     
     @task
@@ -297,9 +239,14 @@ class DataCenterUser(JsonRpcUser):
         w3 = self._initialize_account_and_w3()
         operations = Operations(creates=create_ops)
         nonce = w3.eth.get_transaction_count(self.account.address)
-        logging.info(f"Sending tx by user {self.id} with nonce: {nonce}, address: {self.account.address}")
-        self._fire_locust_request("write_node_with_workloads", lambda: custom_execute(w3, operations, TxParams(nonce=nonce)))
-        logging.info(f"Tx sent by user {self.id} with nonce: {nonce}, address: {self.account.address}")
+        logging.info("Sending tx by user %s with nonce: %s, address: %s", self.id, nonce, self.account.address)
+        with self.request_fields(
+            entity_count=len(create_ops), payload_bytes=sum(len(op.payload) for op in create_ops)
+        ):
+            self._fire_locust_request(
+                "write_node_with_workloads", lambda: custom_execute(w3, operations, TxParams(nonce=nonce))
+            )
+        logging.info("Tx sent by user %s with nonce: %s, address: %s", self.id, nonce, self.account.address)
 
 
 def custom_execute(w3: Arkiv, operations: Operations, tx_params: TxParams) -> Any:
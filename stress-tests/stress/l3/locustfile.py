@@ -25,16 +25,15 @@ from eth_account.signers.local import LocalAccount
 from locust import task, between, events, constant_pacing
 from locust.runners import MasterRunner, LocalRunner
 from web3 import Web3
-import web3
-from eth_account import Account
 
 import stress.tools.config as config
-from stress.tools.utils import launch_image, build_account_path
+from stress.tools.account_registry import AccountRegistry
+from stress.tools.local_chain import launch_local_chain
 from stress.tools.metrics import Metrics
-from stress.tools.entity_count_updater import EntityCountUpdater
+from stress.tools.block_inclusion import BlockInclusion
+from stress.tools.chain_sampler import ChainSampler
 from stress.tools.json_rpc_user import JsonRpcUser
-
-Account.enable_unaudited_hdwallet_features()
+from stress.tools.visibility_probe import PROBE_EXPIRATION_TIME, ExpiryWatcher, run_probe
 
 # Default block duration in seconds
 DEFAULT_BLOCK_DURATION: int = 2
@@ -45,6 +44,9 @@ MAX_RESULTS_PER_PAGE: int = 1_000_000_000
 # Default entity expiration time
 DEFAULT_EXPIRATION_TIME: timedelta = timedelta(seconds=float(os.getenv("BLOCK_EXPIRATION_TIME_SEC", 30 * 60)))
 
+# Weight of the read-your-writes visibility probe task (0, the default, disables it)
+VISIBILITY_PROBE_WEIGHT: int = int(os.getenv("VISIBILITY_PROBE_WEIGHT", 0))
+
 # JSON data as one-line Python string
 bigger_payload = b'{"offer":{"constraints":"(&\\n  (golem.srv.comp.expiration>1653219330118)\\n  (golem.node.debug.subnet=0987)\\n)","offerId":"7f2f81f213dd48549e080d774dbf1bc2-076a8cbae6546e5f158e5b4d3a869f25a8e2ae426279a691e7ee45315efa3d83","properties":{"golem":{"activity":{"caps":{"transfer":{"protocol":["http","https","gftp"]}}},"com":{"payment":{"debit-notes":{"accept-timeout?":240},"platform":{"erc20-rinkeby-tglm":{"address":"0x86a269498fb5270f20bdc6fdcf6039122b0d3b23"},"zksync-rinkeby-tglm":{"address":"0x86a269498fb5270f20bdc6fdcf6039122b0d3b23"}}},"pricing":{"model":{"@tag":"linear","linear":{"coeffs":[0.0002777777777777778,0.001388888888888889,0.0]}}},"scheme":"payu","usage":{"vector":["golem.usage.duration_sec","golem.usage.cpu_sec"]}},"inf":{"cpu":{"architecture":"x86_64","capabilities":["sse3","pclmulqdq","dtes64","monitor","dscpl","vmx","eist","tm2","ssse3","fma","cmpxchg16b","pdcm","pcid","sse41","sse42","x2apic","movbe","popcnt","tsc_deadline","aesni","xsave","osxsave","avx","f16c","rdrand","fpu","vme","de","pse","tsc","msr","pae","mce","cx8","apic","sep","mtrr","pge","mca","cmov","pat","pse36","clfsh","ds","acpi","mmx","fxsr","sse","sse2","ss","htt","tm","pbe","fsgsbase","adjust_msr","smep","rep_movsb_stosb","invpcid","deprecate_fpu_cs_ds","mpx","rdseed","rdseed","adx","smap","clflushopt","processor_trace","sgx","sgx_lc"],"cores":6,"model":"Stepping 10 Family 6 Model 158","threads":11,"vendor":"GenuineIntel"},"mem":{"gib":28.0},"storage":{"gib":57.276745605468754}},"node":{"debug":{"subnet":"0987"},"id":{"name":"nieznanysprawiciel-laptop-Provider-2"}},"runtime":{"capabilities":["vpn"],"name":"vm","version":"0.2.10"},"srv":{"caps":{"multi-activity":true}}}},"providerId":"0x86a269498fb5270f20bdc6fdcf6039122b0d3b23","timestamp":"2022-05-22T11:35:49.290821396Z"},"proposedSignature":"NoSignature","state":"Pending","timestamp":"2022-05-22T11:35:49.290821396Z","validTo":"2022-05-22T12:35:49.280650Z"}'
 simple_payload = b"Hello Arkiv Workshop!"
@@ -59,8 +61,8 @@ def on_locust_init(environment, **kwargs):
     runner = getattr(environment, "runner", None)
     # only run on the master node or local runner
     if isinstance(runner, (MasterRunner, LocalRunner)):
-        logging.info("Running on master/local runner - creating EntityCountUpdater")
-        EntityCountUpdater.instance = EntityCountUpdater(environment)
+        logging.info("Running on master/local runner - creating ChainSampler")
+        ChainSampler.instance = ChainSampler(environment)
 
 
 @events.test_start.add_listener
@@ -71,14 +73,14 @@ def on_test_start(environment, **kwargs):
     metrics.set_loadtest_status("running")
 
     logging.info(
-        f"A new test is starting with nr of users {environment.runner.target_user_count}"
+        "A new test is starting with nr of users %s", environment.runner.target_user_count
     )
 
-    # Start/restart EntityCountUpdater (host may have changed)
+    # Start/restart ChainSampler (host may have changed)
     runner = getattr(environment, "runner", None)
     if isinstance(runner, (MasterRunner, LocalRunner)):
-        if EntityCountUpdater.instance:
-            EntityCountUpdater.instance.restart()
+        if ChainSampler.instance:
+            ChainSampler.instance.restart()
 
     if (
         config.chain_env == "local"
@@ -86,8 +88,8 @@ def on_test_start(environment, **kwargs):
         and not config.fresh_container_for_each_test
     ):
         global gb_container
-        gb_container = launch_image(config.image_to_run)
-        logging.info(f"A new test is starting and a new container is launched")
+        gb_container = launch_local_chain(config.image_to_run)
+        logging.info("A new test is starting and a new container is launched")
 
 
 @events.test_stop.add_listener
@@ -96,6 +98,9 @@ def on_test_stop(environment, **kwargs):
     if metrics:
         metrics.set_loadtest_status("stopped")
 
+    if ExpiryWatcher.instance:
+        ExpiryWatcher.instance.stop()
+
     if (
         config.chain_env == "local"
         and config.image_to_run
@@ -104,7 +109,7 @@ def on_test_stop(environment, **kwargs):
         global gb_container
         if gb_container:
             gb_container.stop()
-        logging.info(f"A new test is ending and the container is stopped")
+        logging.info("A new test is ending and the container is stopped")
 
 
 class ArkivL3User(JsonRpcUser):
@@ -122,26 +127,21 @@ class ArkivL3User(JsonRpcUser):
     def _initialize_account_and_w3(self):
         """Initialize account and w3 connection if not already initialized."""
         if self.account is None or self.w3 is None:
-            account_path = build_account_path(self.id)
-            self.account = Account.from_mnemonic(
-                config.mnemonic, account_path=account_path
-            )
-            logging.info(f"Account: {self.account.address} (user: {self.id})")
+            self.account = AccountRegistry.get().account(self.id)
+            logging.info("Account: %s (user: %s)", self.account.address, self.id)
 
-            logging.info(f"Connecting to Arkiv L3 (user: {self.id})")
-            logging.info(f"Base URL: {self.client.base_url} (user: {self.id})")
+            logging.info("Connecting to Arkiv L3 (user: %s)", self.id)
+            logging.info("Base URL: %s (user: %s)", self.client.base_url, self.id)
             self.w3 = Arkiv(
-                web3.HTTPProvider(
-                    endpoint_uri=self.client.base_url, session=self.client
-                ),
+                self.rpc_provider(),
                 NamedAccount(name=f"LocalSigner", account=self.account),
             )
 
             if not self.w3.is_connected():
-                logging.error(f"Not connected to Arkiv L3 (user: {self.id})")
+                logging.error("Not connected to Arkiv L3 (user: %s)", self.id)
                 raise Exception(f"Not connected to Arkiv L3 (user: {self.id})")
 
-            logging.info(f"Connected to Arkiv L3 (user: {self.id})")
+            logging.info("Connected to Arkiv L3 (user: %s)", self.id)
 
             if config.chain_env == "local":
                 self._topup_local_account()
@@ -150,30 +150,28 @@ class ArkivL3User(JsonRpcUser):
 
     def _topup_local_account(self):
         """Top up local account with ETH from the first account."""
-        accounts = self.w3.eth.accounts
-
         balance = Web3.from_wei(self.w3.eth.get_balance(self.account.address), "ether")
-        logging.info(f"Balance: {balance} ETH (user: {self.id})")
+        logging.info("Balance: %s ETH (user: %s)", balance, self.id)
         
         # Top up if balance is below 0.1 ETH
         if balance < 0.1:
             tx_hash = self.w3.eth.send_transaction(
                 {
-                    "from": accounts[0],
+                    "from": self.w3.eth.accounts[0],
                     "to": self.account.address,
                     "value": Web3.to_wei(10, "ether"),
                 }
             )
-            logging.info(f"Transaction hash: {tx_hash} (user: {self.id})")
+            logging.info("Transaction hash: %s (user: %s)", tx_hash, self.id)
             receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
-            logging.info(f"Transaction confirmed in block: {receipt.blockNumber} (user: {self.id})")
+            logging.info("Transaction confirmed in block: %s (user: %s)", receipt.blockNumber, self.id)
 
     def _query_block_duration(self) -> int:
         """Get block duration from block timing."""
         try:
             block_timing = self.w3.arkiv.get_block_timing()
             duration = block_timing.duration
-            logging.info(f"Block duration: {duration} seconds (user: {self.id})")
+            logging.info("Block duration: %s seconds (user: %s)", duration, self.id)
             return duration
         except Exception:
             return DEFAULT_BLOCK_DURATION
@@ -240,12 +238,12 @@ class ArkivL3User(JsonRpcUser):
                 and config.image_to_run
                 and config.fresh_container_for_each_test
             ):
-                gb_container = launch_image(config.image_to_run)
+                gb_container = launch_local_chain(config.image_to_run)
 
             w3 = self._initialize_account_and_w3()
 
             nonce = w3.eth.get_transaction_count(self.account.address)
-            logging.info(f"Nonce: {nonce}")
+            logging.info("Nonce: %s", nonce)
 
             start_time = time.perf_counter()
             expiration_seconds = self._calculate_expiration(expires_in)
@@ -259,7 +257,7 @@ class ArkivL3User(JsonRpcUser):
 
             Metrics.get_metrics().record_transaction(len(bigger_payload), duration)
         except Exception as e:
-            logging.error(f"Error: {e}", exc_info=True)
+            logging.error("Error: %s", e, exc_info=True)
             raise
         finally:
             if gb_container:
@@ -322,15 +320,22 @@ class ArkivL3User(JsonRpcUser):
 
             nonce = w3.eth.get_transaction_count(self.account.address)
             logging.info(
-                f"Sending transaction with nonce: {nonce}, payload size: {size_bytes} bytes, "
-                f"count: {count}, user: {self.id}"
+                "Sending transaction with nonce: %s, payload size: %s bytes, count: %s, user: %s",
+                nonce,
+                size_bytes,
+                count,
+                self.id,
             )
 
             start_time = time.perf_counter()
             # Execute all create operations in a single transaction
             operations = Operations(creates=operations)
-            receipt = w3.arkiv.execute(operations)
+            # Tag the transaction's RPC requests in the request log
+            submitted_at = time.time()
+            with self.request_fields(entity_count=count, payload_bytes=total_payload_size):
+                receipt = w3.arkiv.execute(operations)
             duration = timedelta(seconds=time.perf_counter() - start_time)
+            BlockInclusion.get().record(receipt.block_number, submitted_at, count, total_payload_size)
 
             # Verify receipt
             if len(receipt.creates) != count:
@@ -343,7 +348,11 @@ class ArkivL3User(JsonRpcUser):
             )
         except Exception as e:
             logging.error(
-                f"Error in _store_payload (user: {self.id}, size: {size_bytes} bytes, count: {count}): {e}",
+                "Error in _store_payload (user: %s, size: %s bytes, count: %s): %s",
+                self.id,
+                size_bytes,
+                count,
+                e,
                 exc_info=True,
             )
             raise
@@ -448,6 +457,24 @@ class ArkivL3User(JsonRpcUser):
         """Store a 64 KB payload (maximum limit)"""
         self._store_payload(64 * 1024)
 
+    @task(VISIBILITY_PROBE_WEIGHT)
+    def visibility_probe(self):
+        """Measure how long a created entity takes to become visible, then check that it expires"""
+        try:
+            w3 = self._initialize_account_and_w3()
+            probe = run_probe(w3, self._calculate_expiration(PROBE_EXPIRATION_TIME))
+            logging.info(
+                "Probe entity %s visible after %s s (receipt after %.3f s, user: %s)",
+                probe.key,
+                probe.visible_after,
+                probe.receipt_after,
+                self.id,
+            )
+            ExpiryWatcher.get(self.client.base_url, self.block_duration).watch(probe)
+        except Exception as e:
+            logging.error("Error in visibility_probe (user: %s): %s", self.id, e, exc_info=True)
+            raise
+
     def _ensure_unique_ids_filled(self) -> None:
         """
         Query Arkiv for StressedEntity entities and fill unique_ids from those
@@ -456,7 +483,7 @@ class ArkivL3User(JsonRpcUser):
         if len(self.unique_ids) > 0:
             return
         
-        logging.info(f"Querying Arkiv for unique IDs (user: {self.id})")
+        logging.info("Querying Arkiv for unique IDs (user: %s)", self.id)
         
         w3 = self._initialize_account_and_w3()
         # Query a smaller subset using queryPercentage range (10 for ~10% of entities)
@@ -474,9 +501,9 @@ class ArkivL3User(JsonRpcUser):
                 self.unique_ids.add(entity.attributes["uniqueId"])
 
         if len(self.unique_ids) > 0:
-            logging.info(f"Queried for {len(self.unique_ids)} unique IDs (user: {self.id})")
+            logging.info("Queried for %s unique IDs (user: %s)", len(self.unique_ids), self.id)
         else:
-            logging.info(f"No unique IDs found from query (user: {self.id})")
+            logging.info("No unique IDs found from query (user: %s)", self.id)
 
     @task(1)
     def query_single_entity(self):
@@ -485,15 +512,13 @@ class ArkivL3User(JsonRpcUser):
         """
         self._ensure_unique_ids_filled()
         if len(self.unique_ids) == 0:
-            logging.info(
-                f"No unique IDs available yet (user: {self.id}), skipping query_single_entity."
-            )
+            logging.info("No unique IDs available yet (user: %s), skipping query_single_entity.", self.id)
             return
 
         unique_id = random.choice(tuple(self.unique_ids))
 
         try:
-            logging.info(f"Querying for uniqueId: {unique_id} (user: {self.id})")
+            logging.info("Querying for uniqueId: %s (user: %s)", unique_id, self.id)
 
             w3 = self._initialize_account_and_w3()
             start_time = time.perf_counter()
@@ -508,11 +533,17 @@ class ArkivL3User(JsonRpcUser):
             Metrics.get_metrics().record_query(0, duration, len(entities))
 
             logging.info(
-                f"Single-entity query for uniqueId {unique_id} returned {len(entities)} entities (user: {self.id})"
+                "Single-entity query for uniqueId %s returned %s entities (user: %s)",
+                unique_id,
+                len(entities),
+                self.id,
             )
         except Exception as e:
             logging.error(
-                f"Error in query_single_entity (user: {self.id}, uniqueId: {unique_id}): {e}",
+                "Error in query_single_entity (user: %s, uniqueId: %s): %s",
+                self.id,
+                unique_id,
+                e,
                 exc_info=True,
             )
             raise
@@ -522,7 +553,7 @@ class ArkivL3User(JsonRpcUser):
         Stress test query that chooses only a selected percent of Entities
         """
         try:
-            logging.info(f"Selective query with threshold: {percent} (user: {self.id})")
+            logging.info("Selective query with threshold: %s (user: %s)", percent, self.id)
             w3 = self._initialize_account_and_w3()
 
             # Query entities with queryPercentage below threshold
@@ -538,13 +569,14 @@ class ArkivL3User(JsonRpcUser):
 
             Metrics.get_metrics().record_query(percent, duration, len(entities))
 
-            logging.info(
-                f"Found {len(entities)} entities with queryPercentage < {percent} (user: {self.id})"
-            )
-            logging.debug(f"Result: {result} (user: {self.id})")
+            logging.info("Found %s entities with queryPercentage < %s (user: %s)", len(entities), percent, self.id)
+            logging.debug("Result: %s (user: %s)", result, self.id)
         except Exception as e:
             logging.error(
-                f"Error in selective_query (user: {self.id}, percent: {percent}): {e}",
+                "Error in selective_query (user: %s, percent: %s): %s",
+                self.id,
+                percent,
+                e,
                 exc_info=True,
             )
             raise
@@ -613,7 +645,10 @@ class ArkivL3User(JsonRpcUser):
             annotation_str = ", ".join(annotation_values)
             
             logging.info(
-                f"Selective query by attribute for {percent}% with selectors: {annotation_str} (user: {self.id})"
+                "Selective query by attribute for %s%% with selectors: %s (user: %s)",
+                percent,
+                annotation_str,
+                self.id,
             )
             w3 = self._initialize_account_and_w3()
 
@@ -639,12 +674,19 @@ class ArkivL3User(JsonRpcUser):
             Metrics.get_metrics().record_query(percent, duration, len(entities))
 
             logging.info(
-                f"Found {len(entities)} entities with selectors {annotation_str} (target: {percent}%) (user: {self.id})"
+                "Found %s entities with selectors %s (target: %s%%) (user: %s)",
+                len(entities),
+                annotation_str,
+                percent,
+                self.id,
             )
-            logging.debug(f"Result: {result} (user: {self.id})")
+            logging.debug("Result: %s (user: %s)", result, self.id)
         except Exception as e:
             logging.error(
-                f"Error in selective_query_by_attribute (user: {self.id}, percent: {percent}): {e}",
+                "Error in selective_query_by_attribute (user: %s, percent: %s): %s",
+                self.id,
+                percent,
+                e,
                 exc_info=True,
             )
             raise
@@ -710,23 +752,19 @@ class ArkivL3User(JsonRpcUser):
     @task(1)
     def retrieve_keys_to_count(self):
         try:
-            logging.info(f"Retrieving offers")
-            w3 = Arkiv(
-                web3.HTTPProvider(
-                    endpoint_uri=self.client.base_url, session=self.client
-                )
-            )
+            logging.info("Retrieving offers")
+            w3 = Arkiv(self.rpc_provider())
             result = w3.arkiv.query_entities(
                 query='ArkivEntityType="StressedEntity"',
                 options=to_query_options(fields=KEY, max_results_per_page=MAX_RESULTS_PER_PAGE),
             )
 
-            logging.debug(f"Result: {result} (user: {self.id})")
+            logging.debug("Result: %s (user: %s)", result, self.id)
             entities = [entity for entity in result]
-            logging.info(f"Keys: {len(entities)}")
+            logging.info("Keys: %s", len(entities))
         except Exception as e:
             logging.error(
-                f"Error in retrieve_keys_to_count (user: {self.id}): {e}", exc_info=True
+                "Error in retrieve_keys_to_count (user: %s): %s", self.id, e, exc_info=True
             )
             raise
 
@@ -739,12 +777,12 @@ class ArkivL3User(JsonRpcUser):
                 and config.image_to_run
                 and config.fresh_container_for_each_test
             ):
-                gb_container = launch_image(config.image_to_run)
+                gb_container = launch_local_chain(config.image_to_run)
 
             w3 = self._initialize_account_and_w3()
 
             nonce = w3.eth.get_transaction_count(self.account.address)
-            logging.info(f"Nonce: {nonce}")
+            logging.info("Nonce: %s", nonce)
 
             start_time = time.perf_counter()
             w3.arkiv.create_entity(
@@ -757,7 +795,7 @@ class ArkivL3User(JsonRpcUser):
 
             Metrics.get_metrics().record_transaction(len(simple_payload), duration)
         except Exception as e:
-            logging.error(f"Error: {e}", exc_info=True)
+            logging.error("Error: %s", e, exc_info=True)
             raise
         finally:
             if gb_container:
@@ -1,5 +1,4 @@
 import logging
-import logging.config
 import time
 import itertools
 import sys
@@ -17,7 +16,6 @@ from eth_account.signers.local import LocalAccount
 from locust import FastHttpUser, task, between, events
 from web3 import Web3
 import web3
-from eth_account import Account
 from golem_base_sdk.utils import rlp_encode_transaction, GolemBaseTransaction
 from golem_base_sdk.types import (
     GolemBaseCreate,
@@ -27,17 +25,18 @@ from golem_base_sdk.types import (
 )
 
 import stress.tools.config as config
-from stress.tools.utils import launch_image, build_account_path
+from stress.tools.account_registry import AccountRegistry
+from stress.tools.logging_setup import configure_logging
+from stress.tools.local_chain import launch_local_chain
 
 # JSON data as one-line Python string
 # offer_json_data = b'{"offer":{"constraints":"(&\\n  (golem.srv.comp.expiration>1653219330118)\\n  (golem.node.debug.subnet=0987)\\n)","offerId":"7f2f81f213dd48549e080d774dbf1bc2-076a8cbae6546e5f158e5b4d3a869f25a8e2ae426279a691e7ee45315efa3d83","properties":{"golem":{"activity":{"caps":{"transfer":{"protocol":["http","https","gftp"]}}},"com":{"payment":{"debit-notes":{"accept-timeout?":240},"platform":{"erc20-rinkeby-tglm":{"address":"0x86a269498fb5270f20bdc6fdcf6039122b0d3b23"},"zksync-rinkeby-tglm":{"address":"0x86a269498fb5270f20bdc6fdcf6039122b0d3b23"}}},"pricing":{"model":{"@tag":"linear","linear":{"coeffs":[0.0002777777777777778,0.001388888888888889,0.0]}}},"scheme":"payu","usage":{"vector":["golem.usage.duration_sec","golem.usage.cpu_sec"]}},"inf":{"cpu":{"architecture":"x86_64","capabilities":["sse3","pclmulqdq","dtes64","monitor","dscpl","vmx","eist","tm2","ssse3","fma","cmpxchg16b","pdcm","pcid","sse41","sse42","x2apic","movbe","popcnt","tsc_deadline","aesni","xsave","osxsave","avx","f16c","rdrand","fpu","vme","de","pse","tsc","msr","pae","mce","cx8","apic","sep","mtrr","pge","mca","cmov","pat","pse36","clfsh","ds","acpi","mmx","fxsr","sse","sse2","ss","htt","tm","pbe","fsgsbase","adjust_msr","smep","rep_movsb_stosb","invpcid","deprecate_fpu_cs_ds","mpx","rdseed","rdseed","adx","smap","clflushopt","processor_trace","sgx","sgx_lc"],"cores":6,"model":"Stepping 10 Family 6 Model 158","threads":11,"vendor":"GenuineIntel"},"mem":{"gib":28.0},"storage":{"gib":57.276745605468754}},"node":{"debug":{"subnet":"0987"},"id":{"name":"nieznanysprawiciel-laptop-Provider-2"}},"runtime":{"capabilities":["vpn"],"name":"vm","version":"0.2.10"},"srv":{"caps":{"multi-activity":true}}}},"providerId":"0x86a269498fb5270f20bdc6fdcf6039122b0d3b23","timestamp":"2022-05-22T11:35:49.290821396Z"},"proposedSignature":"NoSignature","state":"Pending","timestamp":"2022-05-22T11:35:49.290821396Z","validTo":"2022-05-22T12:35:49.280650Z"}'
 offer_json_data = b"Hello Golem DB Workshop!"
-Account.enable_unaudited_hdwallet_features()
 id_iterator = None
 
 founder_account: LocalAccount | None = None
 
-logging.info(f"Using mnemonic: {config.mnemonic}, users: {config.users}")
+logging.info("Using mnemonic: %s, users: %s", config.mnemonic, config.users)
 
 
 def prepare_tx_data(account: LocalAccount, nonce: int) -> dict:
@@ -77,16 +76,22 @@ def topup_local_account(account: LocalAccount, w3: Web3):
             "value": Web3.to_wei(10, "ether"),
         }
     )
-    logging.info(f"Transaction hash: {tx_hash}")
+    logging.info("Transaction hash: %s", tx_hash)
 
 
 gb_container = None
 
 
+@events.init.add_listener
+def on_locust_init(environment, **kwargs):
+    """Replace locust's logging handlers with the process-wide queue-based logging."""
+    configure_logging()
+
+
 @events.test_start.add_listener
 def on_test_start(environment, **kwargs):
     logging.info(
-        f"A new test is starting with nr of users {environment.runner.target_user_count}"
+        "A new test is starting with nr of users %s", environment.runner.target_user_count
     )
     global id_iterator
     id_iterator = itertools.count(0)
@@ -97,8 +102,8 @@ def on_test_start(environment, **kwargs):
         and not config.fresh_container_for_each_test
     ):
         global gb_container
-        gb_container = launch_image(config.image_to_run)
-        logging.info(f"A new test is starting and a new container is launched")
+        gb_container = launch_local_chain(config.image_to_run)
+        logging.info("A new test is starting and a new container is launched")
 
 
 @events.test_stop.add_listener
@@ -111,7 +116,7 @@ def on_test_stop(environment, **kwargs):
         global gb_container
         if gb_container:
             gb_container.stop()
-        logging.info(f"A new test is ending and the container is stopped")
+        logging.info("A new test is ending and the container is stopped")
 
 
 class GolemBaseUser(FastHttpUser):
@@ -121,32 +126,9 @@ class GolemBaseUser(FastHttpUser):
         super().__init__(*args, **kwargs)
         self.id = 0
 
-        logging.config.dictConfig(
-            {
-                "version": 1,
-                "formatters": {
-                    "default": {
-                        "format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-                    }
-                },
-                "handlers": {
-                    "console": {
-                        "class": "logging.StreamHandler",
-                        "formatter": "default",
-                    },
-                    "file": {
-                        "class": "logging.FileHandler",
-                        "formatter": "default",
-                        "filename": "locust.log",
-                    },
-                },
-                "root": {"handlers": ["console", "file"], "level": config.log_level},
-            }
-        )
-
     def on_start(self):
         self.id = next(id_iterator)
-        logging.info(f"User started with id: {self.id}")
+        logging.info("User started with id: %s", self.id)
 
     @task
     def store_offer(self):
@@ -157,16 +139,13 @@ class GolemBaseUser(FastHttpUser):
                 and config.image_to_run
                 and config.fresh_container_for_each_test
             ):
-                gb_container = launch_image(config.image_to_run)
+                gb_container = launch_local_chain(config.image_to_run)
 
-            account_path = build_account_path(self.id)
-            account: LocalAccount = Account.from_mnemonic(
-                config.mnemonic, account_path=account_path
-            )
-            logging.info(f"Account: {account.address}")
+            account: LocalAccount = AccountRegistry.get().account(self.id)
+            logging.info("Account: %s", account.address)
 
-            logging.info(f"Connecting to Golem Base")
-            logging.info(f"Base URL: {self.client.base_url}")
+            logging.info("Connecting to Golem Base")
+            logging.info("Base URL: %s", self.client.base_url)
             w3 = Web3(
                 web3.HTTPProvider(
                     endpoint_uri=self.client.base_url, session=self.client
@@ -180,7 +159,7 @@ class GolemBaseUser(FastHttpUser):
                 raise Exception("Not connected to Golem Base")
 
             balance = w3.eth.get_balance(account.address)
-            logging.info(f"Balance: {balance}")
+            logging.info("Balance: %s", balance)
             if balance == 0:
                 if config.chain_env == "local":
                     topup_local_account(account, w3)
@@ -191,11 +170,11 @@ class GolemBaseUser(FastHttpUser):
                     raise Exception("Not enough balance to send transaction")
 
             nonce = w3.eth.get_transaction_count(account.address)
-            logging.info(f"Nonce: {nonce}")
+            logging.info("Nonce: %s", nonce)
 
-            logging.info(f"Signing transaction with key: {account.key}")
+            logging.info("Signing transaction with key: %s", account.key)
             signed_tx = account.sign_transaction(prepare_tx_data(account, nonce))
-            logging.debug(f"Transaction: {signed_tx}")
+            logging.debug("Transaction: %s", signed_tx)
 
             response = self.client.post(
                 self.client.base_url,
@@ -208,14 +187,14 @@ class GolemBaseUser(FastHttpUser):
                 name="eth_sendRawTransaction",
             )
             if response.status_code != 200:
-                logging.error(f"Failed to send transaction: {response.json()}")
+                logging.error("Failed to send transaction: %s", response.json())
                 raise Exception(f"Failed to send transaction: {response.json()}")
             logging.info(
-                f"Transaction sent of user {account.address}: {response.json()}"
+                "Transaction sent of user %s: %s", account.address, response.json()
             )
             tx_hash = response.json().get("result", None)
             if not tx_hash:
-                logging.error(f"Failed to get transaction hash: {response.json()}")
+                logging.error("Failed to get transaction hash: %s", response.json())
                 raise Exception(f"Failed to get transaction hash: {response.json()}")
 
             # wair for transaaction to be mined and for the receipt to be available
@@ -232,7 +211,7 @@ class GolemBaseUser(FastHttpUser):
                     },
                     name="eth_getTransactionByHash",
                 )
-                logging.debug(f"Transaction: {response.json()}")
+                logging.debug("Transaction: %s", response.json())
 
                 response = self.client.post(
                     self.client.base_url,
@@ -244,27 +223,27 @@ class GolemBaseUser(FastHttpUser):
                     },
                     name="eth_getTransactionReceipt",
                 )
-                logging.debug(f"Transaction receipt: {response.json()}")
+                logging.debug("Transaction receipt: %s", response.json())
                 if response.ok:
-                    logging.debug(f"Transaction receipt result: {response.json()}")
+                    logging.debug("Transaction receipt result: %s", response.json())
                     receipt = response.json().get("result", None)
                     if receipt:
                         logging.info(
-                            f"Transaction of user {account.address} mined: {receipt}"
+                            "Transaction of user %s mined: %s", account.address, receipt
                         )
                         break
                     else:
-                        logging.info(f"Transaction {tx_hash} not found yet")
+                        logging.info("Transaction %s not found yet", tx_hash)
                 if timeout and time.time() - start_time > timeout:
                     logging.error(
-                        f"Transaction {tx_hash} not found after {timeout} seconds"
+                        "Transaction %s not found after %s seconds", tx_hash, timeout
                     )
                     raise Exception(
                         f"Transaction {tx_hash} not found after {timeout} seconds"
                     )
                 time.sleep(0.2)
         except Exception as e:
-            logging.error(f"Error: {e}", exc_info=True)
+            logging.error("Error: %s", e, exc_info=True)
             raise
         finally:
             if gb_container:
@@ -284,8 +263,8 @@ class GolemBaseUser(FastHttpUser):
         )
 
         if response.ok:
-            logging.info(f"Offers: {response.json().get('result', 0)}")
+            logging.info("Offers: %s", response.json().get('result', 0))
         else:
             logging.warning(
-                f"Failed to retrieve offers: {response.content}, response to: {response.request.get_full_url()}"
+                "Failed to retrieve offers: %s, response to: %s", response.content, response.request.get_full_url()
             )
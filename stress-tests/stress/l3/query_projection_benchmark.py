@@ -0,0 +1,203 @@
+"""
+Field-projection benchmark for query_entities.
+
+Runs the same DC query shapes with each field projection (KEY, ATTRIBUTES,
+PAYLOAD, ALL) and a range of result sizes, to quantify how much payload
+transfer and decoding cost on the node and on the client.
+
+Every combination is measured with two clients:
+
+- raw: a plain `arkiv_query` JSON-RPC POST. Reported to locust as
+  `raw[<projection>] <shape>@<limit>` with the response size, followed by the
+  client-side decode time split into JSON parsing (`json[...]`) and the SDK
+  conversion to entities (`sdk_decode[...]`).
+- sdk: `query_entities_page` of the Arkiv SDK, end to end (`sdk[...]`).
+
+The same numbers are recorded in the loadtest_projection_* Prometheus metrics.
+
+Usage:
+    locust -f stress/l3/query_projection_benchmark.py --host=http://localhost:8545
+
+Environment variables:
+    BENCH_RESULT_LIMITS: comma separated result sizes (default: 10,100,1000)
+"""
+
+import itertools
+import json
+import os
+import random
+import socket
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Optional
+
+from arkiv import Arkiv
+from arkiv.types import ALL, ATTRIBUTES, KEY, PAYLOAD
+from arkiv.utils import to_query_options, to_query_result, to_rpc_query_options
+from locust import constant, events, task
+from web3.datastructures import AttributeDict
+
+# Add the project root (stress-tests/) to Python path so we can import stress.*
+file_dir = Path(__file__).resolve().parent
+project_root = file_dir.parent.parent  # l3/ -> stress/ -> stress-tests/
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from stress.tools.json_rpc_user import JsonRpcUser
+from stress.tools.metrics import Metrics
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+PROJECTIONS = {
+    "key": KEY,
+    "attributes": ATTRIBUTES,
+    "payload": PAYLOAD,
+    "all": ALL,
+}
+
+# Query shapes taken from the DC read tests (see dc_read_only.py)
+QUERY_SHAPES = {
+    "type_only": 'type="node"',
+    "node_filter": 'status="available" && type="node" && cpu_count>=8 && ram_gb>=32',
+    "workload_simple": 'status="pending" && type="workload"',
+    "workload_specific": 'status="pending" && type="workload" && region="eu-west" && vm_type="gpu"',
+}
+
+# Result sizes (single page, resultsPerPage)
+RESULT_LIMITS = [int(limit) for limit in os.getenv("BENCH_RESULT_LIMITS", "10,100,1000").split(",")]
+
+COMBINATIONS = list(itertools.product(PROJECTIONS, QUERY_SHAPES, RESULT_LIMITS))
+
+
+def _fire(request_type: str, name: str, duration: timedelta, response_length: int = 0,
+          exception: Optional[BaseException] = None) -> None:
+    events.request.fire(
+        request_type=request_type,
+        name=name,
+        response_time=duration.total_seconds() * 1000,
+        response_length=response_length,
+        exception=exception,
+        context={},
+        response=None,
+    )
+
+
+# =============================================================================
+# Locust User Class
+# =============================================================================
+
+class QueryProjectionUser(JsonRpcUser):
+    """Runs every (projection, query shape, result size) combination with the raw and SDK clients."""
+
+    wait_time = constant(0)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.w3: Arkiv | None = None
+        self._request_ids = itertools.count(1)
+        # Each user walks the whole matrix, starting at a random point so users don't move in lockstep
+        offset = random.randrange(len(COMBINATIONS))
+        self._raw_combinations = itertools.cycle(COMBINATIONS[offset:] + COMBINATIONS[:offset])
+        self._sdk_combinations = itertools.cycle(COMBINATIONS[offset:] + COMBINATIONS[:offset])
+
+    def on_start(self):
+        super().on_start()
+        self.w3 = Arkiv(self.rpc_provider())
+
+    @task
+    def raw_query(self):
+        """arkiv_query over plain JSON-RPC, with response size and decode times."""
+        projection, shape, limit = next(self._raw_combinations)
+        fields = PROJECTIONS[projection]
+        label = f"{shape}@{limit}"
+        options = to_query_options(fields=fields, max_results_per_page=limit)
+        body = json.dumps(
+            {
+                "jsonrpc": "2.0",
+                "id": next(self._request_ids),
+                "method": "arkiv_query",
+                "params": [QUERY_SHAPES[shape], to_rpc_query_options(options)],
+            }
+        ).encode("utf-8")
+
+        start = time.perf_counter()
+        with self.client.post(
+            "",
+            data=body,
+            headers={"Content-Type": "application/json"},
+            name=f"raw[{projection}] {label}",
+            catch_response=True,
+        ) as response:
+            duration = timedelta(seconds=time.perf_counter() - start)
+            if not response.ok:
+                # Reported as a failure with its status code on leaving the block
+                return
+            content = response.content
+
+            start = time.perf_counter()
+            try:
+                decoded = json.loads(content)
+            except ValueError as e:
+                response.failure(f"Invalid JSON-RPC response: {e}")
+                return
+            json_time = timedelta(seconds=time.perf_counter() - start)
+            if "result" not in decoded:
+                # A JSON-RPC error comes with HTTP 200: report it as a failure
+                response.failure(f"arkiv_query error: {decoded.get('error', 'no result')}")
+                return
+
+        # Same conversion the SDK applies to arkiv_query results (web3 wraps them in AttributeDicts)
+        start = time.perf_counter()
+        page = to_query_result(fields, AttributeDict.recursive(decoded["result"]))
+        sdk_time = timedelta(seconds=time.perf_counter() - start)
+
+        _fire("decode", f"json[{projection}] {label}", json_time, len(content))
+        _fire("decode", f"sdk_decode[{projection}] {label}", sdk_time, len(page.entities))
+        Metrics.get_metrics().record_projection_query(
+            projection,
+            label,
+            "raw",
+            duration,
+            response_bytes=len(content),
+            decode_times={"json": json_time, "sdk": sdk_time},
+        )
+
+    @task
+    def sdk_query(self):
+        """query_entities_page through the Arkiv SDK, end to end."""
+        projection, shape, limit = next(self._sdk_combinations)
+        label = f"{shape}@{limit}"
+        options = to_query_options(fields=PROJECTIONS[projection], max_results_per_page=limit)
+
+        start = time.perf_counter()
+        exc: Optional[BaseException] = None
+        result_size = 0
+        try:
+            page = self.w3.arkiv.query_entities_page(QUERY_SHAPES[shape], options=options)
+            result_size = len(page.entities)
+        except Exception as e:
+            exc = e
+        duration = timedelta(seconds=time.perf_counter() - start)
+
+        _fire("arkiv", f"sdk[{projection}] {label}", duration, result_size, exc)
+        if exc is None:
+            Metrics.get_metrics().record_projection_query(projection, label, "sdk", duration)
+
+
+@events.test_start.add_listener
+def on_test_start(environment, **kwargs):
+    Metrics.reset_global_metrics()
+    Metrics.get_metrics().initialize(instance_id=socket.gethostname())
+
+    print("=" * 60)
+    print("Initializing field-projection benchmark")
+    print("=" * 60)
+    print(f"Projections: {list(PROJECTIONS)}")
+    print(f"Query shapes: {list(QUERY_SHAPES)}")
+    print(f"Result limits: {RESULT_LIMITS}")
+    print()
@@ -0,0 +1,192 @@
+"""
+Registry of the accounts derived from the load test mnemonic.
+
+`Account.from_mnemonic` stretches the mnemonic (PBKDF2, 2048 rounds) and
+walks the whole BIP-32 path for every account, which makes ramping up
+thousands of users CPU-bound. The registry stretches the mnemonic once,
+caches the intermediate BIP-32 nodes and their public keys (so each account
+only derives its last path component) and keeps the derived `LocalAccount`
+objects in-process:
+
+    account = AccountRegistry.get().account(self.id)
+
+With ACCOUNT_KEYFILE set, derived private keys are also cached in that JSON
+file (written with mode 0600 at exit, or by `save()`) and reused by the next
+runs and tools on the same machine. The file is bound to the mnemonic by a
+fingerprint and ignored when the mnemonic changes. It holds private keys:
+use it for test mnemonics only.
+
+Creating a `LocalAccount` computes its public key, which eth-keys does in pure
+Python unless coincurve is installed (`poetry install --with speedups`).
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Optional
+
+from eth_account import Account
+from eth_account.hdaccount import seed_from_mnemonic
+from eth_account.hdaccount.deterministic import (
+    SECP256K1_N,
+    Node,
+    SoftNode,
+    derive_child_key,
+    ec_point,
+    hmac_sha512,
+)
+from eth_account.signers.local import LocalAccount
+
+import stress.tools.config as config
+from stress.tools.utils import build_account_path
+
+ACCOUNT_KEYFILE = os.getenv("ACCOUNT_KEYFILE", "")
+
+
+class AccountRegistry:
+    """Derives each account path of a mnemonic once and hands out cached `LocalAccount` objects."""
+
+    _instance = None
+
+    @classmethod
+    def get(cls) -> "AccountRegistry":
+        """The registry of the configured mnemonic (and ACCOUNT_KEYFILE)"""
+        if cls._instance is None:
+            cls._instance = cls(config.mnemonic, ACCOUNT_KEYFILE)
+        return cls._instance
+
+    def __init__(self, mnemonic: str, keyfile: str = ""):
+        self.mnemonic = mnemonic
+        self.keyfile = keyfile
+        self._fingerprint = hashlib.sha256(mnemonic.encode()).hexdigest()
+        self._seed: Optional[bytes] = None
+        # path prefix -> (key, chain code) of the BIP-32 node
+        self._nodes: dict[str, tuple[bytes, bytes]] = {}
+        # path prefix -> compressed public key of the node (parent of soft children)
+        self._points: dict[str, bytes] = {}
+        # path -> private key
+        self._keys: dict[str, bytes] = {}
+        self._accounts: dict[str, LocalAccount] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        if keyfile:
+            self._load()
+
+    # -------------------------------------------------------------------------
+    # Derivation
+    # -------------------------------------------------------------------------
+
+    def _node(self, path: str) -> tuple[bytes, bytes]:
+        node = self._nodes.get(path)
+        if node is not None:
+            return node
+        if path == "m":
+            if self._seed is None:
+                self._seed = seed_from_mnemonic(self.mnemonic, "")
+            master = hmac_sha512(b"Bitcoin seed", self._seed)
+            node = (master[:32], master[32:])
+        else:
+            parent, _, child = path.rpartition("/")
+            if not parent:
+                raise ValueError(f"Invalid account path {path!r}, expected m/...")
+            child_node = Node.decode(child)
+            parent_key, parent_chain_code = self._node(parent)
+            if isinstance(child_node, SoftNode):
+                # Soft children hash the parent's public key: compute it once for all siblings
+                node = self._soft_child(parent, parent_key, parent_chain_code, child_node)
+            else:
+                node = derive_child_key(parent_key, parent_chain_code, child_node)
+        self._nodes[path] = node
+        return node
+
+    def _soft_child(self, parent: str, parent_key: bytes, parent_chain_code: bytes, node) -> tuple[bytes, bytes]:
+        parent_point = self._points.get(parent)
+        if parent_point is None:
+            parent_point = self._points[parent] = ec_point(parent_key)
+        child = hmac_sha512(parent_chain_code, parent_point + node.serialize())
+        child_int = int.from_bytes(child[:32], "big")
+        child_key = (child_int + int.from_bytes(parent_key, "big")) % SECP256K1_N
+        if child_int >= SECP256K1_N or child_key == 0:
+            # Invalid key (< 2**-127 probability): BIP-32 proceeds with the next index
+            return derive_child_key(parent_key, parent_chain_code, node)
+        return child_key.to_bytes(32, "big"), child[32:]
+
+    def private_key(self, path: str) -> bytes:
+        """Private key of the account at the BIP-32 `path` (e.g. m/44'/60'/0'/0/3)"""
+        with self._lock:
+            key = self._keys.get(path)
+            if key is None:
+                key = self._keys[path] = self._node(path)[0]
+                self._dirty = True
+            return key
+
+    def account_at(self, path: str) -> LocalAccount:
+        """`LocalAccount` at the BIP-32 `path`"""
+        account = self._accounts.get(path)
+        if account is None:
+            account = self._accounts[path] = Account.from_key(self.private_key(path))
+        return account
+
+    def account(self, user_index: int) -> LocalAccount:
+        """`LocalAccount` of the locust user `user_index` on this instance (see `build_account_path`)"""
+        return self.account_at(build_account_path(user_index))
+
+    def accounts(self, count: int, start: int = 0) -> list[LocalAccount]:
+        """Accounts of the user indexes start..start+count-1"""
+        return [self.account(index) for index in range(start, start + count)]
+
+    # -------------------------------------------------------------------------
+    # Keyfile
+    # -------------------------------------------------------------------------
+
+    def _load(self):
+        try:
+            with open(self.keyfile) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logging.warning("AccountRegistry: ignoring unreadable keyfile %s: %s", self.keyfile, e)
+            return
+        if data.get("fingerprint") != self._fingerprint:
+            logging.warning("AccountRegistry: keyfile %s belongs to another mnemonic, ignoring it", self.keyfile)
+            return
+        self._keys.update({path: bytes.fromhex(key[2:]) for path, key in data.get("keys", {}).items()})
+        logging.info("AccountRegistry: loaded %s keys from %s", len(self._keys), self.keyfile)
+
+    def save(self):
+        """Write the derived keys to the keyfile (merged with keys other processes wrote meanwhile)."""
+        if not self.keyfile:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            keys = {path: "0x" + key.hex() for path, key in self._keys.items()}
+            self._dirty = False
+        try:
+            with open(self.keyfile) as f:
+                existing = json.load(f)
+            if existing.get("fingerprint") == self._fingerprint:
+                keys = {**existing.get("keys", {}), **keys}
+        except (OSError, ValueError):
+            pass
+
+        directory = os.path.dirname(os.path.abspath(self.keyfile))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.keyfile}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump({"fingerprint": self._fingerprint, "keys": keys}, f)
+        os.replace(tmp_path, self.keyfile)
+        logging.info("AccountRegistry: wrote %s keys to %s", len(keys), self.keyfile)
+
+
+# At exit rather than on locust's quitting event: the standalone tools use the registry too, and
+# importing locust there would monkey-patch ssl after requests and web3 already loaded it
+@atexit.register
+def save_at_exit():
+    if AccountRegistry._instance is not None:
+        AccountRegistry._instance.save()
@@ -1,21 +1,38 @@
+import functools
 import itertools
 import logging
-import logging.config
+from contextlib import contextmanager
 
 from locust import FastHttpUser, events
+from locust.runners import LocalRunner, MasterRunner
 
-import stress.tools.config as config
+import stress.tools.block_inclusion  # noqa: F401 (registers the per-block inclusion recording)
+import stress.tools.harness_monitor  # noqa: F401 (registers the load generator self-monitoring)
+import stress.tools.metrics_aggregation  # noqa: F401 (registers the aggregate metrics mode)
+import stress.tools.request_log  # noqa: F401 (registers the request log sink)
+from stress.tools.local_prefund import prefund_enabled, prefund_user_accounts
+from stress.tools.logging_setup import configure_logging
 from stress.tools.metrics import Metrics
 
 # Global user ID iterator
 id_iterator = None
+FIRST_USER_ID = 20
+
+
+@events.init.add_listener
+def on_locust_init_base_user(environment, **kwargs):
+    """Replace locust's logging handlers with the process-wide queue-based logging."""
+    configure_logging()
+    # Added now, after the locustfile's own test_start listeners (which may launch the dev chain)
+    if prefund_enabled() and isinstance(environment.runner, (MasterRunner, LocalRunner)):
+        environment.events.test_start.add_listener(functools.partial(prefund_user_accounts, first_user_id=FIRST_USER_ID))
 
 
 @events.test_start.add_listener
 def on_test_start_base_user(environment, **kwargs):
     """Initialize the global ID iterator when test starts."""
     global id_iterator
-    id_iterator = itertools.count(20)
+    id_iterator = itertools.count(FIRST_USER_ID)
 
 
 class BaseUser(FastHttpUser):
@@ -23,7 +40,7 @@ class BaseUser(FastHttpUser):
     Base user class that handles common functionality:
     - User ID generation
     - Metrics tracking (current user count)
-    - Logging configuration
+    - Request context (extra fields attached to the request events of this user)
     """
 
     abstract = True
@@ -31,37 +48,29 @@ class BaseUser(FastHttpUser):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.id = 0
+        # Merged into the context of every request event fired by this user (see request_log)
+        self.request_context: dict = {}
+
+    def context(self) -> dict:
+        return {"user_id": self.id, **self.request_context}
 
-        logging.config.dictConfig(
-            {
-                "version": 1,
-                "formatters": {
-                    "default": {
-                        "format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-                    }
-                },
-                "handlers": {
-                    "console": {
-                        "class": "logging.StreamHandler",
-                        "formatter": "default",
-                    },
-                    "file": {
-                        "class": "logging.FileHandler",
-                        "formatter": "default",
-                        "filename": "locust.log",
-                    },
-                },
-                "root": {"handlers": ["console", "file"], "level": config.log_level},
-            }
-        )
+    @contextmanager
+    def request_fields(self, **fields):
+        """Attach `fields` to the context of the requests fired inside the block."""
+        self.request_context.update(fields)
+        try:
+            yield
+        finally:
+            for key in fields:
+                self.request_context.pop(key, None)
 
     def on_start(self):
         global id_iterator
         self.id = next(id_iterator)
         Metrics.get_metrics().current_user_count.inc()
-        logging.info(f"User started with id: {self.id}")
+        logging.info("User started with id: %s", self.id)
 
     def on_stop(self):
         Metrics.get_metrics().current_user_count.dec()
-        logging.info(f"User stopped with id: {self.id}")
+        logging.info("User stopped with id: %s", self.id)
 
@@ -0,0 +1,63 @@
+"""
+Micro-benchmark of the per-observation cost of Metrics.record_query / record_transaction.
+
+Compares direct recording (prometheus_client calls on the caller) with buffered
+recording (append to the ring buffer on the caller, batch apply in the flusher).
+
+Usage (from stress-tests/):
+    python -m stress.tools.bench_metrics_recording [observations]
+"""
+
+import random
+import sys
+import time
+from datetime import timedelta
+
+from stress.tools.metrics import Metrics
+
+SELECTIVITIES = [0, 1, 5, 20, 40, 60, 80, 100]
+
+
+def _observations(count: int) -> list[tuple[int, timedelta, int]]:
+    rng = random.Random(42)
+    return [
+        (rng.choice(SELECTIVITIES), timedelta(milliseconds=rng.uniform(1, 2000)), rng.randint(0, 1000))
+        for _ in range(count)
+    ]
+
+
+def _ns_per_op(seconds: float, count: int) -> float:
+    return seconds / count * 1e9
+
+
+def bench(count: int) -> None:
+    observations = _observations(count)
+
+    direct = Metrics(buffered=False)
+    start = time.perf_counter()
+    for selectivity, duration, size in observations:
+        direct.record_query(selectivity, duration, size)
+        direct.record_transaction(size, duration, 1)
+    direct_time = time.perf_counter() - start
+
+    buffered = Metrics(buffered=True)
+    start = time.perf_counter()
+    for selectivity, duration, size in observations:
+        buffered.record_query(selectivity, duration, size)
+        buffered.record_transaction(size, duration, 1)
+    record_time = time.perf_counter() - start
+    start = time.perf_counter()
+    buffered.flush()
+    flush_time = time.perf_counter() - start
+    buffered.stop_push_task()
+
+    total = 2 * count
+    print(f"{total} observations")
+    print(f"  direct:            {_ns_per_op(direct_time, total):8.0f} ns/observation on the caller")
+    print(f"  buffered (record): {_ns_per_op(record_time, total):8.0f} ns/observation on the caller")
+    print(f"  buffered (flush):  {_ns_per_op(flush_time, total):8.0f} ns/observation in the flusher")
+    print(f"  dropped:           {buffered._buffer.dropped}")
+
+
+if __name__ == "__main__":
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
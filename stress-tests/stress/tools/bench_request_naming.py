@@ -0,0 +1,111 @@
+"""
+Micro-benchmark of the per-request CPU cost of naming JSON-RPC requests in JsonRpcUser.
+
+Compares the former wrapper (decode every POST body to find the RPC method and
+decode every response for a debug line) with requests named by
+LocustHTTPProvider (no decoding). The network is replaced by a canned response,
+so only the wrapper overhead is measured.
+
+Usage (from stress-tests/):
+    python -m stress.tools.bench_request_naming [requests]
+"""
+
+import json
+import logging
+import sys
+import time
+
+from locust.contrib.fasthttp import FastHttpSession
+from locust.env import Environment
+
+from stress.tools.json_rpc_user import JsonRpcUser
+
+
+class _CannedResponse:
+    ok = True
+
+    def __init__(self, content: bytes):
+        self.content = content
+        self.text = content.decode()
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def _cases() -> list[tuple[str, bytes, bytes]]:
+    """(method, request body, response body) of typical hot-path calls."""
+    raw_tx = "0x" + "ab" * 64 * 1024  # 64 KB payload write
+    send = json.dumps({"jsonrpc": "2.0", "id": 1, "method": "eth_sendRawTransaction", "params": [raw_tx]})
+    send_result = json.dumps({"jsonrpc": "2.0", "id": 1, "result": "0x" + "12" * 32})
+
+    query = json.dumps({"jsonrpc": "2.0", "id": 2, "method": "arkiv_query", "params": ["type=\"node\"", {}]})
+    entity = {
+        "key": "0x" + "34" * 32,
+        "stringAttributes": [{"key": f"attr{i}", "value": f"value-{i}"} for i in range(20)],
+        "numericAttributes": [{"key": f"num{i}", "value": i} for i in range(10)],
+    }
+    query_result = json.dumps({"jsonrpc": "2.0", "id": 2, "result": {"data": [entity] * 200, "blockNumber": "0x10"}})
+
+    receipt = json.dumps({"jsonrpc": "2.0", "id": 3, "method": "eth_getTransactionReceipt", "params": ["0x" + "12" * 32]})
+    receipt_result = json.dumps({"jsonrpc": "2.0", "id": 3, "result": {"blockNumber": "0x10", "logs": [], "status": "0x1"}})
+
+    return [
+        ("eth_sendRawTransaction (64 KB)", send.encode(), send_result.encode()),
+        ("arkiv_query (200 entities)", query.encode(), query_result.encode()),
+        ("eth_getTransactionReceipt", receipt.encode(), receipt_result.encode()),
+    ]
+
+
+def _legacy_request(original):
+    """The wrapper as it was before requests were named by the provider."""
+
+    def wrapped_request(*args, **kwargs):
+        call_name = kwargs.pop("name", None)
+        if args[0] == "POST" and call_name is None:
+            data = json.loads(kwargs["data"].decode("utf-8"))
+            call_name = data.get("method", None)
+        response = original(*args, name=call_name, **kwargs)
+        if response.ok:
+            logging.debug(f"{call_name} response: {response.json()}")
+        else:
+            logging.error(f"{call_name} Error response: {response.json()}")
+        return response
+
+    return wrapped_request
+
+
+def _us_per_request(fn, count: int) -> float:
+    start = time.perf_counter()
+    for _ in range(count):
+        fn()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def bench(count: int) -> None:
+    logging.getLogger().setLevel(logging.INFO)
+    canned = {}
+    FastHttpSession.request = lambda self, method, url, name=None, data=None, **kwargs: canned["response"]
+
+    class BenchUser(JsonRpcUser):
+        host = "http://localhost:8545"
+
+    user = BenchUser(Environment(user_classes=[BenchUser]))
+    named_request = user.client.request
+    legacy_request = _legacy_request(lambda *args, **kwargs: canned["response"])
+
+    print(f"{count} requests per case, wrapper CPU per request:")
+    print(f"{'case':<32} {'legacy (us)':>12} {'named (us)':>12} {'saved (us)':>12}")
+    for case, body, response in _cases():
+        canned["response"] = _CannedResponse(response)
+        legacy = _us_per_request(lambda body=body: legacy_request("POST", "/", data=body), count)
+        named = _us_per_request(
+            lambda body=body, case=case: named_request(
+                "POST", "/", data=body, name=case, context={"rpc_method": case}
+            ),
+            count,
+        )
+        print(f"{case:<32} {legacy:>12.1f} {named:>12.1f} {legacy - named:>12.1f}")
+
+
+if __name__ == "__main__":
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
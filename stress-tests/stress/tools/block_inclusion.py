@@ -0,0 +1,283 @@
+"""
+Per-block inclusion analytics.
+
+Recording: every process aggregates its own included transactions per block
+(transactions, entities, payload bytes, gas and submission times) from the
+receipts. Requests fired with `block_number` and `entity_count` in their
+context (see `BaseUser.request_fields`) are recorded automatically; other
+write paths call `BlockInclusion.get().record(...)`. With BLOCK_INCLUSION_DIR
+set, the aggregates are written to `inclusion-<host>-<pid>.json` in that
+directory at test stop.
+
+Report: joins the aggregates of all workers with the chain's block headers
+and reports the block fill ratio, the submitted-to-included lag and the
+per-block throughput distribution, i.e. whether blocks are full or the
+sequencer is under-driven:
+
+    python -m stress.tools.block_inclusion INCLUSION_DIR [--host URL] [--csv blocks.csv]
+"""
+
+import argparse
+import csv
+import glob
+import json
+import logging
+import math
+import os
+import socket
+import sys
+import threading
+from typing import Optional
+
+import requests
+from locust import events
+
+BLOCK_INCLUSION_DIR = os.getenv("BLOCK_INCLUSION_DIR", "")
+
+# Fields aggregated per block: [txs, entities, payload_bytes, gas_used, submitted_sum, submitted_min, submitted_max]
+TXS, ENTITIES, PAYLOAD_BYTES, GAS_USED, SUBMITTED_SUM, SUBMITTED_MIN, SUBMITTED_MAX = range(7)
+
+# Headers fetched per JSON-RPC batch by the report
+HEADER_BATCH_SIZE = 100
+
+# Mean gas fill ratio above which blocks are reported as full
+FULL_BLOCK_RATIO = 0.9
+
+
+class BlockInclusion:
+    """Per-block aggregates of this process's included transactions."""
+
+    _instance = None
+
+    @classmethod
+    def get(cls) -> "BlockInclusion":
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self):
+        self.blocks: dict[int, list] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        block_number: int,
+        submitted_at: float,
+        entities: int = 0,
+        payload_bytes: int = 0,
+        gas_used: Optional[int] = None,
+    ):
+        """Record one transaction included in `block_number`, submitted at `submitted_at` (unix time)."""
+        with self._lock:
+            block = self.blocks.get(block_number)
+            if block is None:
+                self.blocks[block_number] = [1, entities, payload_bytes, gas_used or 0, submitted_at, submitted_at,
+                                             submitted_at]
+                return
+            block[TXS] += 1
+            block[ENTITIES] += entities
+            block[PAYLOAD_BYTES] += payload_bytes
+            block[GAS_USED] += gas_used or 0
+            block[SUBMITTED_SUM] += submitted_at
+            block[SUBMITTED_MIN] = min(block[SUBMITTED_MIN], submitted_at)
+            block[SUBMITTED_MAX] = max(block[SUBMITTED_MAX], submitted_at)
+
+    def reset(self):
+        with self._lock:
+            self.blocks = {}
+
+    def dump(self, path: str):
+        with self._lock:
+            blocks = [[number, *values] for number, values in sorted(self.blocks.items())]
+        with open(path, "w") as f:
+            json.dump({"instance": socket.gethostname(), "blocks": blocks}, f)
+        logging.info(f"Block inclusion data ({len(blocks)} blocks) written to {path}")
+
+
+# =============================================================================
+# Locust hooks
+# =============================================================================
+
+@events.test_start.add_listener
+def on_test_start(environment, **kwargs):
+    BlockInclusion.get().reset()
+
+
+@events.request.add_listener
+def on_request(context=None, exception=None, start_time=None, **kwargs):
+    if exception is not None or not context or start_time is None:
+        return
+    block_number = context.get("block_number")
+    entity_count = context.get("entity_count")
+    if block_number is None or entity_count is None:
+        return
+    BlockInclusion.get().record(
+        block_number, start_time, entity_count, context.get("payload_bytes") or 0, context.get("gas_used")
+    )
+
+
+@events.test_stop.add_listener
+def on_test_stop(environment, **kwargs):
+    inclusion = BlockInclusion.get()
+    if BLOCK_INCLUSION_DIR and inclusion.blocks:
+        os.makedirs(BLOCK_INCLUSION_DIR, exist_ok=True)
+        inclusion.dump(os.path.join(BLOCK_INCLUSION_DIR, f"inclusion-{socket.gethostname()}-{os.getpid()}.json"))
+
+
+# =============================================================================
+# Report
+# =============================================================================
+
+def load_blocks(directory: str) -> dict[int, list]:
+    """Merge the per-block aggregates of all inclusion-*.json files in `directory`."""
+    merged: dict[int, list] = {}
+    for path in sorted(glob.glob(os.path.join(directory, "inclusion-*.json"))):
+        with open(path) as f:
+            for number, *values in json.load(f)["blocks"]:
+                block = merged.get(number)
+                if block is None:
+                    merged[number] = values
+                    continue
+                for field in (TXS, ENTITIES, PAYLOAD_BYTES, GAS_USED, SUBMITTED_SUM):
+                    block[field] += values[field]
+                block[SUBMITTED_MIN] = min(block[SUBMITTED_MIN], values[SUBMITTED_MIN])
+                block[SUBMITTED_MAX] = max(block[SUBMITTED_MAX], values[SUBMITTED_MAX])
+    return merged
+
+
+def fetch_headers(host: str, first: int, last: int) -> dict[int, dict]:
+    """Block headers first..last (inclusive), fetched in JSON-RPC batches."""
+    headers = {}
+    with requests.Session() as session:
+        for start in range(first, last + 1, HEADER_BATCH_SIZE):
+            numbers = range(start, min(start + HEADER_BATCH_SIZE, last + 1))
+            payload = [
+                {"jsonrpc": "2.0", "id": number, "method": "eth_getBlockByNumber", "params": [hex(number), False]}
+                for number in numbers
+            ]
+            response = session.post(host, json=payload, timeout=60)
+            response.raise_for_status()
+            for item in response.json():
+                block = item.get("result")
+                if block is not None:
+                    headers[item["id"]] = {
+                        "timestamp": int(block["timestamp"], 16),
+                        "gas_used": int(block["gasUsed"], 16),
+                        "gas_limit": int(block["gasLimit"], 16),
+                        "tx_count": len(block["transactions"]),
+                        "size": int(block["size"], 16),
+                    }
+    return headers
+
+
+def _percentile(values: list[float], quantile: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(quantile * len(ordered)) - 1))]
+
+
+def _distribution(values: list[float]) -> str:
+    return (
+        f"p50 {_percentile(values, 0.5):.1f}  p90 {_percentile(values, 0.9):.1f}  "
+        f"p99 {_percentile(values, 0.99):.1f}  max {max(values, default=0):.1f}"
+    )
+
+
+def block_rows(ours: dict[int, list], headers: dict[int, dict]) -> list[dict]:
+    """One row per block of the run's range, joining our aggregates with the chain header."""
+    rows = []
+    for number in sorted(headers):
+        header = headers[number]
+        block = ours.get(number)
+        row = {
+            "block": number,
+            "timestamp": header["timestamp"],
+            "chain_txs": header["tx_count"],
+            "gas_used": header["gas_used"],
+            "gas_limit": header["gas_limit"],
+            "fill_ratio": header["gas_used"] / header["gas_limit"] if header["gas_limit"] else 0.0,
+            "size": header["size"],
+            "our_txs": block[TXS] if block else 0,
+            "our_entities": block[ENTITIES] if block else 0,
+            "our_payload_bytes": block[PAYLOAD_BYTES] if block else 0,
+            "our_gas_used": block[GAS_USED] if block else 0,
+            # Block timestamps have a resolution of one second
+            "mean_lag": header["timestamp"] - block[SUBMITTED_SUM] / block[TXS] if block else None,
+            "max_lag": header["timestamp"] - block[SUBMITTED_MIN] if block else None,
+        }
+        rows.append(row)
+    return rows
+
+
+def text_report(rows: list[dict], missing: int) -> str:
+    ours = [row for row in rows if row["our_txs"]]
+    fill = [row["fill_ratio"] for row in rows]
+    # Lag per transaction, approximated by the mean lag of its block
+    lags = [row["mean_lag"] for row in ours for _ in range(row["our_txs"])]
+    interval = (rows[-1]["timestamp"] - rows[0]["timestamp"]) / (len(rows) - 1) if len(rows) > 1 else 0.0
+    total_gas = sum(row["gas_used"] for row in rows)
+    our_gas = sum(row["our_gas_used"] for row in rows)
+
+    lines = [
+        f"Blocks {rows[0]['block']}..{rows[-1]['block']} ({len(rows)} blocks, mean interval {interval:.2f}s)",
+        f"Blocks with our transactions: {len(ours)} ({len(ours) / len(rows):.0%})",
+        f"Empty blocks: {sum(1 for row in rows if row['chain_txs'] == 0)}",
+        "",
+        f"Fill ratio (gas used / limit):   {_distribution([100 * f for f in fill])} %",
+        f"Chain txs per block:             {_distribution([row['chain_txs'] for row in rows])}",
+        f"Our txs per block:               {_distribution([row['our_txs'] for row in rows])}",
+        f"Our entities per block:          {_distribution([row['our_entities'] for row in rows])}",
+        f"Our payload KiB per block:       {_distribution([row['our_payload_bytes'] / 1024 for row in rows])}",
+        f"Submitted-to-included lag (s):   {_distribution(lags)}",
+    ]
+    if total_gas and our_gas:
+        lines.append(f"Share of gas used by our txs:    {our_gas / total_gas:.0%}")
+    if missing:
+        lines.append(f"Headers not found for {missing} block(s) with our transactions")
+
+    mean_fill = sum(fill) / len(fill)
+    lines.append("")
+    if mean_fill >= FULL_BLOCK_RATIO:
+        lines.append(f"Blocks are full (mean fill {mean_fill:.0%}): throughput is limited by the block gas limit.")
+    else:
+        lines.append(
+            f"Blocks are not full (mean fill {mean_fill:.0%}): the sequencer is under-driven, "
+            f"add load to measure its limit."
+        )
+    return "\n".join(lines) + "\n"
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Per-block inclusion report of a load test run.")
+    parser.add_argument("directory", help="Directory with the run's inclusion-*.json files")
+    parser.add_argument("--host", default=None, help="JSON-RPC endpoint (default: the configured host)")
+    parser.add_argument("--csv", metavar="PATH", help="Also write one row per block to PATH")
+    args = parser.parse_args(argv)
+
+    ours = load_blocks(args.directory)
+    if not ours:
+        parser.error(f"No inclusion-*.json files with blocks found in {args.directory}")
+
+    host = args.host
+    if host is None:
+        import stress.tools.config as config
+
+        host = config.host
+    headers = fetch_headers(host, min(ours), max(ours))
+    if not headers:
+        parser.error(f"No block headers found at {host} for blocks {min(ours)}..{max(ours)}")
+    rows = block_rows(ours, headers)
+
+    sys.stdout.write(text_report(rows, missing=sum(1 for number in ours if number not in headers)))
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"Per-block rows written to {args.csv}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
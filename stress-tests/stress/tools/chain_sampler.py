@@ -0,0 +1,200 @@
+"""
+Chain state sampler (master / local runner).
+
+Every tick, one JSON-RPC batch request fetches the entity count, the txpool
+status, the latest block and the blocks produced since the previous tick. The
+signals are exported as `arkiv_chain_*` gauges (plus `arkiv_total_entity_count`)
+so the server-side throughput (transactions, bytes and entities per second of
+chain time) can be put next to the client-side view.
+"""
+
+import logging
+import os
+import threading
+from typing import Any, Optional
+
+import requests
+
+from stress.tools.metrics import Metrics
+
+CHAIN_SAMPLE_INTERVAL = int(os.getenv("CHAIN_SAMPLE_INTERVAL", "10"))
+
+# Most blocks fetched per tick; older blocks of a longer gap are skipped
+MAX_BLOCKS_PER_SAMPLE = 64
+
+
+def _hex(value: str) -> int:
+    return int(value, 16)
+
+
+class ChainSampler:
+    """Background thread that periodically samples chain state into gauges."""
+
+    instance = None
+
+    def __init__(self, environment, update_interval: int = CHAIN_SAMPLE_INTERVAL):
+        """
+        Initialize the chain sampler.
+
+        Args:
+            environment: Locust environment object
+            update_interval: Interval in seconds between samples (default: CHAIN_SAMPLE_INTERVAL)
+        """
+        self.update_interval = update_interval
+        self._environment = environment
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._session: Optional[requests.Session] = None
+        self._reset_state()
+
+    def _reset_state(self):
+        # Next block to fetch and the head seen by the previous sample
+        self._next_block: Optional[int] = None
+        self._last_block_timestamp: Optional[int] = None
+        self._last_entity_count: Optional[int] = None
+        self._last_head_timestamp: Optional[int] = None
+
+    def _batch(self, host: str, calls: list[tuple[str, list]]) -> list[Any]:
+        """Send calls as one JSON-RPC batch; returns the results in call order (None for errors)."""
+        payload = [
+            {"jsonrpc": "2.0", "id": i, "method": method, "params": params}
+            for i, (method, params) in enumerate(calls)
+        ]
+        response = self._session.post(host, json=payload, timeout=self.update_interval)
+        response.raise_for_status()
+        results: list[Any] = [None] * len(calls)
+        for item in response.json():
+            if "error" in item:
+                logging.debug("ChainSampler: %s failed: %s", calls[item["id"]][0], item["error"])
+            else:
+                results[item["id"]] = item.get("result")
+        return results
+
+    def sample(self, host: str):
+        """Fetch and export one sample."""
+        calls = [
+            ("arkiv_getEntityCount", []),
+            ("txpool_status", []),
+            ("eth_getBlockByNumber", ["latest", False]),
+        ]
+        window_start = self._next_block
+        if window_start is not None:
+            calls += [
+                ("eth_getBlockByNumber", [hex(number), False])
+                for number in range(window_start, window_start + MAX_BLOCKS_PER_SAMPLE)
+            ]
+        entity_count, txpool, head, *window = self._batch(host, calls)
+        if head is None:
+            raise RuntimeError("eth_getBlockByNumber(latest) returned no block")
+
+        metrics = Metrics.get_metrics()
+        head_number = _hex(head["number"])
+        head_timestamp = _hex(head["timestamp"])
+        metrics.chain_head_block_number.set(head_number)
+        metrics.chain_head_block_timestamp.set(head_timestamp)
+        metrics.chain_block_gas_used.set(_hex(head["gasUsed"]))
+        metrics.chain_block_gas_limit.set(_hex(head["gasLimit"]))
+
+        if txpool is not None:
+            metrics.chain_txpool.labels(state="pending").set(_hex(txpool["pending"]))
+            metrics.chain_txpool.labels(state="queued").set(_hex(txpool["queued"]))
+
+        if entity_count is not None:
+            entity_count = int(entity_count, 16) if isinstance(entity_count, str) else int(entity_count)
+            metrics.total_entity_count.set(entity_count)
+            if self._last_entity_count is not None and head_timestamp > self._last_head_timestamp:
+                metrics.chain_entity_rate.set(
+                    (entity_count - self._last_entity_count) / (head_timestamp - self._last_head_timestamp)
+                )
+            self._last_entity_count = entity_count
+            self._last_head_timestamp = head_timestamp
+
+        blocks = []
+        for block in window:
+            if block is None:
+                break
+            blocks.append(block)
+        if blocks:
+            self._export_blocks(blocks)
+
+        if window_start is None or head_number >= window_start + MAX_BLOCKS_PER_SAMPLE:
+            # First sample or a gap longer than the window: continue from the head
+            self._next_block = head_number + 1
+            self._last_block_timestamp = head_timestamp
+        elif blocks:
+            self._next_block = _hex(blocks[-1]["number"]) + 1
+
+        logging.debug("ChainSampler: head %s, %s new blocks, entity count %s", head_number, len(blocks), entity_count)
+
+    def _export_blocks(self, blocks: list[dict]):
+        """Export per-block signals over the blocks produced since the previous sample."""
+        metrics = Metrics.get_metrics()
+        gas_used = sum(_hex(block["gasUsed"]) for block in blocks)
+        gas_limit = sum(_hex(block["gasLimit"]) for block in blocks)
+        tx_count = sum(len(block["transactions"]) for block in blocks)
+        size = sum(_hex(block["size"]) for block in blocks)
+        if gas_limit:
+            metrics.chain_gas_utilization.set(gas_used / gas_limit)
+        metrics.chain_block_tx_count.set(tx_count / len(blocks))
+
+        last_timestamp = _hex(blocks[-1]["timestamp"])
+        if self._last_block_timestamp is not None and last_timestamp > self._last_block_timestamp:
+            elapsed = last_timestamp - self._last_block_timestamp
+            metrics.chain_block_interval.set(elapsed / len(blocks))
+            metrics.chain_tx_rate.set(tx_count / elapsed)
+            metrics.chain_bytes_rate.set(size / elapsed)
+        self._last_block_timestamp = last_timestamp
+
+    def _update_loop(self):
+        """Internal method that runs in the background thread."""
+        host = self._environment.host
+        self._session = requests.Session()
+        self._reset_state()
+        logging.info("ChainSampler: Started with host %s", host)
+
+        while not self._stop_event.is_set():
+            try:
+                self.sample(host)
+            except Exception as e:
+                logging.error("ChainSampler: Error sampling chain state: %s", e, exc_info=True)
+
+            # Wait for update interval or until stop event is set
+            self._stop_event.wait(self.update_interval)
+
+        self._session.close()
+        logging.info("ChainSampler: Stopped")
+
+    def start(self):
+        """Start the background thread."""
+        if self._thread is not None and self._thread.is_alive():
+            logging.warning("ChainSampler: Already running")
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._update_loop, daemon=True)
+        self._thread.start()
+        logging.info("ChainSampler: Started background thread")
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Stop the background thread.
+
+        Args:
+            timeout: Maximum time to wait for thread to stop (default: 5.0 seconds)
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return
+
+        self._stop_event.set()
+        self._thread.join(timeout=timeout)
+        self._thread = None
+        logging.info("ChainSampler: Stopped background thread")
+
+    def restart(self):
+        """
+        Restart the background thread (will pick up new host from environment).
+        """
+        self.stop()
+        self._stop_event.clear()
+        self.start()
+        logging.info("ChainSampler: Restarted with host %s", self._environment.host)
@@ -0,0 +1,389 @@
+"""
+Run-to-run regression report.
+
+Compares a baseline run with a candidate run (e.g. the last good op-geth/Arkiv
+image against a new one). A run is a directory containing what the load test
+recorded:
+
+- locust stats CSVs (`locust --csv <prefix>`, files `*_stats.csv`), aligned
+  per request name (task / RPC method);
+- latency histogram snapshots (`LATENCY_SNAPSHOT_DIR`, files `latency-*.json`),
+  merged across workers and aligned per (operation, label), i.e. per
+  selectivity bucket, query shape and for transactions.
+
+For the histograms, every quantile gets a distribution-free confidence
+interval from binomial order statistics; a change is flagged as a regression
+(or improvement) when the baseline and candidate intervals do not overlap and
+the relative change exceeds --min-change. Locust CSVs only carry percentiles,
+so their latency deltas are informational; their failure rates are compared
+with a two-proportion z-test.
+
+Usage (from stress-tests/):
+    python -m stress.tools.compare_runs BASELINE_DIR CANDIDATE_DIR [--html report.html]
+
+Exits with status 1 when a regression is flagged.
+"""
+
+import argparse
+import csv
+import glob
+import html
+import json
+import math
+import os
+import sys
+from dataclasses import dataclass, field
+from statistics import NormalDist
+from typing import Optional
+
+from stress.tools.hdr_histogram import HdrHistogram
+
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99, 0.999)
+DEFAULT_CONFIDENCE = 0.95
+DEFAULT_MIN_CHANGE = 0.05
+
+# Percentile columns of locust's *_stats.csv that are compared
+LOCUST_PERCENTILES = ("50%", "95%", "99%")
+
+REGRESSION = "REGRESSION"
+IMPROVEMENT = "improvement"
+
+
+@dataclass
+class QuantileEstimate:
+    """Quantile of a histogram (ms) with its confidence interval."""
+
+    value: float
+    lower: float
+    upper: float
+
+
+@dataclass
+class Comparison:
+    """One aligned metric of the baseline and the candidate run."""
+
+    group: str
+    key: str
+    metric: str
+    baseline: float
+    candidate: float
+    baseline_ci: Optional[tuple[float, float]] = None
+    candidate_ci: Optional[tuple[float, float]] = None
+    verdict: str = ""
+    note: str = ""
+
+    @property
+    def change(self) -> Optional[float]:
+        if self.baseline == 0:
+            return None
+        return (self.candidate - self.baseline) / self.baseline
+
+
+@dataclass
+class Run:
+    """Recorded results of one load test run."""
+
+    path: str
+    locust_stats: dict[str, dict] = field(default_factory=dict)
+    histograms: dict[tuple[str, str], HdrHistogram] = field(default_factory=dict)
+
+
+# =============================================================================
+# Loading
+# =============================================================================
+
+def load_run(path: str) -> Run:
+    """Load the locust stats CSVs and latency snapshots found in `path`."""
+    run = Run(path)
+    for stats_file in sorted(glob.glob(os.path.join(path, "*_stats.csv"))):
+        with open(stats_file, newline="") as f:
+            for row in csv.DictReader(f):
+                run.locust_stats[f"{row['Type']} {row['Name']}".strip()] = row
+
+    for snapshot_file in sorted(glob.glob(os.path.join(path, "latency-*.json"))):
+        with open(snapshot_file) as f:
+            snapshot = json.load(f)
+        for operation, label, data in snapshot["histograms"]:
+            histogram = HdrHistogram.from_dict(data)
+            existing = run.histograms.get((operation, label))
+            if existing is None:
+                run.histograms[(operation, label)] = histogram
+            else:
+                existing.merge(histogram)
+
+    if not run.locust_stats and not run.histograms:
+        raise ValueError(f"No *_stats.csv or latency-*.json files found in {path}")
+    return run
+
+
+# =============================================================================
+# Statistics
+# =============================================================================
+
+def quantile_with_ci(histogram: HdrHistogram, quantile: float, confidence: float) -> QuantileEstimate:
+    """
+    Quantile of a microsecond histogram with a distribution-free confidence interval, in ms.
+
+    The number of samples below the true quantile is Binomial(n, q); the
+    interval is bounded by the order statistics at the ranks covering
+    `confidence` of that distribution (normal approximation).
+    """
+    n = histogram.total
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    spread = z * math.sqrt(n * quantile * (1 - quantile))
+    lower_rank = math.floor(n * quantile - spread)
+    upper_rank = math.ceil(n * quantile + spread) + 1
+    return QuantileEstimate(
+        value=histogram.value_at_quantile(quantile) / 1000,
+        lower=histogram.value_at_rank(lower_rank) / 1000,
+        upper=histogram.value_at_rank(upper_rank) / 1000,
+    )
+
+
+def two_proportion_p_value(failures_a: int, total_a: int, failures_b: int, total_b: int) -> float:
+    """Two-sided p-value of a two-proportion z-test."""
+    if total_a == 0 or total_b == 0:
+        return 1.0
+    pooled = (failures_a + failures_b) / (total_a + total_b)
+    variance = pooled * (1 - pooled) * (1 / total_a + 1 / total_b)
+    if variance == 0:
+        return 1.0
+    z = (failures_b / total_b - failures_a / total_a) / math.sqrt(variance)
+    return 2 * (1 - NormalDist().cdf(abs(z)))
+
+
+# =============================================================================
+# Comparison
+# =============================================================================
+
+def compare_histograms(
+    baseline: Run, candidate: Run, quantiles: tuple[float, ...], confidence: float, min_change: float
+) -> list[Comparison]:
+    comparisons = []
+    for key in sorted(baseline.histograms.keys() & candidate.histograms.keys()):
+        base_histogram, cand_histogram = baseline.histograms[key], candidate.histograms[key]
+        operation, label = key
+        for quantile in quantiles:
+            base = quantile_with_ci(base_histogram, quantile, confidence)
+            cand = quantile_with_ci(cand_histogram, quantile, confidence)
+            comparison = Comparison(
+                group=operation,
+                key=label or "-",
+                metric=f"p{quantile * 100:g}",
+                baseline=base.value,
+                candidate=cand.value,
+                baseline_ci=(base.lower, base.upper),
+                candidate_ci=(cand.lower, cand.upper),
+                note=f"n={base_histogram.total}/{cand_histogram.total}",
+            )
+            change = comparison.change
+            if change is not None and abs(change) >= min_change:
+                if cand.lower > base.upper:
+                    comparison.verdict = REGRESSION
+                elif cand.upper < base.lower:
+                    comparison.verdict = IMPROVEMENT
+            comparisons.append(comparison)
+    return comparisons
+
+
+def compare_locust_stats(baseline: Run, candidate: Run, confidence: float) -> list[Comparison]:
+    comparisons = []
+    alpha = 1 - confidence
+    for key in sorted(baseline.locust_stats.keys() & candidate.locust_stats.keys()):
+        base_row, cand_row = baseline.locust_stats[key], candidate.locust_stats[key]
+        base_total, cand_total = int(base_row["Request Count"]), int(cand_row["Request Count"])
+        base_failures, cand_failures = int(base_row["Failure Count"]), int(cand_row["Failure Count"])
+
+        for column in LOCUST_PERCENTILES:
+            if base_row.get(column) in (None, "N/A") or cand_row.get(column) in (None, "N/A"):
+                continue
+            comparisons.append(
+                Comparison(
+                    group="locust",
+                    key=key,
+                    metric=f"p{column.rstrip('%')}",
+                    baseline=float(base_row[column]),
+                    candidate=float(cand_row[column]),
+                    note=f"n={base_total}/{cand_total}",
+                )
+            )
+
+        p_value = two_proportion_p_value(base_failures, base_total, cand_failures, cand_total)
+        base_rate = base_failures / base_total if base_total else 0.0
+        cand_rate = cand_failures / cand_total if cand_total else 0.0
+        comparison = Comparison(
+            group="locust",
+            key=key,
+            metric="failure_rate",
+            baseline=base_rate,
+            candidate=cand_rate,
+            note=f"p={p_value:.3g}",
+        )
+        if p_value < alpha:
+            comparison.verdict = REGRESSION if cand_rate > base_rate else IMPROVEMENT
+        comparisons.append(comparison)
+    return comparisons
+
+
+def unmatched(baseline: Run, candidate: Run) -> list[str]:
+    """Keys recorded in only one of the runs."""
+    notes = []
+    for name, base_keys, cand_keys in (
+        ("locust", baseline.locust_stats.keys(), candidate.locust_stats.keys()),
+        ("histogram", {"/".join(k) for k in baseline.histograms}, {"/".join(k) for k in candidate.histograms}),
+    ):
+        notes += [f"{name} {key}: baseline only" for key in sorted(base_keys - cand_keys)]
+        notes += [f"{name} {key}: candidate only" for key in sorted(cand_keys - base_keys)]
+    return notes
+
+
+# =============================================================================
+# Reports
+# =============================================================================
+
+def _format_value(value: float, metric: str) -> str:
+    return f"{value:.2%}" if metric == "failure_rate" else f"{value:.2f}"
+
+
+def _format_ci(ci: Optional[tuple[float, float]]) -> str:
+    return f"[{ci[0]:.2f}, {ci[1]:.2f}]" if ci is not None else ""
+
+
+def _format_change(comparison: Comparison) -> str:
+    change = comparison.change
+    return f"{change:+.1%}" if change is not None else "n/a"
+
+
+def text_report(baseline: Run, candidate: Run, comparisons: list[Comparison], notes: list[str]) -> str:
+    headers = ("group", "key", "metric", "baseline", "baseline CI", "candidate", "candidate CI", "change", "", "note")
+    rows = [
+        (
+            c.group,
+            c.key,
+            c.metric,
+            _format_value(c.baseline, c.metric),
+            _format_ci(c.baseline_ci),
+            _format_value(c.candidate, c.metric),
+            _format_ci(c.candidate_ci),
+            _format_change(c),
+            c.verdict,
+            c.note,
+        )
+        for c in comparisons
+    ]
+    widths = [max(len(str(row[i])) for row in [headers, *rows]) for i in range(len(headers))]
+    lines = [
+        f"Baseline:  {baseline.path}",
+        f"Candidate: {candidate.path}",
+        "Latencies in ms; CI = confidence interval of the quantile",
+        "",
+        "  ".join(h.ljust(w) for h, w in zip(headers, widths)),
+    ]
+    lines += ["  ".join(str(v).ljust(w) for v, w in zip(row, widths)).rstrip() for row in rows]
+    regressions = [c for c in comparisons if c.verdict == REGRESSION]
+    lines += ["", f"{len(regressions)} regression(s) flagged"]
+    lines += [f"  {c.group} {c.key} {c.metric}: {_format_change(c)}" for c in regressions]
+    if notes:
+        lines += ["", "Not compared:"] + [f"  {note}" for note in notes]
+    return "\n".join(lines) + "\n"
+
+
+def html_report(baseline: Run, candidate: Run, comparisons: list[Comparison], notes: list[str]) -> str:
+    def cell(value) -> str:
+        return f"<td>{html.escape(str(value))}</td>"
+
+    rows = []
+    for c in comparisons:
+        css = {REGRESSION: "regression", IMPROVEMENT: "improvement"}.get(c.verdict, "")
+        rows.append(
+            f'<tr class="{css}">'
+            + "".join(
+                cell(v)
+                for v in (
+                    c.group,
+                    c.key,
+                    c.metric,
+                    _format_value(c.baseline, c.metric),
+                    _format_ci(c.baseline_ci),
+                    _format_value(c.candidate, c.metric),
+                    _format_ci(c.candidate_ci),
+                    _format_change(c),
+                    c.verdict,
+                    c.note,
+                )
+            )
+            + "</tr>"
+        )
+    regressions = sum(1 for c in comparisons if c.verdict == REGRESSION)
+    note_items = "".join(f"<li>{html.escape(note)}</li>" for note in notes)
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Load test comparison</title>
+<style>
+body {{ font-family: sans-serif; }}
+table {{ border-collapse: collapse; }}
+td, th {{ border: 1px solid #ccc; padding: 2px 8px; text-align: right; }}
+td:nth-child(-n+3) {{ text-align: left; }}
+tr.regression {{ background: #f8d0d0; }}
+tr.improvement {{ background: #d0f0d0; }}
+</style>
+</head>
+<body>
+<h1>Load test comparison</h1>
+<p>Baseline: {html.escape(baseline.path)}<br>Candidate: {html.escape(candidate.path)}</p>
+<p><b>{regressions} regression(s) flagged.</b> Latencies in ms; CI = confidence interval of the quantile.</p>
+<table>
+<tr><th>group</th><th>key</th><th>metric</th><th>baseline</th><th>baseline CI</th><th>candidate</th>
+<th>candidate CI</th><th>change</th><th></th><th>note</th></tr>
+{chr(10).join(rows)}
+</table>
+{f"<h2>Not compared</h2><ul>{note_items}</ul>" if notes else ""}
+</body>
+</html>
+"""
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare two load test runs and flag regressions.")
+    parser.add_argument("baseline", help="Directory with the baseline run's *_stats.csv / latency-*.json")
+    parser.add_argument("candidate", help="Directory with the candidate run's *_stats.csv / latency-*.json")
+    parser.add_argument("--html", metavar="PATH", help="Write an HTML report to PATH (text report on stdout otherwise)")
+    parser.add_argument(
+        "--quantiles",
+        default=",".join(str(q) for q in DEFAULT_QUANTILES),
+        help="Comma-separated histogram quantiles to compare (default: %(default)s)",
+    )
+    parser.add_argument("--confidence", type=float, default=DEFAULT_CONFIDENCE, help="Confidence level (default: %(default)s)")
+    parser.add_argument(
+        "--min-change",
+        type=float,
+        default=DEFAULT_MIN_CHANGE,
+        help="Minimum relative change to flag (default: %(default)s)",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        baseline = load_run(args.baseline)
+        candidate = load_run(args.candidate)
+    except ValueError as e:
+        parser.error(str(e))
+    quantiles = tuple(float(q) for q in args.quantiles.split(","))
+
+    comparisons = compare_histograms(baseline, candidate, quantiles, args.confidence, args.min_change)
+    comparisons += compare_locust_stats(baseline, candidate, args.confidence)
+    notes = unmatched(baseline, candidate)
+
+    if args.html:
+        with open(args.html, "w") as f:
+            f.write(html_report(baseline, candidate, comparisons, notes))
+        print(f"HTML report written to {args.html}")
+    else:
+        sys.stdout.write(text_report(baseline, candidate, comparisons, notes))
+
+    return 1 if any(c.verdict == REGRESSION for c in comparisons) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
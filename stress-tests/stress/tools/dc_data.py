@@ -2,7 +2,7 @@
 import random
 import uuid
 from dataclasses import dataclass
-from typing import Iterator
+from typing import Any, Iterator
 
 
 # =============================================================================
@@ -375,6 +375,64 @@ def create_workload(
     )
 
 
+# =============================================================================
+# Entity Transformation (Arkiv attributes)
+# =============================================================================
+
+def node_to_arkiv_attributes(node: NodeEntity, creator_address: str) -> dict[str, Any]:
+    """
+    Build Arkiv attributes for a NodeEntity.
+
+    Note: we keep the same attribute names as the previous HTTP endpoint payloads.
+    """
+    # String attributes
+    string_attrs: dict[str, Any] = {
+        "dc_id": node.dc_id,
+        "type": NODE,
+        "node_id": node.node_id,
+        "region": node.region,
+        "status": node.status,
+        "vm_type": node.vm_type,
+    }
+
+    # Numeric attributes
+    numeric_attrs: dict[str, Any] = {
+        "cpu_count": node.cpu_count,
+        "ram_gb": node.ram_gb,
+        "price_hour": node.price_hour,
+        "avail_hours": node.avail_hours,
+    }
+
+    return {**string_attrs, **numeric_attrs}
+
+
+def workload_to_arkiv_attributes(workload: WorkloadEntity, creator_address: str) -> dict[str, Any]:
+    """
+    Build Arkiv attributes for a WorkloadEntity.
+
+    Note: we keep the same attribute names as the previous HTTP endpoint payloads.
+    """
+    # String attributes
+    string_attrs: dict[str, Any] = {
+        "dc_id": workload.dc_id,
+        "type": WORKLOAD,
+        "workload_id": workload.workload_id,
+        "status": workload.status,
+        "assigned_node": workload.assigned_node,
+        "region": workload.region,
+        "vm_type": workload.vm_type,
+    }
+
+    # Numeric attributes
+    numeric_attrs: dict[str, Any] = {
+        "req_cpu": workload.req_cpu,
+        "req_ram": workload.req_ram,
+        "max_hours": workload.max_hours,
+    }
+
+    return {**string_attrs, **numeric_attrs}
+
+
 # =============================================================================
 # Block-by-Block Entity Generation
 # =============================================================================
@@ -396,6 +454,7 @@ def generate_blocks(
     start_block: int,
     seed: int,
     dc_num: int = 1,
+    payload_content: bytes | None = None,
 ) -> Iterator[BlockData]:
     """
     Generate blocks with nodes and their associated workloads.
@@ -413,6 +472,7 @@ def generate_blocks(
         start_block: Starting block number
         seed: Random seed
         dc_num: Data center number (default: 1)
+        payload_content: Payload of every entity (default: random payload_size bytes each)
     """
     rng = random.Random(f"{seed}:blocks")
     
@@ -437,6 +497,7 @@ def generate_blocks(
                 dc_num=dc_num,
                 node_num=node_counter,
                 payload_size=payload_size,
+                payload_content=payload_content,
                 block=current_block,
                 seed=seed,
                 status=node_status,
@@ -460,6 +521,7 @@ def generate_blocks(
                     workload_num=workload_counter,
                     nodes_per_dc=node_counter,  # Not used when assigned_node provided
                     payload_size=payload_size,
+                    payload_content=payload_content,
                     block=current_block,
                     seed=seed,
                     status=wl_status,
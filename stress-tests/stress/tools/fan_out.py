@@ -0,0 +1,62 @@
+"""
+Concurrent query fan-out from a single locust user.
+
+`run_fan_out` runs a batch of calls concurrently in a gevent pool, the way a
+dashboard-style client fires many queries at once. The calls share the user's
+`FastHttpUser` client, so they are multiplexed over at most `concurrency`
+connections of that user. Each call reports its own latency to locust; the
+wall time of the whole batch is reported as a separate request.
+"""
+
+import time
+from datetime import timedelta
+from typing import Callable, Sequence
+
+from gevent.pool import Pool
+from locust import events
+
+from stress.tools.metrics import Metrics
+
+
+class FanOutError(Exception):
+    """Raised (reported) when some calls of a fan-out batch failed."""
+
+
+def run_fan_out(name: str, calls: Sequence[Callable[[], object]], pool_size: int | None = None) -> int:
+    """
+    Run `calls` concurrently and report the batch wall time as request `name`.
+
+    Args:
+        name: Locust request name for the batch
+        calls: Calls to run; each is expected to report its own latency
+        pool_size: Maximum number of calls in flight (default: all at once)
+
+    Returns:
+        Number of failed calls
+    """
+    failures = 0
+
+    def run(call: Callable[[], object]) -> None:
+        nonlocal failures
+        try:
+            call()
+        except Exception:
+            # The call already reported its failure, only count it for the batch
+            failures += 1
+
+    pool = Pool(pool_size or len(calls))
+    start = time.perf_counter()
+    pool.map(run, calls)
+    duration = timedelta(seconds=time.perf_counter() - start)
+
+    events.request.fire(
+        request_type="fan_out",
+        name=name,
+        response_time=duration.total_seconds() * 1000,
+        response_length=len(calls),
+        exception=FanOutError(f"{failures}/{len(calls)} calls failed") if failures else None,
+        context={},
+        response=None,
+    )
+    Metrics.get_metrics().record_fan_out(len(calls), duration, failures)
+    return failures
@@ -0,0 +1,178 @@
+"""
+Load generator self-monitoring.
+
+When a worker's CPU is pegged (signing, payload generation, logging, ...),
+request latencies grow although the chain is fine. The `HarnessMonitor` runs
+in every worker (and local runner) and exports, labelled by worker process:
+
+- process CPU% and RSS (psutil),
+- gevent hub loop lag: how late a greenlet sleeping for a fixed interval wakes up,
+- GC pause times per generation (gc.callbacks),
+- the number of greenlets.
+
+When CPU% or the loop lag stays over the limits for HARNESS_SATURATION_TICKS
+consecutive intervals, the worker is flagged as saturated (gauge + warning):
+latencies measured meanwhile include time spent waiting for the harness itself.
+"""
+
+import gc
+import logging
+import os
+import socket
+import time
+from collections import deque
+
+import gevent
+import psutil
+from gevent.event import Event
+from greenlet import greenlet
+from locust import events
+from locust.runners import MasterRunner
+
+from stress.tools.metrics import Metrics
+
+HARNESS_MONITOR = os.getenv("HARNESS_MONITOR", "true").lower() in ("1", "true", "yes")
+HARNESS_MONITOR_INTERVAL = float(os.getenv("HARNESS_MONITOR_INTERVAL", "5"))
+HARNESS_CPU_WARN_PERCENT = float(os.getenv("HARNESS_CPU_WARN_PERCENT", "90"))
+HARNESS_LOOP_LAG_WARN_MS = float(os.getenv("HARNESS_LOOP_LAG_WARN_MS", "100"))
+HARNESS_SATURATION_TICKS = int(os.getenv("HARNESS_SATURATION_TICKS", "3"))
+
+# Interval at which the lag probe greenlet sleeps
+LOOP_LAG_PROBE_INTERVAL = 0.05
+
+# Counting greenlets walks all GC-tracked objects, so it is done less often
+GREENLET_COUNT_INTERVAL = 60
+
+# Seconds between repeated warnings while the harness stays saturated
+SATURATION_WARNING_INTERVAL = 60
+
+
+class HarnessMonitor:
+    """Samples process, event loop and GC health of the load generator and exports it as metrics."""
+
+    instance = None
+
+    def __init__(self, interval: float = HARNESS_MONITOR_INTERVAL):
+        self.interval = interval
+        self.worker = f"{socket.gethostname()}-{os.getpid()}"
+        self._process = psutil.Process()
+        # Raw observations from the lag probe and GC callbacks, applied on every tick
+        self._lags: deque[float] = deque(maxlen=10000)
+        self._gc_pauses: deque[tuple[int, float]] = deque(maxlen=10000)
+        self._gc_started = 0.0
+        self._over_limit_ticks = 0
+        self._saturated_since = None
+        self._last_warning = 0.0
+        self._last_greenlet_count = 0.0
+        self._stop_event = Event()
+        self._greenlets: list[gevent.Greenlet] = []
+
+    # -------------------------------------------------------------------------
+    # Probes
+    # -------------------------------------------------------------------------
+
+    def _on_gc(self, phase: str, info: dict):
+        # Keep the callback minimal: it runs inside every collection
+        if phase == "start":
+            self._gc_started = time.perf_counter()
+        else:
+            self._gc_pauses.append((info["generation"], time.perf_counter() - self._gc_started))
+
+    def _lag_probe(self):
+        while not self._stop_event.is_set():
+            start = time.perf_counter()
+            gevent.sleep(LOOP_LAG_PROBE_INTERVAL)
+            self._lags.append(max(0.0, time.perf_counter() - start - LOOP_LAG_PROBE_INTERVAL))
+
+    @staticmethod
+    def _count_greenlets() -> int:
+        return sum(1 for obj in gc.get_objects() if isinstance(obj, greenlet))
+
+    # -------------------------------------------------------------------------
+    # Reporting
+    # -------------------------------------------------------------------------
+
+    def tick(self):
+        """Export the observations since the previous tick and check for saturation."""
+        metrics = Metrics.get_metrics()
+        worker = self.worker
+
+        cpu_percent = self._process.cpu_percent(interval=None)
+        metrics.harness_cpu_percent.labels(worker=worker).set(cpu_percent)
+        metrics.harness_rss_bytes.labels(worker=worker).set(self._process.memory_info().rss)
+        now = time.monotonic()
+        if now - self._last_greenlet_count >= GREENLET_COUNT_INTERVAL:
+            self._last_greenlet_count = now
+            metrics.harness_greenlets.labels(worker=worker).set(self._count_greenlets())
+
+        lags = [self._lags.popleft() for _ in range(len(self._lags))]
+        loop_lag = metrics.harness_loop_lag.labels(worker=worker)
+        for lag in lags:
+            loop_lag.observe(lag)
+        max_lag = max(lags, default=0.0)
+        metrics.harness_loop_lag_max.labels(worker=worker).set(max_lag)
+
+        for _ in range(len(self._gc_pauses)):
+            generation, pause = self._gc_pauses.popleft()
+            metrics.harness_gc_pause.labels(worker=worker, generation=str(generation)).observe(pause)
+
+        self._check_saturation(cpu_percent, max_lag)
+
+    def _check_saturation(self, cpu_percent: float, max_lag: float):
+        over_limit = cpu_percent >= HARNESS_CPU_WARN_PERCENT or max_lag * 1000 >= HARNESS_LOOP_LAG_WARN_MS
+        self._over_limit_ticks = self._over_limit_ticks + 1 if over_limit else 0
+        saturated = self._over_limit_ticks >= HARNESS_SATURATION_TICKS
+        Metrics.get_metrics().harness_saturated.labels(worker=self.worker).set(1 if saturated else 0)
+
+        now = time.monotonic()
+        if saturated:
+            if self._saturated_since is None:
+                self._saturated_since = now
+            if now - self._last_warning >= SATURATION_WARNING_INTERVAL:
+                self._last_warning = now
+                logging.warning(
+                    "HarnessMonitor: load generator %s is saturated for %.0fs (CPU %.0f%%, loop lag %.0f ms); "
+                    "measured latencies include harness delays - add workers or reduce users per worker",
+                    self.worker, now - self._saturated_since, cpu_percent, max_lag * 1000,
+                )
+        elif self._saturated_since is not None:
+            logging.info("HarnessMonitor: load generator %s is no longer saturated", self.worker)
+            self._saturated_since = None
+            self._last_warning = 0.0
+
+    def _report_loop(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.tick()
+            except Exception as e:
+                logging.error("HarnessMonitor: Error collecting harness metrics: %s", e, exc_info=True)
+
+    def start(self):
+        """Install the GC callback and start the lag probe and reporting greenlets."""
+        self._stop_event.clear()
+        self._process.cpu_percent(interval=None)  # the first call only sets the baseline
+        gc.callbacks.append(self._on_gc)
+        self._greenlets = [gevent.spawn(self._lag_probe), gevent.spawn(self._report_loop)]
+        logging.info("HarnessMonitor: Started for %s", self.worker)
+
+    def stop(self):
+        self._stop_event.set()
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
+        gevent.joinall(self._greenlets, timeout=self.interval)
+        self._greenlets = []
+
+
+@events.init.add_listener
+def on_locust_init(environment, **kwargs):
+    if not HARNESS_MONITOR or isinstance(environment.runner, MasterRunner):
+        return
+    HarnessMonitor.instance = HarnessMonitor()
+    HarnessMonitor.instance.start()
+
+
+@events.quitting.add_listener
+def on_quitting(environment, **kwargs):
+    if HarnessMonitor.instance is not None:
+        HarnessMonitor.instance.stop()
+        HarnessMonitor.instance = None
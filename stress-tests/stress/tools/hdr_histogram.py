@@ -0,0 +1,158 @@
+"""
+HDR-style latency histograms that merge losslessly across workers.
+
+`HdrHistogram` records integer values (microseconds) into log-linear buckets
+with a fixed relative precision (3 significant figures by default, i.e. the
+reported value is within 0.1% of the recorded one), like HdrHistogram. Counts
+are kept in a sparse dict, so a histogram is small to ship and two histograms
+are merged by adding their counts.
+
+`LatencyRecorder` keeps one histogram per (operation, label) for the whole
+run and one for the current reporting interval.
+"""
+
+import math
+import threading
+from typing import Iterable, Optional
+
+DEFAULT_SIGNIFICANT_FIGURES = 3
+
+# Quantiles exported for every histogram (plus the maximum)
+EXPORTED_QUANTILES = (0.5, 0.99, 0.999)
+
+
+class HdrHistogram:
+    """Sparse log-linear histogram with fixed relative precision."""
+
+    def __init__(self, significant_figures: int = DEFAULT_SIGNIFICANT_FIGURES):
+        self.significant_figures = significant_figures
+        self._bits = math.ceil(math.log2(2 * 10**significant_figures))
+        self._sub_buckets = 1 << self._bits
+        self._half = self._sub_buckets // 2
+        self.counts: dict[int, int] = {}
+        self.total = 0
+        self.max = 0
+
+    def _index(self, value: int) -> int:
+        # Values below the sub-bucket count are exact; above, each power of two
+        # is split into `half` equal sub-buckets
+        if value < self._sub_buckets:
+            return value
+        exponent = value.bit_length() - self._bits
+        return self._sub_buckets + (exponent - 1) * self._half + (value >> exponent) - self._half
+
+    def _highest_equivalent(self, index: int) -> int:
+        if index < self._sub_buckets:
+            return index
+        exponent, sub = divmod(index - self._sub_buckets, self._half)
+        exponent += 1
+        return ((sub + self._half + 1) << exponent) - 1
+
+    def record(self, value: int, count: int = 1) -> None:
+        """Record a non-negative integer value `count` times."""
+        value = max(0, int(value))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.total += count
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "HdrHistogram") -> None:
+        """Add the counts of `other` (with the same precision) to this histogram."""
+        if other.significant_figures != self.significant_figures:
+            raise ValueError("Cannot merge histograms with different precision")
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def value_at_quantile(self, quantile: float) -> int:
+        """Value at `quantile` (0..1); like HdrHistogram, the highest value of the matching bucket."""
+        return self.value_at_rank(math.ceil(quantile * self.total))
+
+    def value_at_rank(self, rank: int) -> int:
+        """Value of the `rank`-th smallest recorded value (1-based, clamped to 1..total)."""
+        if self.total == 0:
+            return 0
+        target = min(max(1, rank), self.total)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self._highest_equivalent(index), self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        """Compact, JSON/msgpack friendly representation."""
+        return {
+            "significant_figures": self.significant_figures,
+            "counts": [[index, count] for index, count in self.counts.items()],
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "HdrHistogram":
+        histogram = cls(data["significant_figures"])
+        for index, count in data["counts"]:
+            histogram.counts[index] = histogram.counts.get(index, 0) + count
+            histogram.total += count
+        histogram.max = data["max"]
+        return histogram
+
+
+class LatencyRecorder:
+    """Run and interval latency histograms per (operation, label), recorded in milliseconds."""
+
+    def __init__(self, significant_figures: int = DEFAULT_SIGNIFICANT_FIGURES):
+        self.significant_figures = significant_figures
+        self.run: dict[tuple[str, str], HdrHistogram] = {}
+        self.interval: dict[tuple[str, str], HdrHistogram] = {}
+        self._lock = threading.Lock()
+
+    def _histogram(self, histograms: dict, key: tuple[str, str]) -> HdrHistogram:
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = HdrHistogram(self.significant_figures)
+        return histogram
+
+    def record(self, operation: str, label: str, duration_ms: float) -> None:
+        value = round(duration_ms * 1000)  # microseconds
+        with self._lock:
+            self._histogram(self.run, (operation, label)).record(value)
+            self._histogram(self.interval, (operation, label)).record(value)
+
+    def record_many(self, observations: Iterable[tuple[tuple[str, str], float]]) -> None:
+        """Record ((operation, label), duration_ms) pairs under a single lock acquisition."""
+        with self._lock:
+            for key, duration_ms in observations:
+                value = round(duration_ms * 1000)
+                self._histogram(self.run, key).record(value)
+                self._histogram(self.interval, key).record(value)
+
+    def merge(self, histograms: Iterable[tuple[str, str, dict]]) -> None:
+        """Merge (operation, label, HdrHistogram.to_dict()) entries into the run and interval."""
+        with self._lock:
+            for operation, label, data in histograms:
+                histogram = HdrHistogram.from_dict(data)
+                self._histogram(self.run, (operation, label)).merge(histogram)
+                self._histogram(self.interval, (operation, label)).merge(histogram)
+
+    def take_interval(self) -> dict[tuple[str, str], HdrHistogram]:
+        """Return the current interval histograms and start a new interval."""
+        with self._lock:
+            interval, self.interval = self.interval, {}
+        return interval
+
+    def snapshot(self) -> list[list]:
+        """Run histograms as [operation, label, HdrHistogram.to_dict()] entries."""
+        with self._lock:
+            return [[operation, label, histogram.to_dict()] for (operation, label), histogram in self.run.items()]
+
+
+def quantiles_ms(histogram: Optional[HdrHistogram]) -> dict[str, float]:
+    """Exported quantiles and maximum of a microsecond histogram, in milliseconds."""
+    if histogram is None or histogram.total == 0:
+        return {}
+    values = {str(q): histogram.value_at_quantile(q) / 1000 for q in EXPORTED_QUANTILES}
+    values["max"] = histogram.max / 1000
+    return values
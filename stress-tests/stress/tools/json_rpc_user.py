@@ -1,8 +1,36 @@
 from typing import Any
 import json
 import logging
+import os
+
+import web3
+from web3.types import RPCEndpoint
 
 from stress.tools.base_user import BaseUser
+from stress.tools.lean_rpc_provider import LeanRPCProvider
+from stress.tools.rpc_transport import RPC_COMPRESSION, RPC_HTTP2
+
+# "locust" (web3 HTTPProvider over the locust session) or "lean" (LeanRPCProvider)
+RPC_PROVIDER = os.getenv("RPC_PROVIDER", "locust").lower()
+
+
+class LocustHTTPProvider(web3.HTTPProvider):
+    """
+    HTTPProvider over the user's locust session that names each request after its RPC method.
+
+    The method is passed to the session as `name` (and `rpc_method` context), so the
+    request wrapper of `JsonRpcUser` does not have to decode the JSON body to find it.
+    Requests are not retried: every failure is reported to locust.
+    """
+
+    def _make_request(self, method: RPCEndpoint, request_data: bytes) -> bytes:
+        return self._request_session_manager.make_post_request(
+            self.endpoint_uri,
+            request_data,
+            name=method,
+            context={"rpc_method": method},
+            **self.get_request_kwargs(),
+        )
 
 
 class JsonRpcUser(BaseUser):
@@ -16,20 +44,35 @@ class JsonRpcUser(BaseUser):
 
         def wrapped_request(*args, **kwargs):
             # Add any extra logic here (before calling the original method)
-            call_name = None
-            if args[0] == "POST":
-                data = kwargs["data"]
-                # data bytes into json
+            # An explicit name (e.g. from LocustHTTPProvider) takes precedence over the RPC method
+            call_name = kwargs.pop("name", None)
+            if args[0] == "POST" and call_name is None:
+                # Requests not sent through LocustHTTPProvider: decode the body to find the method
                 data = json.loads(kwargs["data"].decode("utf-8"))
                 rpc_method = data.get("method", None)
                 call_name = rpc_method
 
+                kwargs["context"] = {"rpc_method": rpc_method, **kwargs.get("context", {})}
+
             response = original_request_method(*args, name=call_name, **kwargs)
 
-            if response.ok:
-                logging.debug(f"{call_name} response: {response.json()}")
-            else:
-                logging.error(f"{call_name} Error response: {response.json()}")
+            if not response.ok:
+                logging.error("%s Error response: %s", call_name, response.text)
+            elif logging.getLogger().isEnabledFor(logging.DEBUG):
+                # Only parse the response when it is actually logged
+                logging.debug("%s response: %s", call_name, response.json())
             return response
 
         self.client.request = wrapped_request
+
+    def rpc_provider(self) -> web3.providers.JSONBaseProvider:
+        """
+        Web3 provider sending JSON-RPC requests through this user's locust client.
+
+        RPC_PROVIDER=lean selects `LeanRPCProvider` (raw geventhttpclient connection,
+        orjson, preallocated request templates) instead of `LocustHTTPProvider`, and
+        so do its transport options RPC_COMPRESSION and RPC_HTTP2.
+        """
+        if RPC_PROVIDER == "lean" or RPC_COMPRESSION != "none" or RPC_HTTP2:
+            return LeanRPCProvider(self)
+        return LocustHTTPProvider(endpoint_uri=self.client.base_url, session=self.client)
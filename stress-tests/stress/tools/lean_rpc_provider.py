@@ -0,0 +1,208 @@
+"""
+Lean JSON-RPC provider for the hot paths of JsonRpcUser.
+
+`LeanRPCProvider` is a web3 provider (so the Arkiv SDK and `Web3` accept it)
+that skips the layers between web3 and the socket: it sends the request on
+a geventhttpclient connection of the user's locust client (bypassing the
+requests-like session, its retries, redirects and cookie handling), encodes
+and decodes JSON with orjson when it is installed (`poetry install --with
+speedups`) and fires the locust request event itself, named after the RPC
+method.
+
+Request bodies are built from preallocated templates: the JSON text around
+the params is prepared once per method, and the single hex string params of
+`eth_sendRawTransaction` and `eth_getTransactionReceipt` are spliced in
+without going through the JSON encoder.
+
+Request/response compression and HTTP/2 are transport options of this
+provider (see stress.tools.rpc_transport).
+
+Enabled with RPC_PROVIDER=lean (see `JsonRpcUser.rpc_provider`).
+"""
+
+import json
+import logging
+import time
+from typing import Any
+
+from web3._utils.encoding import Web3JsonEncoder
+from web3.exceptions import ProviderConnectionError
+from web3.providers import JSONBaseProvider
+from web3.types import RPCEndpoint, RPCResponse
+
+from stress.tools.metrics import Metrics
+from stress.tools.rpc_transport import (
+    RPC_COMPRESSION_MIN_BYTES,
+    RPC_HTTP2,
+    Http1Transport,
+    Http2Transport,
+    TransportStats,
+    decompress,
+    get_codec,
+)
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+# Methods whose request templates are prepared up front; others get one on first use
+HOT_METHODS = ("eth_sendRawTransaction", "arkiv_query", "eth_getTransactionReceipt", "arkiv_getEntityCount")
+
+# Methods taking a single hex string, spliced into the template as is
+SINGLE_HEX_PARAM_METHODS = frozenset(("eth_sendRawTransaction", "eth_getTransactionReceipt"))
+
+_web3_encoder = Web3JsonEncoder()
+
+if orjson is not None:
+
+    def json_dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=_web3_encoder.default)
+
+    json_loads = orjson.loads
+else:
+
+    def json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":"), cls=Web3JsonEncoder).encode()
+
+    json_loads = json.loads
+
+
+class _RequestTemplate:
+    """Pre-encoded JSON-RPC request of one method, completed with params and id."""
+
+    __slots__ = ("prefix", "no_params")
+
+    def __init__(self, method: str):
+        self.prefix = b'{"jsonrpc":"2.0","method":' + json_dumps(method) + b',"params":'
+        self.no_params = self.prefix + b"[]"
+
+    def encode(self, method: str, params: Any, request_id: int) -> bytes:
+        suffix = b',"id":' + str(request_id).encode() + b"}"
+        if not params:
+            return self.no_params + suffix
+        if method in SINGLE_HEX_PARAM_METHODS and len(params) == 1:
+            value = params[0]
+            if isinstance(value, (bytes, bytearray)):
+                value = "0x" + value.hex()
+            if isinstance(value, str):
+                return self.prefix + b'["' + value.encode("ascii") + b'"]' + suffix
+        return self.prefix + json_dumps(params) + suffix
+
+
+_templates = {method: _RequestTemplate(method) for method in HOT_METHODS}
+
+
+def _template(method: str) -> _RequestTemplate:
+    template = _templates.get(method)
+    if template is None:
+        template = _templates[method] = _RequestTemplate(method)
+    return template
+
+
+class LeanRPCProvider(JSONBaseProvider):
+    """
+    Web3 provider sending JSON-RPC requests of a locust user directly on a geventhttpclient connection.
+
+    Shares the connection pool of the user's `FastHttpSession` (or, with RPC_HTTP2,
+    a process-wide HTTP/2 connection) and reports every request to locust
+    (name = RPC method, context = user context + `rpc_method` and the transport
+    fields of stress.tools.rpc_transport). Requests are not retried: every
+    failure is reported to locust.
+    """
+
+    def __init__(self, user, **kwargs):
+        super().__init__(**kwargs)
+        self.user = user
+        session = user.client
+        self.endpoint_uri = session.base_url
+        if RPC_HTTP2:
+            self._transport = Http2Transport(session.base_url, user.network_timeout)
+        else:
+            self._transport = Http1Transport(session)
+        self._headers = {"Content-Type": "application/json"}
+        if session.auth_header:
+            self._headers["Authorization"] = session.auth_header
+        self._codec = get_codec()
+        self._compressed_headers = self._headers
+        if self._codec is not None:
+            self._headers["Accept-Encoding"] = self._codec.name
+            self._compressed_headers = {**self._headers, "Content-Encoding": self._codec.name}
+        self._request_event = session.request_event
+
+    def encode_rpc_request(self, method: RPCEndpoint, params: Any) -> bytes:
+        return _template(method).encode(method, params, next(self.request_counter))
+
+    @staticmethod
+    def decode_rpc_response(raw_response: bytes) -> RPCResponse:
+        return json_loads(raw_response)
+
+    def post(self, method: str, body: bytes, cpu_start: float) -> Any:
+        """
+        POST a request body and return the decoded response, firing the locust request event.
+
+        `cpu_start` is the thread CPU time at which encoding the request began.
+        """
+        context = {**self.user.context(), "rpc_method": method, "request_bytes": len(body)}
+        headers = self._headers
+        codec = self._codec
+        if codec is not None and len(body) >= RPC_COMPRESSION_MIN_BYTES:
+            body = codec.compress(body)
+            headers = self._compressed_headers
+        context["request_wire_bytes"] = len(body)
+        # Network waits let other greenlets run: only the encoding and decoding spans are counted
+        cpu = time.thread_time() - cpu_start
+
+        start_time = time.time()
+        start = time.perf_counter()
+        response_time = None
+        content = payload = b""
+        result = exception = None
+        try:
+            status_code, content_encoding, content = self._transport.post(body, headers)
+            response_time = (time.perf_counter() - start) * 1000
+            cpu_start = time.thread_time()
+            payload = decompress(codec, content_encoding, content)
+            if not 200 <= status_code < 300:
+                logging.error("%s Error response: %s", method, payload.decode("utf-8", "replace"))
+                exception = ProviderConnectionError(f"HTTP {status_code} from {self.endpoint_uri} for {method}")
+            else:
+                result = json_loads(payload)
+            cpu += time.thread_time() - cpu_start
+        except Exception as e:
+            exception = e
+        if response_time is None:
+            response_time = (time.perf_counter() - start) * 1000
+        context["response_bytes"] = len(payload)
+        context["client_cpu_us"] = cpu * 1e6
+
+        self._request_event.fire(
+            request_type="POST",
+            name=method,
+            response_time=response_time,
+            response_length=len(content),
+            response=None,
+            context=context,
+            exception=exception,
+            start_time=start_time,
+            url=self.endpoint_uri,
+        )
+        Metrics.get_metrics().record_rpc_transport(
+            context["request_bytes"], len(body), len(payload), len(content), cpu
+        )
+        TransportStats.record(context["request_bytes"], len(body), len(payload), len(content), cpu)
+        if exception is not None:
+            raise exception
+        return result
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        cpu_start = time.thread_time()
+        return self.post(method, self.encode_rpc_request(method, params), cpu_start)
+
+    def make_batch_request(self, batch_requests: list[tuple[RPCEndpoint, Any]]) -> list[RPCResponse] | RPCResponse:
+        cpu_start = time.thread_time()
+        body = b"[" + b",".join(self.encode_rpc_request(method, params) for method, params in batch_requests) + b"]"
+        response = self.post("batch", body, cpu_start)
+        if isinstance(response, list):
+            response.sort(key=lambda item: item.get("id", 0))
+        return response
@@ -0,0 +1,198 @@
+"""
+Local dev chain launcher (CHAIN_ENV=local with IMAGE_TO_RUN).
+
+By default the node starts with the plain `--dev` genesis, and the load test
+accounts are funded by transactions (see stress.tools.local_prefund). With
+GENESIS_ALLOC_ACCOUNTS=N, the accounts of the user indexes 0..N-1 of this
+instance (see `build_account_path`) get GENESIS_ALLOC_BALANCE ETH in the
+genesis block instead: the image's own dev genesis (`geth dumpgenesis --dev`)
+is extended with the allocations, written to a fresh datadir and initialized
+(`geth init`), and the node then runs `--dev` on that datadir. Nothing has to
+be funded at test start and every run starts from the same chain state.
+
+`BaseUser` ids start at 20, so N must cover 20 + LOCUST_USERS for those users.
+
+With LOCAL_CHAIN_SNAPSHOT=FILE, every launch (also the per-task ones of
+FRESH_CONTAINER_FOR_EACH_TEST) restores the datadir from that tarball instead,
+with the accounts and entities it holds. Snapshots are made by running the
+chain from this module, seeding it, and stopping it with Ctrl-C:
+
+    python -m stress.tools.local_chain --save chain.tar [--snapshot base.tar]
+
+An uncompressed tarball restores fastest; .gz/.tgz ones are gzip-compressed.
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+file_dir = Path(__file__).resolve().parent
+project_root = file_dir.parent.parent  # Go up from tools/ to stress/ to stress-tests/
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from testcontainers.core.container import DockerContainer
+from web3 import Web3
+
+import stress.tools.config as config
+from stress.tools.account_registry import AccountRegistry
+from stress.tools.utils import CONTAINER_DATADIR, launch_image
+
+GENESIS_ALLOC_ACCOUNTS = int(os.getenv("GENESIS_ALLOC_ACCOUNTS", "0"))
+GENESIS_ALLOC_BALANCE = float(os.getenv("GENESIS_ALLOC_BALANCE", "1000"))
+LOCAL_CHAIN_SNAPSHOT = os.getenv("LOCAL_CHAIN_SNAPSHOT", "")
+
+# Seconds the node gets to flush its state on shutdown before a snapshot
+SNAPSHOT_STOP_TIMEOUT = 120
+
+
+class LocalChain:
+    """A launched dev chain container, and its datadir (temporary: removed with the container)."""
+
+    def __init__(self, container: DockerContainer, datadir: Optional[str] = None, cleanup_dir: Optional[str] = None):
+        self.container = container
+        self.datadir = datadir
+        self._cleanup_dir = cleanup_dir
+
+    def stop(self):
+        self.container.stop()
+        if self._cleanup_dir:
+            shutil.rmtree(self._cleanup_dir, ignore_errors=True)
+
+    def save_snapshot(self, path: str):
+        """Stop the node cleanly and write its datadir to the tarball `path`."""
+        if not self.datadir:
+            raise RuntimeError("The chain runs without a datadir, there is nothing to snapshot")
+        wrapped = self.container.get_wrapped_container()
+        # SIGTERM: the node writes its in-memory state to the datadir on shutdown
+        wrapped.stop(timeout=SNAPSHOT_STOP_TIMEOUT)
+        # Read through the container: the node's files are not necessarily readable from the host
+        stream, _ = wrapped.get_archive(CONTAINER_DATADIR)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        opener = gzip.open if path.endswith((".gz", ".tgz")) else open
+        with opener(tmp_path, "wb") as f:
+            for chunk in stream:
+                f.write(chunk)
+        os.replace(tmp_path, path)
+        logging.info("Snapshot of %s written to %s (%.1f MB)", self.datadir, path, os.path.getsize(path) / 1e6)
+
+
+def new_datadir() -> str:
+    datadir = tempfile.mkdtemp(prefix="arkiv-datadir-")
+    # The node may run as another user in the container
+    os.chmod(datadir, 0o777)
+    return datadir
+
+
+def restore_snapshot(path: str) -> tuple[str, str]:
+    """Extract the snapshot tarball `path` to a temporary directory; returns it and the datadir in it."""
+    start = time.monotonic()
+    root = tempfile.mkdtemp(prefix="arkiv-snapshot-")
+    with tarfile.open(path, "r:*") as tar:
+        tar.extractall(root, filter="data")
+    datadir = os.path.join(root, os.path.basename(CONTAINER_DATADIR))
+    os.chmod(datadir, 0o777)
+    logging.info("Snapshot %s restored to %s in %.1fs", path, datadir, time.monotonic() - start)
+    return root, datadir
+
+
+def run_to_completion(image_to_run: str, command: list[str], datadir: Optional[str] = None) -> str:
+    """Run a one-off command of the image (with `datadir` mounted) and return its stdout."""
+    container = DockerContainer(image_to_run).with_command(command)
+    if datadir:
+        container = container.with_volume_mapping(datadir, CONTAINER_DATADIR, "rw")
+    container.start()
+    try:
+        wrapped = container.get_wrapped_container()
+        status = wrapped.wait()
+        if status["StatusCode"] != 0:
+            stderr = wrapped.logs(stdout=False, stderr=True).decode(errors="replace")
+            raise RuntimeError(f"{' '.join(command)} exited with {status['StatusCode']}: {stderr[-2000:]}")
+        return wrapped.logs(stdout=True, stderr=False).decode()
+    finally:
+        container.stop()
+
+
+def build_genesis(image_to_run: str, accounts: int, balance: int) -> dict:
+    """Dev genesis of the image, allocating `balance` wei to the accounts of the user indexes 0..accounts-1."""
+    genesis = json.loads(run_to_completion(image_to_run, ["dumpgenesis", "--dev"]))
+    registry = AccountRegistry.get()
+    alloc = genesis.setdefault("alloc", {})
+    for account in registry.accounts(accounts):
+        alloc[account.address.lower()] = {"balance": hex(balance)}
+    registry.save()
+    return genesis
+
+
+def init_datadir(image_to_run: str, genesis: dict, datadir: Optional[str] = None) -> str:
+    """Initialize a datadir (a new temporary one by default) with `genesis`; returns its host path."""
+    datadir = datadir or new_datadir()
+    with open(os.path.join(datadir, "genesis.json"), "w") as f:
+        json.dump(genesis, f)
+    run_to_completion(
+        image_to_run, ["init", "--datadir", CONTAINER_DATADIR, f"{CONTAINER_DATADIR}/genesis.json"], datadir
+    )
+    return datadir
+
+
+def launch_local_chain(
+    image_to_run: str, snapshot: str = LOCAL_CHAIN_SNAPSHOT, with_datadir: bool = False
+) -> LocalChain:
+    """
+    Start the dev chain container: from `snapshot`, else from a genesis-funded
+    datadir with GENESIS_ALLOC_ACCOUNTS set, else from the plain dev genesis
+    (in memory, unless `with_datadir`).
+    """
+    cleanup_dir = None
+    if snapshot:
+        cleanup_dir, datadir = restore_snapshot(snapshot)
+    elif GENESIS_ALLOC_ACCOUNTS:
+        genesis = build_genesis(image_to_run, GENESIS_ALLOC_ACCOUNTS, Web3.to_wei(GENESIS_ALLOC_BALANCE, "ether"))
+        datadir = cleanup_dir = init_datadir(image_to_run, genesis)
+        logging.info(
+            "Genesis allocates %s ETH to %s accounts, datadir %s", GENESIS_ALLOC_BALANCE, GENESIS_ALLOC_ACCOUNTS, datadir
+        )
+    elif with_datadir:
+        datadir = cleanup_dir = new_datadir()
+    else:
+        return LocalChain(launch_image(image_to_run))
+    return LocalChain(launch_image(image_to_run, datadir=datadir), datadir, cleanup_dir)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the local dev chain until Ctrl-C, optionally saving a snapshot.")
+    parser.add_argument("--image", default=config.image_to_run, help="Node image (default: IMAGE_TO_RUN)")
+    parser.add_argument("--snapshot", default=LOCAL_CHAIN_SNAPSHOT,
+                        help="Start from this snapshot tarball (default: LOCAL_CHAIN_SNAPSHOT)")
+    parser.add_argument("--save", help="Write a snapshot tarball of the chain when stopped")
+    args = parser.parse_args(argv)
+    if not args.image:
+        parser.error("no image: set IMAGE_TO_RUN or pass --image")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    chain = launch_local_chain(args.image, args.snapshot, with_datadir=True)
+    logging.info("Dev chain running on port 8545 (datadir %s), Ctrl-C to stop", chain.datadir)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    try:
+        if args.save:
+            chain.save_snapshot(args.save)
+    finally:
+        chain.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+Funds the load test accounts on a local dev chain before the users spawn.
+
+With CHAIN_ENV=local, the master (or local runner) transfers LOCAL_PREFUND_AMOUNT
+ETH from the dev account (the first of eth_accounts) to every account of this
+instance below LOCAL_PREFUND_MIN_BALANCE, at test start. The transfers get
+local nonces and are signed by the node in JSON-RPC batches of
+eth_signTransaction, then submitted and confirmed by `TxPipeline`, so funding
+thousands of accounts takes a few blocks instead of one transfer and receipt
+wait per user. Users still check their balance at start, which then costs a
+single eth_getBalance; if the prefund failed, they top up their own account.
+
+The accounts funded are the ones `build_account_path` gives the user ids of
+this instance (workers on the same host derive the same ones). `BaseUser`
+adds the listener at init, after the locustfiles' own test_start listeners,
+so it runs once an IMAGE_TO_RUN container is up. With
+FRESH_CONTAINER_FOR_EACH_TEST (a new chain per task) or LOCAL_PREFUND=false,
+only the users' own topups fund the accounts.
+"""
+
+import logging
+import os
+import time
+from typing import Optional
+
+import requests
+from web3 import Web3
+
+import stress.tools.config as config
+from stress.tools.account_registry import AccountRegistry
+from stress.tools.testnet_balance_checker import scan_balances
+from stress.tools.tx_pipeline import FAILED, PendingTx, RpcError, TxPipeline, rpc_batch
+
+LOCAL_PREFUND = os.getenv("LOCAL_PREFUND", "true").lower() in ("1", "true", "yes")
+LOCAL_PREFUND_AMOUNT = float(os.getenv("LOCAL_PREFUND_AMOUNT", "10"))
+LOCAL_PREFUND_MIN_BALANCE = float(os.getenv("LOCAL_PREFUND_MIN_BALANCE", "0.1"))
+LOCAL_PREFUND_WINDOW = int(os.getenv("LOCAL_PREFUND_WINDOW", "256"))
+
+TRANSFER_GAS = 21000
+# eth_signTransaction calls per JSON-RPC batch
+SIGN_BATCH_SIZE = 100
+
+
+def prefund_enabled() -> bool:
+    """Whether the accounts are funded at test start"""
+    return config.chain_env == "local" and LOCAL_PREFUND and not config.fresh_container_for_each_test
+
+
+def sign_transfers(
+    session: requests.Session, url: str, funder: str, recipients: list[str], first_nonce: int, value: int,
+    gas_price: int,
+) -> list[PendingTx]:
+    """Have the node sign one transfer from its unlocked `funder` account per recipient, with consecutive nonces."""
+    txs = []
+    for start in range(0, len(recipients), SIGN_BATCH_SIZE):
+        chunk = list(enumerate(recipients[start:start + SIGN_BATCH_SIZE], start=first_nonce + start))
+        calls = [
+            ("eth_signTransaction", [{
+                "from": funder,
+                "to": recipient,
+                "value": hex(value),
+                "gas": hex(TRANSFER_GAS),
+                "gasPrice": hex(gas_price),
+                "nonce": hex(nonce),
+            }])
+            for nonce, recipient in chunk
+        ]
+        for (nonce, recipient), (result, error) in zip(chunk, rpc_batch(session, url, calls)):
+            if error is not None:
+                raise RpcError(f"eth_signTransaction to {recipient} failed: {error.get('message', error)}")
+            txs.append(PendingTx(recipient, nonce, result["raw"], result["tx"]["hash"]))
+    return txs
+
+
+def prefund_accounts(
+    url: str,
+    addresses: list[str],
+    amount: int,
+    min_balance: int,
+    window: int = LOCAL_PREFUND_WINDOW,
+    session: Optional[requests.Session] = None,
+) -> int:
+    """
+    Transfer `amount` wei from the dev account to each of addresses below `min_balance` wei.
+
+    Returns the number of accounts funded. Raises RpcError or TimeoutError
+    (see `TxPipeline.run`) and RpcError when a transfer fails on chain.
+    """
+    session = session or requests.Session()
+    balances = scan_balances(url, addresses, session=session)
+    recipients = [address for address in addresses if (balances.get(address) or 0) < min_balance]
+    if not recipients:
+        return 0
+
+    (dev_accounts, error), (gas_price, _) = rpc_batch(session, url, [("eth_accounts", []), ("eth_gasPrice", [])])
+    if not dev_accounts:
+        raise RpcError(f"No dev account to fund from: {error or 'eth_accounts is empty'}")
+    funder = dev_accounts[0]
+    (nonce, _), = rpc_batch(session, url, [("eth_getTransactionCount", [funder, "pending"])])
+
+    txs = sign_transfers(session, url, funder, recipients, int(nonce, 16), amount, 2 * int(gas_price, 16))
+    TxPipeline(url, window=window, poll_interval=0.2, session=session).run(txs)
+    failed = [tx for tx in txs if tx.status == FAILED]
+    if failed:
+        raise RpcError(f"{len(failed)} transfers failed on chain, first to {failed[0].key} (nonce {failed[0].nonce})")
+    return len(txs)
+
+
+def prefund_user_accounts(environment, first_user_id: int):
+    """test_start listener (see base_user): fund the accounts of the user ids a test of this size hands out."""
+    count = max(environment.runner.target_user_count or 0, config.users)
+    registry = AccountRegistry.get()
+    addresses = [account.address for account in registry.accounts(count, start=first_user_id)]
+    registry.save()
+
+    start = time.monotonic()
+    try:
+        funded = prefund_accounts(
+            environment.host or config.host,
+            addresses,
+            Web3.to_wei(LOCAL_PREFUND_AMOUNT, "ether"),
+            Web3.to_wei(LOCAL_PREFUND_MIN_BALANCE, "ether"),
+        )
+    except (RpcError, TimeoutError, requests.RequestException) as e:
+        logging.error("Prefunding the local accounts failed, users top up their own: %s", e)
+        return
+    logging.info(
+        "Prefunded %s of %s local accounts with %s ETH in %.1fs",
+        funded, len(addresses), LOCAL_PREFUND_AMOUNT, time.monotonic() - start,
+    )
@@ -0,0 +1,174 @@
+"""
+Process-wide, asynchronous logging setup.
+
+`configure_logging()` (idempotent, called once per process) routes the root
+logger through a `QueueHandler`: the request greenlets only enqueue records,
+and a `QueueListener` formats them and writes them to the console and to
+`locust.log` in the background. The listener runs on a native OS thread with
+a native queue (taken from before locust's gevent monkey-patching), so that
+formatting and blocking file writes stay off the thread running the greenlets.
+
+Records are not formatted before they are enqueued, so log calls should use
+lazy %-style arguments (`logging.info("sent %s", nonce)`) rather than
+f-strings: a dropped or filtered record then costs next to nothing.
+
+A rate-limited sampling filter keeps hot-path messages from flooding the
+queue: per category (logger name + unformatted message) at most LOG_RATE_LIMIT
+records pass per LOG_RATE_WINDOW seconds; the number of suppressed records is
+appended to the next record of that category that passes. Categories idle for
+a whole window are forgotten, and at most LOG_RATE_MAX_CATEGORIES are tracked
+(messages formatted before logging, e.g. f-strings, each make a category of
+their own). Warnings and errors are never dropped. Caller, thread and process
+information is not collected (the format does not use it), which makes creating
+a record about 3x cheaper.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from gevent import monkey
+
+import stress.tools.config as config
+
+LOG_FILE = os.getenv("LOG_FILE", "locust.log")
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+LOG_RATE_LIMIT = int(os.getenv("LOG_RATE_LIMIT", "20"))  # 0 disables sampling
+LOG_RATE_WINDOW = float(os.getenv("LOG_RATE_WINDOW", "10"))
+LOG_RATE_MAX_CATEGORIES = 10_000
+
+# Records waiting for the listener; beyond that new records are dropped
+LOG_QUEUE_SIZE = 100_000
+
+# The unpatched originals: gevent's versions would run the listener as a greenlet
+# (threading.Thread starts greenlets too once `_thread` is patched)
+_start_native_thread = monkey.get_original("_thread", "start_new_thread")
+_NativeLock = monkey.get_original("_thread", "allocate_lock")
+_NativeRLock = monkey.get_original("_thread", "RLock")
+_NativeQueue = monkey.get_original("queue", "SimpleQueue")
+
+
+class RateLimitFilter(logging.Filter):
+    """Lets through at most `limit` records per category and window; WARNING and above always pass."""
+
+    def __init__(self, limit: int = LOG_RATE_LIMIT, window: float = LOG_RATE_WINDOW):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        # category -> [window start, passed in window, suppressed since last passed]
+        self._categories: dict[tuple[str, str], list] = {}
+        self._swept_at = time.monotonic()
+
+    def _sweep(self, now: float) -> None:
+        # Forget the categories whose window ended; start over if that is not enough
+        self._categories = {
+            key: state for key, state in self._categories.items() if now - state[0] < self.window
+        }
+        if len(self._categories) >= LOG_RATE_MAX_CATEGORIES:
+            self._categories.clear()
+        self._swept_at = now
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.limit <= 0 or record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        state = self._categories.get(key)
+        if state is None:
+            if now - self._swept_at >= self.window or len(self._categories) >= LOG_RATE_MAX_CATEGORIES:
+                self._sweep(now)
+            self._categories[key] = [now, 1, 0]
+            return True
+        if now - state[0] >= self.window:
+            state[0], state[1] = now, 0
+        if state[1] >= self.limit:
+            state[2] += 1
+            return False
+        state[1] += 1
+        if state[2]:
+            record.msg = f"{record.msg} [{state[2]} similar messages suppressed]"
+            state[2] = 0
+        return True
+
+
+class _InProcessQueueHandler(QueueHandler):
+    """QueueHandler that defers all formatting to the listener (the queue never leaves the process)."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        # SimpleQueue is unbounded: drop records beyond LOG_QUEUE_SIZE here
+        if self.queue.qsize() < LOG_QUEUE_SIZE:
+            self.queue.put_nowait(record)
+
+
+class _NativeQueueListener(QueueListener):
+    """QueueListener on a native OS thread, also under gevent's monkey-patching."""
+
+    def start(self):
+        self._stopped = _NativeLock()
+        self._stopped.acquire()
+        _start_native_thread(self._run, ())
+
+    def _run(self):
+        try:
+            self._monitor()
+        finally:
+            self._stopped.release()
+
+    def stop(self):
+        self.enqueue_sentinel()
+        self._stopped.acquire()
+
+
+_listener = None
+_lock = threading.Lock()
+
+
+def configure_logging(level: str = config.log_level) -> None:
+    """Install the queue-based root logging of this process (only the first call has an effect)."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+
+        formatter = logging.Formatter(LOG_FORMAT)
+        console = logging.StreamHandler()
+        file = logging.FileHandler(LOG_FILE)
+        for output in (console, file):
+            output.setFormatter(formatter)
+            # Only the listener thread writes: a gevent lock must not be taken there
+            output.lock = _NativeRLock()
+
+        log_queue = _NativeQueue()
+        handler = _InProcessQueueHandler(log_queue)
+        handler.addFilter(RateLimitFilter())
+
+        # The format uses none of caller, thread or process: skip collecting them for every record
+        logging._srcfile = None
+        logging.logThreads = False
+        logging.logProcesses = False
+        logging.logMultiprocessing = False
+
+        root = logging.getLogger()
+        for existing in root.handlers[:]:
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        root.setLevel(level)
+
+        _listener = _NativeQueueListener(log_queue, console, file, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Write the queued records and stop the listener."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
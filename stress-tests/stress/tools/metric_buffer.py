@@ -0,0 +1,76 @@
+"""
+Buffered recording of metric observations.
+
+Recording a metric on the request path (label formatting, `.labels()` lookups
+and prometheus_client locks) costs more the more labels are involved. The
+`ObservationBuffer` keeps that work off the request greenlet: callers append
+raw observation tuples to a bounded ring buffer, and a background flusher
+drains it periodically and applies the whole batch at once.
+
+When the buffer is full the oldest observations are overwritten and counted
+in `dropped` (exported by `Metrics` as loadtest_metric_observations_dropped_total).
+"""
+
+import logging
+import threading
+from collections import deque
+from typing import Callable
+
+
+class ObservationBuffer:
+    """Bounded ring buffer of raw observations, applied in batches by a background flusher."""
+
+    def __init__(self, apply: Callable[[list[tuple]], None], size: int = 65536, flush_interval: float = 0.1):
+        """
+        Initialize the buffer.
+
+        Args:
+            apply: Called with a batch (list) of observations on every flush
+            size: Maximum number of buffered observations
+            flush_interval: Seconds between background flushes
+        """
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._apply = apply
+        self._items: deque[tuple] = deque(maxlen=size)
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def append(self, observation: tuple) -> None:
+        """Buffer one observation (starts the flusher on first use)."""
+        items = self._items
+        if len(items) == items.maxlen:
+            self.dropped += 1
+        items.append(observation)
+        if self._thread is None:
+            self.start()
+
+    def flush(self) -> int:
+        """Apply all buffered observations. Returns the number of applied observations."""
+        with self._flush_lock:
+            items = self._items
+            batch = [items.popleft() for _ in range(len(items))]
+            if batch:
+                self._apply(batch)
+        return len(batch)
+
+    def _flush_loop(self):
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error("Error flushing metric observations: %s", e, exc_info=True)
+
+    def start(self):
+        """Start the background flusher."""
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the background flusher and apply what is left in the buffer."""
+        if self._thread is not None and self._thread.is_alive():
+            self._stop_event.set()
+            self._thread.join(timeout=timeout)
+        self.flush()
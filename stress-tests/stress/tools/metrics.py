@@ -1,4 +1,5 @@
 import os
+import json
 import logging
 import threading
 from datetime import timedelta
@@ -11,6 +12,10 @@ from prometheus_client import (
     Enum,
     disable_created_metrics,
 )
+from prometheus_client.metrics_core import Metric
+
+from stress.tools.hdr_histogram import LatencyRecorder, quantiles_ms
+from stress.tools.metric_buffer import ObservationBuffer
 
 # Prometheus Push Gateway constants
 PUSHGATEWAY_HOST = os.getenv("PUSHGATEWAY_HOST", "metrics.golem.network")
@@ -20,6 +25,37 @@ JOB_NAME = os.getenv("JOB_NAME", "arkiv-stress-l3")
 INSTANCE_ID = os.getenv("INSTANCE_ID", None)
 DEFAULT_PUSH_INTERVAL = 1  # Default interval in seconds for pushing metrics
 
+# Metrics mode:
+# - "push": every process pushes its own registry to the push gateway
+# - "aggregate": workers send metric deltas to the locust master, which merges them and
+#   serves a single /metrics endpoint on METRICS_PORT (see stress.tools.metrics_aggregation)
+METRICS_MODE = os.getenv("METRICS_MODE", "push").lower()
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9646"))
+# In aggregate mode, also push the merged metrics from the master to the push gateway
+METRICS_PUSHGATEWAY = os.getenv("METRICS_PUSHGATEWAY", "false").lower() in ("1", "true", "yes")
+
+# Gauges that workers report to the master in aggregate mode (summed over workers).
+# Other gauges (entity count, load test status) are maintained by the master itself.
+SHIPPED_GAUGES = {
+    "loadtest_current_user_count",
+    "loadtest_harness_cpu_percent",
+    "loadtest_harness_rss_bytes",
+    "loadtest_harness_greenlets",
+    "loadtest_harness_loop_lag_max_seconds",
+    "loadtest_harness_saturated",
+}
+
+# Hot-path observations (record_query, record_query_shape, record_transaction) are buffered
+# and applied in batches by a background flusher (see stress.tools.metric_buffer)
+METRICS_BUFFER = os.getenv("METRICS_BUFFER", "true").lower() in ("1", "true", "yes")
+METRICS_BUFFER_SIZE = int(os.getenv("METRICS_BUFFER_SIZE", "65536"))
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "0.1"))
+
+# Buffered observation kinds
+OBS_QUERY = 0
+OBS_QUERY_SHAPE = 1
+OBS_TRANSACTION = 2
+
 
 class Metrics:
     """
@@ -28,6 +64,9 @@ class Metrics:
 
     _instance = None
 
+    # Set on workers in aggregate mode: callable that sends a delta message to the master
+    delta_sink = None
+
     @classmethod
     def get_metrics(cls):
         """Get the global metrics instance"""
@@ -45,7 +84,10 @@ class Metrics:
         cls._instance = cls()
 
     def __init__(
-        self, instance_id: str = None, push_interval: int = DEFAULT_PUSH_INTERVAL
+        self,
+        instance_id: str = None,
+        push_interval: int = DEFAULT_PUSH_INTERVAL,
+        buffered: bool = METRICS_BUFFER,
     ):
         """
         Initialize the Metrics class
@@ -53,6 +95,7 @@ class Metrics:
         Args:
             instance_id: Instance ID for metrics (defaults to INSTANCE_ID constant)
             push_interval: Interval in seconds for pushing metrics to gateway (defaults to 5)
+            buffered: Buffer hot-path observations and apply them in the background (defaults to METRICS_BUFFER)
         """
         self.job_name = JOB_NAME
         self.instance_id = instance_id or INSTANCE_ID
@@ -62,6 +105,26 @@ class Metrics:
         self._push_thread = None
         self._initialized = False
 
+        # Aggregate mode: values already shipped (worker) and merged worker values (master)
+        self._shipped: dict[tuple, float] = {}
+        self._worker_sums: dict[tuple, float] = {}
+        self._worker_gauges: dict[str, dict[tuple, float]] = {}
+        self._aggregate_lock = threading.Lock()
+
+        # Exact latency percentiles (the Prometheus histograms below have coarse buckets)
+        self.latency = LatencyRecorder()
+        self._interval_quantile_keys: set[tuple] = set()
+
+        # Pre-bound label children per (observation kind, label)
+        self._children: dict[tuple, tuple] = {}
+        self._buffer = (
+            ObservationBuffer(self._apply_observations, METRICS_BUFFER_SIZE, METRICS_FLUSH_INTERVAL)
+            if buffered
+            else None
+        )
+        # Buffer drops already added to observations_dropped
+        self._dropped_exported = 0
+
         disable_created_metrics()
 
         # Initialize common metrics
@@ -84,8 +147,8 @@ class Metrics:
         if self._initialized:
             return
 
-        logging.info(f"Metrics will be reported to Grafana under job name: {self.job_name}, instance ID: {self.instance_id}")
-        logging.debug(f"Metrics push interval: {self.push_interval} seconds")
+        logging.info("Metrics will be reported to Grafana under job name: %s, instance ID: %s", self.job_name, self.instance_id)
+        logging.debug("Metrics push interval: %s seconds", self.push_interval)
 
         # Start the background task
         self._start_push_task()
@@ -164,6 +227,15 @@ class Metrics:
             registry=self.registry,
         )
 
+        # Latency quantiles from the HDR histograms behind record_query/record_transaction,
+        # for the whole run and for the last reporting interval
+        self.latency_quantile = Gauge(
+            "loadtest_latency_quantile_milliseconds",
+            "Latency quantiles (0.5, 0.99, 0.999, max) by operation, label and window (run or interval)",
+            ["operation", "label", "window", "quantile"],
+            registry=self.registry,
+        )
+
         # Query result size histogram (number of entities returned)
         result_size_buckets = [
             0,
@@ -191,6 +263,59 @@ class Metrics:
             registry=self.registry,
         )
 
+        # Query time histogram grouped by generated query shape (in milliseconds)
+        self.query_shape_time = Histogram(
+            "loadtest_query_shape_time_milliseconds",
+            "Time taken to execute grammar-generated queries in milliseconds, by query shape",
+            ["shape"],
+            buckets=time_buckets,
+            registry=self.registry,
+        )
+        self.query_shape_result_size = Histogram(
+            "loadtest_query_shape_result_size",
+            "Number of entities returned by grammar-generated queries, by query shape",
+            ["shape"],
+            buckets=result_size_buckets,
+            registry=self.registry,
+        )
+
+        # Field-projection benchmark (see stress/l3/query_projection_benchmark.py)
+        self.projection_time = Histogram(
+            "loadtest_projection_query_time_milliseconds",
+            "Query time by field projection, query shape and client (raw JSON-RPC or SDK)",
+            ["projection", "shape", "client"],
+            buckets=time_buckets,
+            registry=self.registry,
+        )
+        self.projection_response_bytes = Histogram(
+            "loadtest_projection_response_bytes",
+            "Size of the arkiv_query response body by field projection and query shape",
+            ["projection", "shape"],
+            buckets=[1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000],
+            registry=self.registry,
+        )
+        self.projection_decode_time = Histogram(
+            "loadtest_projection_decode_time_milliseconds",
+            "Client-side decode time of query responses by field projection, query shape and stage (json or sdk)",
+            ["projection", "shape", "stage"],
+            buckets=[0.1, 0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000],
+            registry=self.registry,
+        )
+
+        # Concurrent query fan-out batches (see stress.tools.fan_out)
+        self.fan_out_batch_time = Histogram(
+            "loadtest_fan_out_batch_time_milliseconds",
+            "Wall time of a batch of concurrent queries issued by one user, by batch size",
+            ["size"],
+            buckets=time_buckets,
+            registry=self.registry,
+        )
+        self.fan_out_failed_queries = Counter(
+            "loadtest_fan_out_failed_queries_total",
+            "Total number of failed queries in fan-out batches",
+            registry=self.registry,
+        )
+
         # Transaction metrics
         self.transactions_count = Counter(
             "loadtest_transactions_total",
@@ -218,6 +343,124 @@ class Metrics:
             registry=self.registry,
         )
 
+        # JSON-RPC transport of the lean provider (see stress.tools.rpc_transport)
+        self.rpc_requests = Counter(
+            "loadtest_rpc_requests_total",
+            "Total number of JSON-RPC requests sent by the lean provider",
+            registry=self.registry,
+        )
+        self.rpc_body_bytes = Counter(
+            "loadtest_rpc_body_bytes_total",
+            "Uncompressed JSON-RPC body bytes by direction",
+            ["direction"],
+            registry=self.registry,
+        )
+        self.rpc_wire_bytes = Counter(
+            "loadtest_rpc_wire_bytes_total",
+            "JSON-RPC body bytes on the wire (after compression) by direction",
+            ["direction"],
+            registry=self.registry,
+        )
+        self.rpc_client_cpu = Counter(
+            "loadtest_rpc_client_cpu_seconds_total",
+            "Client CPU time spent encoding, compressing, decompressing and decoding JSON-RPC bodies",
+            registry=self.registry,
+        )
+
+        # Query result oracle (see stress.tools.shadow_index)
+        self.oracle_checks = Counter(
+            "loadtest_oracle_checks_total",
+            "Total number of query results checked against the shadow index, by result",
+            ["result"],
+            registry=self.registry,
+        )
+        self.oracle_mismatched_entities = Counter(
+            "loadtest_oracle_mismatched_entities_total",
+            "Total number of entities missing from or unexpected in checked query results",
+            ["kind"],
+            registry=self.registry,
+        )
+        self.oracle_result_ratio = Histogram(
+            "loadtest_oracle_result_ratio",
+            "Ratio of expected (shadow index) to returned query result size",
+            buckets=[0, 0.5, 0.9, 0.99, 1, 1.01, 1.1, 2, 10],
+            registry=self.registry,
+        )
+
+        # Observations overwritten in a full ObservationBuffer (see stress.tools.metric_buffer)
+        self.observations_dropped = Counter(
+            "loadtest_metric_observations_dropped_total",
+            "Total number of metric observations dropped because the observation buffer was full",
+            registry=self.registry,
+        )
+
+        # Read-your-writes visibility probes (see stress.tools.visibility_probe)
+        self.visibility_time = Histogram(
+            "loadtest_visibility_time_milliseconds",
+            "Time until a created entity is visible, by read path and starting point (submit or receipt)",
+            ["path", "since"],
+            buckets=time_buckets,
+            registry=self.registry,
+        )
+        self.visibility_probes = Counter(
+            "loadtest_visibility_probes_total",
+            "Total number of visibility and expiry probe outcomes",
+            ["outcome"],
+            registry=self.registry,
+        )
+        self.expiry_lag_blocks = Histogram(
+            "loadtest_expiry_lag_blocks",
+            "Blocks past the expiration block at which an expired probe entity was no longer visible",
+            buckets=[0, 1, 2, 3, 5, 10, 20, 50],
+            registry=self.registry,
+        )
+
+        # Load generator self-monitoring, labelled per worker process (see harness_monitor)
+        self.harness_cpu_percent = Gauge(
+            "loadtest_harness_cpu_percent",
+            "CPU usage of the load generator process (100 = one core)",
+            ["worker"],
+            registry=self.registry,
+        )
+        self.harness_rss_bytes = Gauge(
+            "loadtest_harness_rss_bytes",
+            "Resident memory of the load generator process",
+            ["worker"],
+            registry=self.registry,
+        )
+        self.harness_greenlets = Gauge(
+            "loadtest_harness_greenlets",
+            "Number of greenlets in the load generator process",
+            ["worker"],
+            registry=self.registry,
+        )
+        self.harness_loop_lag = Histogram(
+            "loadtest_harness_loop_lag_seconds",
+            "Delay of the gevent hub in waking up a sleeping greenlet",
+            ["worker"],
+            buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5],
+            registry=self.registry,
+        )
+        self.harness_loop_lag_max = Gauge(
+            "loadtest_harness_loop_lag_max_seconds",
+            "Largest gevent hub delay over the last monitoring interval",
+            ["worker"],
+            registry=self.registry,
+        )
+        self.harness_gc_pause = Histogram(
+            "loadtest_harness_gc_pause_seconds",
+            "Garbage collector pause times by generation",
+            ["worker", "generation"],
+            buckets=[0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1],
+            registry=self.registry,
+        )
+        self.harness_saturated = Gauge(
+            "loadtest_harness_saturated",
+            "1 while the load generator itself is the bottleneck (CPU or event loop lag over the limits)",
+            ["worker"],
+            registry=self.registry,
+        )
+
         # Load test status metric
         self.loadtest_running = Enum(
             "loadtest_status",
@@ -235,25 +478,81 @@ class Metrics:
         )
         self.total_entity_count.set(0)
 
+        # Chain state sampled by the master (see chain_sampler)
+        self.chain_head_block_number = Gauge(
+            "arkiv_chain_head_block_number",
+            "Number of the latest block",
+            registry=self.registry,
+        )
+        self.chain_head_block_timestamp = Gauge(
+            "arkiv_chain_head_block_timestamp_seconds",
+            "Timestamp of the latest block",
+            registry=self.registry,
+        )
+        self.chain_block_gas_used = Gauge(
+            "arkiv_chain_block_gas_used",
+            "Gas used by the latest block",
+            registry=self.registry,
+        )
+        self.chain_block_gas_limit = Gauge(
+            "arkiv_chain_block_gas_limit",
+            "Gas limit of the latest block",
+            registry=self.registry,
+        )
+        self.chain_gas_utilization = Gauge(
+            "arkiv_chain_gas_utilization_ratio",
+            "Gas used / gas limit over the blocks produced since the previous sample",
+            registry=self.registry,
+        )
+        self.chain_block_tx_count = Gauge(
+            "arkiv_chain_block_tx_count",
+            "Average number of transactions per block since the previous sample",
+            registry=self.registry,
+        )
+        self.chain_block_interval = Gauge(
+            "arkiv_chain_block_interval_seconds",
+            "Average time between blocks since the previous sample",
+            registry=self.registry,
+        )
+        self.chain_txpool = Gauge(
+            "arkiv_chain_txpool_transactions",
+            "Transactions in the node's txpool",
+            ["state"],
+            registry=self.registry,
+        )
+        self.chain_tx_rate = Gauge(
+            "arkiv_chain_tx_per_second",
+            "Transactions included per second of chain time since the previous sample",
+            registry=self.registry,
+        )
+        self.chain_bytes_rate = Gauge(
+            "arkiv_chain_bytes_per_second",
+            "Block bytes included per second of chain time since the previous sample",
+            registry=self.registry,
+        )
+        self.chain_entity_rate = Gauge(
+            "arkiv_chain_entities_per_second",
+            "Net change of the entity count per second of chain time since the previous sample",
+            registry=self.registry,
+        )
+
     def _start_push_task(self):
         """Start the background task for periodic metric pushing"""
         self._push_thread = threading.Thread(
             target=self._push_metrics_loop, daemon=True
         )
         self._push_thread.start()
-        logging.info(
-            f"Started background metrics push task with {self.push_interval}s interval"
-        )
+        logging.info("Started background metrics push task with %ss interval", self.push_interval)
 
     def _push_metrics_loop(self):
         """Background loop for pushing metrics at regular intervals"""
         while not self._stop_event.is_set():
             try:
-                self.push_metrics()
+                self.report_metrics()
                 # Wait for the specified interval or until stop event is set
                 self._stop_event.wait(self.push_interval)
             except Exception as e:
-                logging.error(f"Error in metrics push loop: {e}")
+                logging.error("Error in metrics push loop: %s", e)
                 # Wait a bit before retrying
                 self._stop_event.wait(5)
 
@@ -263,13 +562,47 @@ class Metrics:
             self._stop_event.set()
             self._push_thread.join(timeout=5)
             logging.info("Stopped background metrics push task")
+        if self._buffer is not None:
+            self._buffer.stop()
+            self._export_dropped()
+            if self._buffer.dropped:
+                logging.warning(
+                    "%s metric observations were dropped (METRICS_BUFFER_SIZE is too small)", self._buffer.dropped
+                )
+
+    def flush(self):
+        """Apply buffered observations now"""
+        if self._buffer is not None:
+            self._buffer.flush()
+            self._export_dropped()
+
+    def _export_dropped(self):
+        dropped = self._buffer.dropped
+        if dropped > self._dropped_exported:
+            self.observations_dropped.inc(dropped - self._dropped_exported)
+            self._dropped_exported = dropped
+
+    def report_metrics(self):
+        """Report metrics according to METRICS_MODE (called periodically by the push loop)"""
+        self.flush()
+        if METRICS_MODE == "aggregate" and Metrics.delta_sink is not None:
+            # Workers only ship, the master computes the quantiles of the merged histograms
+            self.ship_deltas()
+            return
 
-    def push_metrics(self, grouping_key: dict = None):
+        self.update_latency_quantiles()
+        if METRICS_MODE != "aggregate":
+            self.push_metrics()
+        elif METRICS_PUSHGATEWAY:
+            self.push_metrics(registry=AggregatedRegistry.get())
+
+    def push_metrics(self, grouping_key: dict = None, registry: CollectorRegistry = None):
         """
         Push metrics to Prometheus Push Gateway
 
         Args:
             grouping_key: Dictionary of labels for grouping metrics
+            registry: Registry to push (defaults to this instance's registry)
         """
         # Don't push metrics if instance_id is not set
         if self.instance_id is None:
@@ -293,12 +626,106 @@ class Metrics:
             push_to_gateway(
                 push_url,
                 job=self.job_name,
-                registry=self.registry,
+                registry=registry or self.registry,
                 grouping_key=final_grouping_key,
             )
-            logging.debug(f"Metrics pushed to {push_url} for job: {self.job_name}")
+            logging.debug("Metrics pushed to %s for job: %s", push_url, self.job_name)
         except Exception as e:
-            logging.error(f"Failed to push metrics to {push_url}: {e}")
+            logging.error("Failed to push metrics to %s: %s", push_url, e)
+
+    # -------------------------------------------------------------------------
+    # Aggregate mode
+    # -------------------------------------------------------------------------
+
+    def ship_deltas(self):
+        """
+        Send counter and histogram increments since the last call, and the shipped gauges, to the master.
+
+        All samples of a labelled child (e.g. every bucket of a histogram) are sent together
+        whenever any of them changed, so the master always sees complete children.
+        """
+        children: dict[tuple, list[tuple[tuple, float]]] = {}
+        gauges = []
+        for family in self.registry.collect():
+            if family.type in ("counter", "histogram"):
+                for sample in family.samples:
+                    labels = tuple(sorted(sample.labels.items()))
+                    child = (family.name, tuple(item for item in labels if item[0] != "le"))
+                    children.setdefault(child, []).append(((family.name, sample.name, labels), sample.value))
+            elif family.name in SHIPPED_GAUGES:
+                for sample in family.samples:
+                    gauges.append([family.name, sample.name, sorted(sample.labels.items()), sample.value])
+
+        counters = []
+        for samples in children.values():
+            if all(value == self._shipped.get(key, 0.0) for key, value in samples):
+                continue
+            for key, value in samples:
+                counters.append([key[0], key[1], list(key[2]), value - self._shipped.get(key, 0.0)])
+                self._shipped[key] = value
+
+        latency = [
+            [operation, label, histogram.to_dict()]
+            for (operation, label), histogram in self.latency.take_interval().items()
+        ]
+        Metrics.delta_sink({"counters": counters, "gauges": gauges, "latency": latency})
+
+    def merge_worker_delta(self, worker_id: str, data: dict):
+        """Merge a delta message sent by a worker's `ship_deltas`"""
+        with self._aggregate_lock:
+            for family, sample, labels, delta in data["counters"]:
+                key = (family, sample, tuple(tuple(item) for item in labels))
+                self._worker_sums[key] = self._worker_sums.get(key, 0.0) + delta
+            self._worker_gauges[worker_id] = {
+                (family, sample, tuple(tuple(item) for item in labels)): value
+                for family, sample, labels, value in data["gauges"]
+            }
+        self.latency.merge(data.get("latency", []))
+
+    def collect_aggregated(self):
+        """Collect this instance's metrics with the merged worker values added"""
+        with self._aggregate_lock:
+            extra = dict(self._worker_sums)
+            for gauges in self._worker_gauges.values():
+                for key, value in gauges.items():
+                    extra[key] = extra.get(key, 0.0) + value
+
+        for family in self.registry.collect():
+            merged = Metric(family.name, family.documentation, family.type, family.unit)
+            seen = set()
+            for sample in family.samples:
+                key = (family.name, sample.name, tuple(sorted(sample.labels.items())))
+                seen.add(key)
+                merged.add_sample(sample.name, sample.labels, sample.value + extra.get(key, 0.0))
+            # Labelled children only the workers have observed
+            for key, value in extra.items():
+                if key[0] == family.name and key not in seen:
+                    merged.add_sample(key[1], dict(key[2]), value)
+            yield merged
+
+    def update_latency_quantiles(self):
+        """Export run and interval quantiles of the latency histograms and start a new interval"""
+        interval = self.latency.take_interval()
+        for (operation, label), histogram in dict(self.latency.run).items():
+            for quantile, value in quantiles_ms(histogram).items():
+                self.latency_quantile.labels(operation, label, "run", quantile).set(value)
+
+        interval_keys = set()
+        for (operation, label), histogram in interval.items():
+            for quantile, value in quantiles_ms(histogram).items():
+                self.latency_quantile.labels(operation, label, "interval", quantile).set(value)
+                interval_keys.add((operation, label, "interval", quantile))
+        # Operations without samples in this interval have no interval quantiles
+        for key in self._interval_quantile_keys - interval_keys:
+            self.latency_quantile.remove(*key)
+        self._interval_quantile_keys = interval_keys
+
+    def dump_latency_snapshot(self, path: str):
+        """Write the run latency histograms to `path` as JSON (mergeable across processes and runs)"""
+        self.flush()
+        with open(path, "w") as f:
+            json.dump({"instance": self.instance_id, "histograms": self.latency.snapshot()}, f)
+        logging.info("Latency histogram snapshot written to %s", path)
 
     def get_registry(self):
         """Get the CollectorRegistry instance"""
@@ -308,11 +735,9 @@ class Metrics:
         """Set the load test status"""
         if status in ["stopped", "running"]:
             self.loadtest_running.state(status)
-            logging.info(f"Load test status set to: {status}")
+            logging.info("Load test status set to: %s", status)
         else:
-            logging.warning(
-                f"Invalid load test status: {status}. Valid states: stopped, running"
-            )
+            logging.warning("Invalid load test status: %s. Valid states: stopped, running", status)
         return self.registry
 
     # Simple one-liner functions for recording metrics
@@ -325,19 +750,187 @@ class Metrics:
             duration: Duration as timedelta (converted to milliseconds)
             result_size: Number of entities returned by the query
         """
-        self.queries_by_percentile.labels(percentile=str(selectivness)).inc()
-        # Convert duration to milliseconds
-        duration_ms = duration.total_seconds() * 1000
-        self.query_time.labels(percentile=str(selectivness)).observe(duration_ms)
-        self.query_result_size.labels(percentile=str(selectivness)).observe(result_size)
+        self._record((OBS_QUERY, selectivness, duration.total_seconds() * 1000, result_size))
+
+    def record_query_shape(self, shape: str, duration: timedelta, result_size: int = 0):
+        """
+        Record a grammar-generated query execution grouped by its shape.
+
+        Args:
+            shape: Query shape (see stress.tools.query_grammar)
+            duration: Duration as timedelta (converted to milliseconds)
+            result_size: Number of entities returned by the query
+        """
+        self._record((OBS_QUERY_SHAPE, shape, duration.total_seconds() * 1000, result_size))
+
+    def record_projection_query(
+        self,
+        projection: str,
+        shape: str,
+        client: str,
+        duration: timedelta,
+        response_bytes: int | None = None,
+        decode_times: dict[str, timedelta] | None = None,
+    ):
+        """
+        Record a query of the field-projection benchmark.
+
+        Args:
+            projection: Field projection name (e.g. "key", "all")
+            shape: Query shape name
+            client: "raw" for plain JSON-RPC, "sdk" for the Arkiv SDK
+            duration: Duration as timedelta (converted to milliseconds)
+            response_bytes: Size of the response body, if known
+            decode_times: Client-side decode time per stage, if measured
+        """
+        self.projection_time.labels(projection=projection, shape=shape, client=client).observe(
+            duration.total_seconds() * 1000
+        )
+        if response_bytes is not None:
+            self.projection_response_bytes.labels(projection=projection, shape=shape).observe(response_bytes)
+        for stage, decode_time in (decode_times or {}).items():
+            self.projection_decode_time.labels(projection=projection, shape=shape, stage=stage).observe(
+                decode_time.total_seconds() * 1000
+            )
+
+    def record_fan_out(self, size: int, duration: timedelta, failures: int = 0):
+        """Record the wall time of a fan-out batch of `size` queries (duration as timedelta, converted to milliseconds)"""
+        self.fan_out_batch_time.labels(size=str(size)).observe(duration.total_seconds() * 1000)
+        self.fan_out_failed_queries.inc(failures)
+
+    def record_rpc_transport(
+        self, request_bytes: int, request_wire_bytes: int, response_bytes: int, response_wire_bytes: int,
+        cpu_seconds: float,
+    ):
+        """Record the body sizes (before and after compression) and the client CPU time of a JSON-RPC request"""
+        self.rpc_requests.inc()
+        self.rpc_body_bytes.labels(direction="request").inc(request_bytes)
+        self.rpc_wire_bytes.labels(direction="request").inc(request_wire_bytes)
+        self.rpc_body_bytes.labels(direction="response").inc(response_bytes)
+        self.rpc_wire_bytes.labels(direction="response").inc(response_wire_bytes)
+        self.rpc_client_cpu.inc(cpu_seconds)
+
+    def record_oracle_check(self, result=None):
+        """
+        Record the outcome of a query result oracle check.
+
+        Args:
+            result: OracleResult, or None if the check was skipped because of concurrent writes
+        """
+        if result is None:
+            self.oracle_checks.labels(result="skipped").inc()
+            return
+        self.oracle_checks.labels(result="match" if result.ok else "mismatch").inc()
+        self.oracle_mismatched_entities.labels(kind="missing").inc(len(result.missing))
+        self.oracle_mismatched_entities.labels(kind="unexpected").inc(len(result.unexpected))
+        self.oracle_result_ratio.observe(result.ratio)
+
+    def record_visibility(self, path: str, since_submit: timedelta, since_receipt: timedelta):
+        """
+        Record the time until a created entity became visible through a read path.
+
+        Args:
+            path: Read path ("query" or "get_entity")
+            since_submit: Time from submitting the transaction to visibility
+            since_receipt: Time from receiving the receipt to visibility
+        """
+        self.visibility_time.labels(path=path, since="submit").observe(since_submit.total_seconds() * 1000)
+        self.visibility_time.labels(path=path, since="receipt").observe(since_receipt.total_seconds() * 1000)
+
+    def record_probe_outcome(self, outcome: str):
+        """Record a visibility probe outcome (e.g. "visible", "timeout")"""
+        self.visibility_probes.labels(outcome=outcome).inc()
+
+    def record_expiry(self, lag_blocks: int, gone: bool):
+        """
+        Record the expiry check of a probe entity.
+
+        Args:
+            lag_blocks: Blocks past the expiration block when the check concluded
+            gone: Whether the entity was gone (False if it was still visible at the timeout)
+        """
+        self.record_probe_outcome("expired" if gone else "not_expired")
+        if gone:
+            self.expiry_lag_blocks.observe(lag_blocks)
 
     def record_transaction(
         self, payload_bytes: int, duration: timedelta, entity_count: int = 1
     ):
         """Record a transaction with payload size, duration, and entity count (duration as timedelta, converted to milliseconds)"""
-        self.transactions_count.inc()
-        self.transaction_payload_bytes.inc(payload_bytes)
-        self.entities_created.inc(entity_count)
-        # Convert duration to milliseconds
-        duration_ms = duration.total_seconds() * 1000
-        self.transaction_time.observe(duration_ms)
+        self._record((OBS_TRANSACTION, payload_bytes, duration.total_seconds() * 1000, entity_count))
+
+    def _record(self, observation: tuple):
+        if self._buffer is not None:
+            self._buffer.append(observation)
+        else:
+            self._apply_observations([observation])
+
+    def _bound_children(self, kind: int, label) -> tuple:
+        # Label formatting and .labels() lookups happen once per (kind, label)
+        children = self._children.get((kind, label))
+        if children is None:
+            if kind == OBS_QUERY:
+                text = str(label)
+                children = (
+                    self.queries_by_percentile.labels(percentile=text),
+                    self.query_time.labels(percentile=text),
+                    self.query_result_size.labels(percentile=text),
+                    ("query", text),
+                )
+            else:
+                children = (
+                    self.query_shape_time.labels(shape=label),
+                    self.query_shape_result_size.labels(shape=label),
+                    ("query_shape", label),
+                )
+            self._children[(kind, label)] = children
+        return children
+
+    def _apply_observations(self, batch: list[tuple]):
+        """Apply a batch of buffered observations, aggregating counter increments"""
+        query_counts: dict = {}
+        transactions = payload_bytes = entities = 0
+        latency = []
+        for kind, label, duration_ms, value in batch:
+            if kind == OBS_QUERY:
+                _, query_time, result_size, latency_key = self._bound_children(kind, label)
+                query_time.observe(duration_ms)
+                result_size.observe(value)
+                query_counts[label] = query_counts.get(label, 0) + 1
+                latency.append((latency_key, duration_ms))
+            elif kind == OBS_QUERY_SHAPE:
+                shape_time, shape_result_size, latency_key = self._bound_children(kind, label)
+                shape_time.observe(duration_ms)
+                shape_result_size.observe(value)
+                latency.append((latency_key, duration_ms))
+            else:
+                transactions += 1
+                payload_bytes += label
+                entities += value
+                self.transaction_time.observe(duration_ms)
+                latency.append((("transaction", ""), duration_ms))
+
+        for label, count in query_counts.items():
+            self._bound_children(OBS_QUERY, label)[0].inc(count)
+        if transactions:
+            self.transactions_count.inc(transactions)
+            self.transaction_payload_bytes.inc(payload_bytes)
+            self.entities_created.inc(entities)
+        self.latency.record_many(latency)
+
+
+class AggregatedRegistry:
+    """Registry serving the current metrics instance merged with the worker deltas"""
+
+    _registry = None
+
+    @classmethod
+    def get(cls) -> CollectorRegistry:
+        if cls._registry is None:
+            cls._registry = CollectorRegistry(auto_describe=False)
+            cls._registry.register(cls())
+        return cls._registry
+
+    def collect(self):
+        # Resolved on every scrape, the metrics instance is replaced at each test start
+        return Metrics.get_metrics().collect_aggregated()
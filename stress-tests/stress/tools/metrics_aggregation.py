@@ -0,0 +1,67 @@
+"""
+Locust wiring of the "aggregate" metrics mode (METRICS_MODE=aggregate).
+
+Workers ship compact metric deltas to the master over locust's message channel
+instead of pushing their full registry to the push gateway every second. The
+master (or the local runner) merges them into its own metrics and serves a
+single /metrics endpoint on METRICS_PORT for Prometheus to scrape. With
+METRICS_PUSHGATEWAY=true the master additionally pushes the merged metrics.
+
+At test stop, the latency histograms are written to LATENCY_SNAPSHOT_DIR (for
+stress.tools.compare_runs) by the processes that hold each sample exactly once:
+the master in aggregate mode, the workers (or the local runner) otherwise.
+"""
+
+import logging
+import os
+import socket
+
+from locust import events
+from locust.runners import LocalRunner, MasterRunner, WorkerRunner
+from prometheus_client import start_http_server
+
+from stress.tools.metrics import METRICS_MODE, METRICS_PORT, AggregatedRegistry, Metrics
+
+METRICS_DELTA_MESSAGE = "metrics_delta"
+
+# Directory for latency histogram snapshots written at test stop (empty disables them)
+LATENCY_SNAPSHOT_DIR = os.getenv("LATENCY_SNAPSHOT_DIR", "")
+
+
+@events.init.add_listener
+def on_locust_init(environment, **kwargs):
+    if METRICS_MODE != "aggregate":
+        return
+
+    runner = environment.runner
+    if isinstance(runner, WorkerRunner):
+        Metrics.delta_sink = lambda data: runner.send_message(METRICS_DELTA_MESSAGE, data)
+
+    elif isinstance(runner, (MasterRunner, LocalRunner)):
+        def on_metrics_delta(environment, msg, **kwargs):
+            Metrics.get_metrics().merge_worker_delta(msg.node_id, msg.data)
+
+        runner.register_message(METRICS_DELTA_MESSAGE, on_metrics_delta)
+        start_http_server(METRICS_PORT, registry=AggregatedRegistry.get())
+        logging.info("Serving aggregated metrics on :%s/metrics", METRICS_PORT)
+
+
+@events.test_stop.add_listener
+def on_test_stop(environment, **kwargs):
+    if not LATENCY_SNAPSHOT_DIR:
+        return
+
+    runner = environment.runner
+    if METRICS_MODE == "aggregate":
+        if isinstance(runner, WorkerRunner):
+            # Ship the last deltas before the master writes the merged histograms
+            Metrics.get_metrics().report_metrics()
+            return
+    elif isinstance(runner, MasterRunner):
+        # The master records no samples of its own
+        return
+
+    os.makedirs(LATENCY_SNAPSHOT_DIR, exist_ok=True)
+    Metrics.get_metrics().dump_latency_snapshot(
+        os.path.join(LATENCY_SNAPSHOT_DIR, f"latency-{socket.gethostname()}-{os.getpid()}.json")
+    )
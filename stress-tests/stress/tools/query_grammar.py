@@ -0,0 +1,306 @@
+"""
+Grammar-driven query generator for the DC (data center) Arkiv workload.
+
+Instead of a handful of fixed query templates, queries are built from a small
+grammar of the Arkiv query language over the attribute schema written by
+`node_to_arkiv_attributes` / `workload_to_arkiv_attributes`:
+
+    query := type_clause && expr
+    expr  := term | expr && expr | expr || expr
+    term  := attr = "s" | attr != "s" | attr <op> n | attr >= lo && attr <= hi
+
+Productions are picked with configurable weights. Every generated query also
+carries a "shape" - the query with attribute kinds instead of names and values
+(e.g. `node: (num> || str!=) && str=`) - so latency can be grouped by shape
+without exploding the number of distinct stats entries.
+"""
+
+import random
+from dataclasses import dataclass, field
+from typing import Any, Mapping, Sequence
+
+from stress.tools.dc_data import (
+    NODE,
+    WORKLOAD,
+    get_avail_hours_distribution,
+    get_cpu_count_distribution,
+    get_max_hours_distribution,
+    get_node_status_distribution,
+    get_price_hour_range,
+    get_ram_gb_distribution,
+    get_region_distribution,
+    get_req_cpu_distribution,
+    get_req_ram_distribution,
+    get_vm_type_distribution,
+    get_workload_status_distribution,
+    make_dc_id,
+)
+
+NUMERIC_OPS = [">=", "<=", ">", "<"]
+
+
+# =============================================================================
+# Attribute Schema (mirrors node_to_arkiv_attributes / workload_to_arkiv_attributes)
+# =============================================================================
+
+def _values(dist: list[tuple[Any, float]]) -> list[Any]:
+    return [value for value, _ in dist]
+
+
+def _price_values() -> list[int]:
+    low, high = get_price_hour_range()
+    return list(range(low, high + 1, 50))
+
+
+STRING_ATTRS: dict[str, dict[str, list[str]]] = {
+    NODE: {
+        "dc_id": [make_dc_id(1)],
+        "region": _values(get_region_distribution()),
+        "status": _values(get_node_status_distribution()),
+        "vm_type": _values(get_vm_type_distribution()),
+    },
+    WORKLOAD: {
+        "dc_id": [make_dc_id(1)],
+        "region": _values(get_region_distribution()),
+        "status": _values(get_workload_status_distribution()),
+        "vm_type": _values(get_vm_type_distribution()),
+    },
+}
+
+NUMERIC_ATTRS: dict[str, dict[str, list[int]]] = {
+    NODE: {
+        "cpu_count": _values(get_cpu_count_distribution()),
+        "ram_gb": _values(get_ram_gb_distribution()),
+        "price_hour": _price_values(),
+        "avail_hours": _values(get_avail_hours_distribution()),
+    },
+    WORKLOAD: {
+        "req_cpu": _values(get_req_cpu_distribution()),
+        "req_ram": _values(get_req_ram_distribution()),
+        "max_hours": _values(get_max_hours_distribution()),
+    },
+}
+
+# Id attributes are only used when the caller provides sampled ids
+ID_ATTRS = {NODE: "node_id", WORKLOAD: "workload_id"}
+
+
+# =============================================================================
+# Query AST
+# =============================================================================
+
+@dataclass(frozen=True)
+class Term:
+    """A single comparison: attr <op> value."""
+    attr: str
+    op: str
+    value: str | int
+
+    def render(self) -> str:
+        if isinstance(self.value, str):
+            return f'{self.attr}{self.op}"{self.value}"'
+        return f"{self.attr}{self.op}{self.value}"
+
+    def shape(self) -> str:
+        if self.attr in ID_ATTRS.values():
+            return f"id{self.op}"
+        if isinstance(self.value, str):
+            return f"str{self.op}"
+        # Strict and non-strict bounds behave the same for the planner
+        return "num<" if self.op.startswith("<") else "num>"
+
+    def matches(self, attributes: Mapping[str, Any]) -> bool:
+        actual = attributes.get(self.attr)
+        if actual is None:
+            # Arkiv only matches entities that carry the attribute
+            return False
+        if self.op == "=":
+            return actual == self.value
+        if self.op == "!=":
+            return actual != self.value
+        if isinstance(actual, str) or isinstance(self.value, str):
+            return False
+        if self.op == ">=":
+            return actual >= self.value
+        if self.op == "<=":
+            return actual <= self.value
+        if self.op == ">":
+            return actual > self.value
+        if self.op == "<":
+            return actual < self.value
+        raise ValueError(f"Unsupported operator: {self.op}")
+
+
+@dataclass(frozen=True)
+class Range:
+    """Closed numeric range: attr >= low && attr <= high."""
+    attr: str
+    low: int
+    high: int
+
+    def render(self) -> str:
+        return f"{self.attr}>={self.low} && {self.attr}<={self.high}"
+
+    def shape(self) -> str:
+        return "num[..]"
+
+    def matches(self, attributes: Mapping[str, Any]) -> bool:
+        actual = attributes.get(self.attr)
+        if actual is None or isinstance(actual, str):
+            return False
+        return self.low <= actual <= self.high
+
+
+@dataclass(frozen=True)
+class BoolOp:
+    """Conjunction (&&) or disjunction (||) of sub-expressions."""
+    op: str
+    children: tuple
+
+    def render(self) -> str:
+        return f" {self.op} ".join(_render_child(child, self.op) for child in self.children)
+
+    def shape(self) -> str:
+        # Operands are commutative and repeats add little, so keep a sorted set of them
+        # to bound the number of distinct shapes
+        return f" {self.op} ".join(sorted({_shape_child(child, self.op) for child in self.children}))
+
+    def matches(self, attributes: Mapping[str, Any]) -> bool:
+        if self.op == "&&":
+            return all(child.matches(attributes) for child in self.children)
+        return any(child.matches(attributes) for child in self.children)
+
+
+def _needs_parens(child: Any, parent_op: str) -> bool:
+    if isinstance(child, BoolOp):
+        return child.op != parent_op
+    # A range renders as "a && b" and must be grouped inside a disjunction
+    return isinstance(child, Range) and parent_op == "||"
+
+
+def _render_child(child: Any, parent_op: str) -> str:
+    text = child.render()
+    return f"({text})" if _needs_parens(child, parent_op) else text
+
+
+def _shape_child(child: Any, parent_op: str) -> str:
+    text = child.shape()
+    return f"({text})" if _needs_parens(child, parent_op) else text
+
+
+@dataclass(frozen=True)
+class GeneratedQuery:
+    """A generated query together with its entity type and shape."""
+    entity_type: str
+    expr: BoolOp
+
+    @property
+    def query(self) -> str:
+        return self.expr.render()
+
+    @property
+    def shape(self) -> str:
+        # The leading type clause is always present, so only the rest is shown
+        rest = sorted({_shape_child(child, "&&") for child in self.expr.children[1:]})
+        return f"{self.entity_type}: " + " && ".join(rest)
+
+    def matches(self, attributes: Mapping[str, Any]) -> bool:
+        return self.expr.matches(attributes)
+
+
+# =============================================================================
+# Generator
+# =============================================================================
+
+@dataclass
+class GrammarWeights:
+    """Relative weights of the grammar productions."""
+    # Entity type the query targets
+    node: float = 0.5
+    workload: float = 0.5
+    # Term productions
+    str_eq: float = 4.0
+    str_neq: float = 1.0
+    num_cmp: float = 3.0
+    num_range: float = 1.5
+    id_eq: float = 0.5
+    # Expression productions (only used while depth allows nesting)
+    term: float = 4.0
+    conj: float = 1.5
+    disj: float = 1.0
+
+
+@dataclass
+class QueryGrammar:
+    """
+    Weighted random generator of Arkiv queries over the DC attribute schema.
+
+    Args:
+        weights: Production weights
+        max_depth: Maximum nesting depth of && / || groups below the top level
+        max_terms: Maximum number of terms in a single query (excluding the type clause)
+        id_pools: Optional sampled ids per entity type, used for id equality terms
+    """
+    weights: GrammarWeights = field(default_factory=GrammarWeights)
+    max_depth: int = 1
+    max_terms: int = 3
+    id_pools: Mapping[str, Sequence[str]] = field(default_factory=dict)
+
+    def generate(self, rng: random.Random | None = None) -> GeneratedQuery:
+        """Generate a single random query."""
+        rng = rng or random.Random()
+        w = self.weights
+        entity_type = rng.choices([NODE, WORKLOAD], weights=[w.node, w.workload])[0]
+
+        budget = [rng.randint(1, self.max_terms)]
+        children = [Term("type", "=", entity_type)]
+        children.extend(self._conj_children(rng, entity_type, 0, budget))
+        return GeneratedQuery(entity_type=entity_type, expr=BoolOp("&&", tuple(children)))
+
+    def _conj_children(self, rng: random.Random, entity_type: str, depth: int, budget: list[int]) -> list:
+        children = []
+        while budget[0] > 0:
+            children.append(self._expr(rng, entity_type, depth, budget))
+            if rng.random() < 0.5:
+                break
+        return children
+
+    def _expr(self, rng: random.Random, entity_type: str, depth: int, budget: list[int]) -> Any:
+        w = self.weights
+        if depth >= self.max_depth or budget[0] < 2:
+            return self._term(rng, entity_type, budget)
+
+        production = rng.choices(["term", "conj", "disj"], weights=[w.term, w.conj, w.disj])[0]
+        if production == "term":
+            return self._term(rng, entity_type, budget)
+
+        op = "&&" if production == "conj" else "||"
+        children = [
+            self._expr(rng, entity_type, depth + 1, budget),
+            self._expr(rng, entity_type, depth + 1, budget),
+        ]
+        while budget[0] > 0 and rng.random() < 0.3:
+            children.append(self._expr(rng, entity_type, depth + 1, budget))
+        return BoolOp(op, tuple(children))
+
+    def _term(self, rng: random.Random, entity_type: str, budget: list[int]) -> Any:
+        budget[0] -= 1
+        w = self.weights
+        ids = self.id_pools.get(entity_type) or []
+        production = rng.choices(
+            ["str_eq", "str_neq", "num_cmp", "num_range", "id_eq"],
+            weights=[w.str_eq, w.str_neq, w.num_cmp, w.num_range, w.id_eq if ids else 0.0],
+        )[0]
+
+        if production == "id_eq":
+            return Term(ID_ATTRS[entity_type], "=", rng.choice(ids))
+
+        if production in ("str_eq", "str_neq"):
+            attr, values = rng.choice(list(STRING_ATTRS[entity_type].items()))
+            return Term(attr, "=" if production == "str_eq" else "!=", rng.choice(values))
+
+        attr, values = rng.choice(list(NUMERIC_ATTRS[entity_type].items()))
+        if production == "num_range":
+            low, high = sorted(rng.sample(values, 2)) if len(values) > 1 else (values[0], values[0])
+            return Range(attr, low, high)
+        return Term(attr, rng.choice(NUMERIC_OPS), rng.choice(values))
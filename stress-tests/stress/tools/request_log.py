@@ -0,0 +1,204 @@
+"""
+Columnar per-request log for offline analysis.
+
+With REQUEST_LOG_DIR set, every locust request event of a worker (or local
+runner) is appended to a buffer and written in batches to zstd-compressed
+Parquet files in that directory. Files are rotated after
+REQUEST_LOG_ROTATE_ROWS rows or REQUEST_LOG_ROTATE_SECONDS seconds; a file
+being written has an `.inprogress` suffix until it is closed.
+
+Besides the locust request fields, the columns are filled from the request
+context (see `BaseUser.request_context`): task, rpc_method, result_size,
+payload_bytes, entity_count and block_number, and for requests of the lean
+JSON-RPC provider the transport fields request_bytes, request_wire_bytes,
+response_bytes and client_cpu_us (see stress.tools.rpc_transport).
+
+Requires pyarrow (`poetry install --with analysis`).
+"""
+
+import logging
+import os
+import socket
+import time
+from typing import Any, Optional
+
+from locust import events
+from locust.runners import MasterRunner
+
+from stress.tools.metric_buffer import ObservationBuffer
+
+REQUEST_LOG_DIR = os.getenv("REQUEST_LOG_DIR", "")
+REQUEST_LOG_ROTATE_ROWS = int(os.getenv("REQUEST_LOG_ROTATE_ROWS", "1000000"))
+REQUEST_LOG_ROTATE_SECONDS = int(os.getenv("REQUEST_LOG_ROTATE_SECONDS", "900"))
+REQUEST_LOG_FLUSH_INTERVAL = float(os.getenv("REQUEST_LOG_FLUSH_INTERVAL", "5"))
+REQUEST_LOG_COMPRESSION = os.getenv("REQUEST_LOG_COMPRESSION", "zstd")
+
+# Rows kept in memory between flushes; the oldest are dropped beyond that
+REQUEST_LOG_BUFFER_ROWS = 1_000_000
+
+# (column, arrow type name); rows are tuples in this order
+COLUMNS = [
+    ("start_ts", "float64"),
+    ("user_id", "int64"),
+    ("request_type", "string"),
+    ("name", "string"),
+    ("task", "string"),
+    ("rpc_method", "string"),
+    ("duration_ms", "float64"),
+    ("response_length", "int64"),
+    ("result_size", "int64"),
+    ("payload_bytes", "int64"),
+    ("entity_count", "int64"),
+    ("block_number", "int64"),
+    ("request_bytes", "int64"),
+    ("request_wire_bytes", "int64"),
+    ("response_bytes", "int64"),
+    ("client_cpu_us", "float64"),
+    ("error_class", "string"),
+]
+
+
+class RequestLog:
+    """Buffered, rotating Parquet writer of request rows."""
+
+    instance = None
+
+    def __init__(
+        self,
+        directory: str,
+        rotate_rows: int = REQUEST_LOG_ROTATE_ROWS,
+        rotate_seconds: int = REQUEST_LOG_ROTATE_SECONDS,
+        compression: str = REQUEST_LOG_COMPRESSION,
+    ):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._pq = pq
+        self.directory = directory
+        self.rotate_rows = rotate_rows
+        self.rotate_seconds = rotate_seconds
+        self.compression = compression
+        self.schema = pa.schema([(name, getattr(pa, type_name)()) for name, type_name in COLUMNS])
+        self._prefix = f"requests-{socket.gethostname()}-{os.getpid()}"
+        self._sequence = 0
+        self._writer = None
+        self._path: Optional[str] = None
+        self._file_rows = 0
+        self._file_opened_at = 0.0
+        self._buffer = ObservationBuffer(self._write_batch, REQUEST_LOG_BUFFER_ROWS, REQUEST_LOG_FLUSH_INTERVAL)
+        os.makedirs(directory, exist_ok=True)
+
+    def append(self, row: tuple) -> None:
+        self._buffer.append(row)
+
+    def _open(self) -> None:
+        self._sequence += 1
+        name = f"{self._prefix}-{time.strftime('%Y%m%dT%H%M%S')}-{self._sequence:04d}.parquet"
+        self._path = os.path.join(self.directory, name)
+        self._writer = self._pq.ParquetWriter(
+            f"{self._path}.inprogress", self.schema, compression=self.compression
+        )
+        self._file_rows = 0
+        self._file_opened_at = time.monotonic()
+
+    def _close_file(self) -> None:
+        if self._writer is None:
+            return
+        self._writer.close()
+        os.replace(f"{self._path}.inprogress", self._path)
+        logging.info("RequestLog: wrote %s rows to %s", self._file_rows, self._path)
+        self._writer = None
+
+    def _write_batch(self, rows: list[tuple]) -> None:
+        if self._writer is not None and (
+            self._file_rows >= self.rotate_rows
+            or time.monotonic() - self._file_opened_at >= self.rotate_seconds
+        ):
+            self._close_file()
+        if self._writer is None:
+            self._open()
+
+        columns = list(zip(*rows))
+        table = self._pa.Table.from_arrays(
+            [self._pa.array(column, type=field.type) for column, field in zip(columns, self.schema)],
+            schema=self.schema,
+        )
+        self._writer.write_table(table)
+        self._file_rows += len(rows)
+
+    def rotate(self) -> None:
+        """Write the buffered rows and close the current file; the next rows start a new file."""
+        self._buffer.flush()
+        self._close_file()
+
+    def close(self) -> None:
+        """Write the buffered rows and close the current file."""
+        self._buffer.stop()
+        self._close_file()
+        if self._buffer.dropped:
+            logging.warning("RequestLog: %s rows dropped (buffer full)", self._buffer.dropped)
+
+
+# =============================================================================
+# Locust hooks
+# =============================================================================
+
+def _int_or_none(value: Any) -> Optional[int]:
+    return int(value) if value is not None else None
+
+
+@events.init.add_listener
+def on_locust_init(environment, **kwargs):
+    if not REQUEST_LOG_DIR or isinstance(environment.runner, MasterRunner):
+        return
+    try:
+        RequestLog.instance = RequestLog(REQUEST_LOG_DIR)
+    except ImportError:
+        logging.error("REQUEST_LOG_DIR is set but pyarrow is not installed, request log disabled")
+        return
+    logging.info("Writing request log to %s", REQUEST_LOG_DIR)
+
+
+@events.request.add_listener
+def on_request(request_type, name, response_time, response_length, exception=None, context=None,
+               start_time=None, **kwargs):
+    request_log = RequestLog.instance
+    if request_log is None:
+        return
+    context = context or {}
+    request_log.append(
+        (
+            start_time if start_time is not None else time.time() - response_time / 1000,
+            _int_or_none(context.get("user_id")),
+            request_type,
+            name,
+            context.get("task"),
+            context.get("rpc_method"),
+            float(response_time),
+            _int_or_none(response_length),
+            _int_or_none(context.get("result_size")),
+            _int_or_none(context.get("payload_bytes")),
+            _int_or_none(context.get("entity_count")),
+            _int_or_none(context.get("block_number")),
+            _int_or_none(context.get("request_bytes")),
+            _int_or_none(context.get("request_wire_bytes")),
+            _int_or_none(context.get("response_bytes")),
+            context.get("client_cpu_us"),
+            type(exception).__name__ if exception is not None else None,
+        )
+    )
+
+
+@events.test_stop.add_listener
+def on_test_stop(environment, **kwargs):
+    # Each test run ends up in its own files
+    if RequestLog.instance is not None:
+        RequestLog.instance.rotate()
+
+
+@events.quitting.add_listener
+def on_quitting(environment, **kwargs):
+    if RequestLog.instance is not None:
+        RequestLog.instance.close()
+        RequestLog.instance = None
@@ -0,0 +1,213 @@
+"""
+Transport options of the lean JSON-RPC provider (see stress.tools.lean_rpc_provider).
+
+- RPC_COMPRESSION=gzip|zstd compresses request bodies of at least
+  RPC_COMPRESSION_MIN_BYTES (`Content-Encoding`) and asks for compressed
+  responses (`Accept-Encoding`). zstd requires the `zstandard` package.
+- RPC_HTTP2=true sends the requests of all users of a process multiplexed over
+  one HTTP/2 connection per endpoint (httpx with h2; prior knowledge for
+  http:// endpoints, ALPN for https://) instead of the per-user HTTP/1.1
+  connections of geventhttpclient. Certificates of https:// endpoints are
+  verified unless RPC_TLS_VERIFY=false.
+
+Both require `poetry install --with transport` and select the lean provider.
+
+Every request records its body sizes before and after compression and the
+client CPU time spent encoding, compressing, decompressing and decoding it,
+in the request context (`request_bytes`, `request_wire_bytes`,
+`response_bytes`, `client_cpu_us`; `response_length` is the wire size) and in
+the loadtest_rpc_* metrics. Each worker logs a summary at test stop, to tell
+whether compression at the RPC gateway pays off.
+"""
+
+import gzip
+import logging
+import os
+import threading
+import zlib
+from typing import Optional
+
+from geventhttpclient.url import URL
+from locust import events
+
+RPC_COMPRESSION = os.getenv("RPC_COMPRESSION", "none").lower()  # none, gzip or zstd
+RPC_COMPRESSION_LEVEL = int(os.getenv("RPC_COMPRESSION_LEVEL", "3"))
+RPC_COMPRESSION_MIN_BYTES = int(os.getenv("RPC_COMPRESSION_MIN_BYTES", "1024"))
+RPC_HTTP2 = os.getenv("RPC_HTTP2", "false").lower() in ("1", "true", "yes")
+RPC_TLS_VERIFY = os.getenv("RPC_TLS_VERIFY", "true").lower() in ("1", "true", "yes")
+
+
+class GzipCodec:
+    name = "gzip"
+
+    def __init__(self, level: int = RPC_COMPRESSION_LEVEL):
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return gzip.compress(data, compresslevel=self.level, mtime=0)
+
+    @staticmethod
+    def decompress(data: bytes) -> bytes:
+        return gzip.decompress(data)
+
+
+class ZstdCodec:
+    name = "zstd"
+
+    def __init__(self, level: int = RPC_COMPRESSION_LEVEL):
+        import zstandard
+
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        # Streaming frames from servers do not necessarily carry the content size
+        return self._decompressor.decompressobj().decompress(data)
+
+
+CODECS = {"gzip": GzipCodec, "zstd": ZstdCodec}
+
+
+def get_codec(name: str = RPC_COMPRESSION):
+    """Codec for `name`, None for "none" or when the codec's package is not installed."""
+    if name in ("", "none", "identity"):
+        return None
+    if name not in CODECS:
+        raise ValueError(f"Unknown RPC_COMPRESSION {name!r}, expected one of none, {', '.join(CODECS)}")
+    try:
+        return CODECS[name]()
+    except ImportError:
+        logging.error("RPC_COMPRESSION=%s requires the zstandard package, requests are not compressed", name)
+        return None
+
+
+def decompress(codec, content_encoding: Optional[str], data: bytes) -> bytes:
+    """Decode a response body by its `Content-Encoding`."""
+    if not content_encoding or content_encoding == "identity":
+        return data
+    if codec is not None and content_encoding == codec.name:
+        return codec.decompress(data)
+    if content_encoding == "gzip":
+        return gzip.decompress(data)
+    if content_encoding == "deflate":
+        return zlib.decompress(data)
+    raise ValueError(f"Unsupported response Content-Encoding {content_encoding!r}")
+
+
+# =============================================================================
+# Transports
+# =============================================================================
+
+class Http1Transport:
+    """POSTs on a geventhttpclient connection from the pool of a locust FastHttpSession."""
+
+    protocol = "HTTP/1.1"
+
+    def __init__(self, session):
+        url = URL(session.base_url)
+        self._client = session.client.clientpool.get_client(url)
+        self._request_uri = url.quoted_uri
+
+    def post(self, body: bytes, headers: dict) -> tuple[int, Optional[str], bytes]:
+        """Send a request, return status code, response Content-Encoding and the raw response body."""
+        response = self._client.request("POST", self._request_uri, body=body, headers=headers)
+        content = response.read()
+        # Back to the pool; a response failing to read discards its connection when collected
+        response.release()
+        return response.status_code, response.get("content-encoding"), content
+
+
+class Http2Transport:
+    """POSTs multiplexed over an HTTP/2 connection shared by all users of the process (httpx)."""
+
+    protocol = "HTTP/2"
+
+    _clients: dict = {}
+    _lock = threading.Lock()
+
+    def __init__(self, endpoint_uri: str, timeout: float):
+        self.endpoint_uri = endpoint_uri
+        with self._lock:
+            client = self._clients.get(endpoint_uri)
+            if client is None:
+                import httpx
+
+                # Without TLS there is no ALPN negotiation: speak HTTP/2 with prior knowledge (h2c)
+                client = httpx.Client(http1=endpoint_uri.startswith("https://"), http2=True, timeout=timeout,
+                                      verify=RPC_TLS_VERIFY)
+                self._clients[endpoint_uri] = client
+        self._client = client
+
+    def post(self, body: bytes, headers: dict) -> tuple[int, Optional[str], bytes]:
+        """Send a request, return status code, response Content-Encoding and the raw response body."""
+        with self._client.stream("POST", self.endpoint_uri, content=body, headers=headers) as response:
+            content = b"".join(response.iter_raw())
+        return response.status_code, response.headers.get("content-encoding"), content
+
+    @classmethod
+    def close_all(cls):
+        with cls._lock:
+            for client in cls._clients.values():
+                client.close()
+            cls._clients = {}
+
+
+# =============================================================================
+# Per-process summary
+# =============================================================================
+
+class TransportStats:
+    """Totals of this process's lean provider requests, logged at test stop."""
+
+    # [requests, request bytes, request wire bytes, response bytes, response wire bytes, cpu seconds]
+    totals = [0, 0, 0, 0, 0, 0.0]
+
+    @classmethod
+    def record(cls, request_bytes: int, request_wire_bytes: int, response_bytes: int, response_wire_bytes: int,
+               cpu_seconds: float):
+        totals = cls.totals
+        totals[0] += 1
+        totals[1] += request_bytes
+        totals[2] += request_wire_bytes
+        totals[3] += response_bytes
+        totals[4] += response_wire_bytes
+        totals[5] += cpu_seconds
+
+    @classmethod
+    def reset(cls):
+        cls.totals = [0, 0, 0, 0, 0, 0.0]
+
+    @classmethod
+    def summary(cls) -> str:
+        requests, request_bytes, request_wire, response_bytes, response_wire, cpu = cls.totals
+        return (
+            f"RPC transport ({RPC_COMPRESSION}, {'HTTP/2' if RPC_HTTP2 else 'HTTP/1.1'}): {requests} requests, "
+            f"requests {request_bytes / 2**20:.1f} MiB -> {request_wire / 2**20:.1f} MiB on the wire "
+            f"({_ratio(request_wire, request_bytes)}), "
+            f"responses {response_bytes / 2**20:.1f} MiB -> {response_wire / 2**20:.1f} MiB on the wire "
+            f"({_ratio(response_wire, response_bytes)}), "
+            f"client CPU {cpu / requests * 1e6:.0f} us per request"
+        )
+
+
+def _ratio(wire: int, body: int) -> str:
+    return f"{wire / body:.0%} of the body" if body else "-"
+
+
+@events.test_start.add_listener
+def on_test_start(environment, **kwargs):
+    TransportStats.reset()
+
+
+@events.test_stop.add_listener
+def on_test_stop(environment, **kwargs):
+    if TransportStats.totals[0]:
+        logging.info(TransportStats.summary())
+
+
+@events.quitting.add_listener
+def on_quitting(environment, **kwargs):
+    Http2Transport.close_all()
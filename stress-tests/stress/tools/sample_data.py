@@ -0,0 +1,314 @@
+"""
+Sample data (node ids, workload ids, entity keys) shared by the DC read tests.
+
+The sample is loaded from Arkiv once per test run by the master (or by the
+local runner) and broadcast to all workers with a locust custom message, so
+workers no longer scan Arkiv themselves when their first user starts. Users
+block in `GlobalSampleData.ensure_loaded` until the sample has arrived and
+only fall back to loading it locally if it does not arrive in time.
+
+With DC_SAMPLE_REFRESH_INTERVAL > 0 the master reloads the sample periodically
+and broadcasts the new version, so long runs keep sampling live entities.
+
+With DC_SAMPLE_KEYS_FILE, the sample is drawn from the keys file written by
+stress.tools.seed_entities instead of querying Arkiv.
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+from itertools import islice
+from typing import Any, List
+
+import web3
+from arkiv import Arkiv
+from arkiv.types import ATTRIBUTES, KEY
+from arkiv.utils import to_query_options
+from locust import events
+from locust.runners import LocalRunner, MasterRunner, WorkerRunner
+
+SAMPLE_DATA_MESSAGE = "dc_sample_data"
+SAMPLE_DATA_REQUEST_MESSAGE = "dc_sample_data_request"
+
+# Sample sizes for pre-loading IDs
+SAMPLE_SIZE_IDS = 1000
+SAMPLE_SIZE_KEYS = 1000
+
+MAX_RESULTS_PER_PAGE: int = 1_000_000_000
+
+# Seconds between sample reloads on the master (0 disables refreshing)
+SAMPLE_REFRESH_INTERVAL = int(os.getenv("DC_SAMPLE_REFRESH_INTERVAL", "0"))
+
+# Seconds a user waits for the broadcast sample before loading it itself
+SAMPLE_WAIT_TIMEOUT = int(os.getenv("DC_SAMPLE_WAIT_TIMEOUT", "120"))
+
+# Keys file of a seeded population (see stress.tools.seed_entities), sampled instead of Arkiv
+SAMPLE_KEYS_FILE = os.getenv("DC_SAMPLE_KEYS_FILE", "")
+
+
+class GlobalSampleData:
+    """Sample data shared by all users of a process, loaded once per test run."""
+
+    node_ids: List[str] = []
+    workload_ids: List[str] = []
+    entity_keys: List[str] = []  # Stored as hex strings for API
+    initialized: bool = False
+    version: int = 0
+
+    _ready = threading.Event()
+    _load_lock = threading.Lock()
+
+    @classmethod
+    def set(cls, node_ids: List[str], workload_ids: List[str], entity_keys: List[str]) -> None:
+        """Replace the sample and wake up users waiting for it."""
+        # Lists are replaced, not mutated, so tasks holding the old lists are unaffected
+        cls.node_ids = list(node_ids)
+        cls.workload_ids = list(workload_ids)
+        cls.entity_keys = list(entity_keys)
+        cls.initialized = True
+        cls.version += 1
+        cls._ready.set()
+
+    @classmethod
+    def reset(cls) -> None:
+        """Forget the current sample (e.g. before a new test run)."""
+        cls.node_ids = []
+        cls.workload_ids = []
+        cls.entity_keys = []
+        cls.initialized = False
+        cls._ready.clear()
+
+    @classmethod
+    def to_message(cls) -> dict[str, Any]:
+        return {
+            "version": cls.version,
+            "node_ids": cls.node_ids,
+            "workload_ids": cls.workload_ids,
+            "entity_keys": cls.entity_keys,
+        }
+
+    @classmethod
+    def from_message(cls, data: dict[str, Any]) -> None:
+        cls.set(data["node_ids"], data["workload_ids"], data["entity_keys"])
+        logging.info(
+            "GlobalSampleData: received sample v%s with %s node IDs, %s workload IDs, %s entity keys",
+            data.get("version"), len(cls.node_ids), len(cls.workload_ids), len(cls.entity_keys)
+        )
+
+    @classmethod
+    def ensure_loaded(cls, w3: Arkiv, timeout: float = SAMPLE_WAIT_TIMEOUT) -> None:
+        """
+        Wait for the broadcast sample, loading it from Arkiv if it does not arrive in time.
+
+        Args:
+            w3: Arkiv client used for the fallback load
+            timeout: Seconds to wait for the sample
+        """
+        if cls._ready.wait(timeout):
+            return
+        logging.warning("GlobalSampleData: no sample received within %ss, loading it locally", timeout)
+        cls.load_from_arkiv(w3)
+
+    @classmethod
+    def load_from_arkiv(cls, w3: Arkiv, force: bool = False) -> None:
+        """Load sample data by querying Arkiv (no local DB dependency)."""
+        with cls._load_lock:
+            if cls.initialized and not force:
+                return
+
+            node_ids: List[str] = []
+            workload_ids: List[str] = []
+            entity_keys: List[str] = []
+
+            # Query nodes and workloads and extract their ids from attributes
+            try:
+                node_iter = w3.arkiv.query_entities(
+                    query='type="node"',
+                    options=to_query_options(
+                        fields=KEY | ATTRIBUTES, max_results_per_page=MAX_RESULTS_PER_PAGE
+                    ),
+                )
+                for entity in islice(node_iter, SAMPLE_SIZE_IDS):
+                    key = getattr(entity, "key", None)
+                    if key:
+                        entity_keys.append(str(key))
+                    attrs = getattr(entity, "attributes", {}) or {}
+                    node_id = attrs.get("node_id")
+                    if node_id:
+                        node_ids.append(str(node_id))
+            except Exception as e:
+                logging.error("GlobalSampleData: error loading node samples from Arkiv: %s", e)
+
+            try:
+                workload_iter = w3.arkiv.query_entities(
+                    query='type="workload"',
+                    options=to_query_options(
+                        fields=KEY | ATTRIBUTES, max_results_per_page=MAX_RESULTS_PER_PAGE
+                    ),
+                )
+                for entity in islice(workload_iter, SAMPLE_SIZE_IDS):
+                    key = getattr(entity, "key", None)
+                    if key:
+                        entity_keys.append(str(key))
+                    attrs = getattr(entity, "attributes", {}) or {}
+                    workload_id = attrs.get("workload_id")
+                    if workload_id:
+                        workload_ids.append(str(workload_id))
+            except Exception as e:
+                logging.error("GlobalSampleData: error loading workload samples from Arkiv: %s", e)
+
+            # Keep only a small set of keys for point lookups (but ensure at least 1 if available)
+            if entity_keys:
+                random.shuffle(entity_keys)
+                entity_keys = entity_keys[: max(1, min(SAMPLE_SIZE_KEYS, len(entity_keys)))]
+
+            cls.set(node_ids, workload_ids, entity_keys)
+            logging.info(
+                "GlobalSampleData: loaded %s node IDs, %s workload IDs, %s entity keys from Arkiv",
+                len(node_ids), len(workload_ids), len(entity_keys)
+            )
+
+    @classmethod
+    def load_from_file(cls, path: str) -> None:
+        """Load a uniform sample of the entities recorded in a seed_entities keys file."""
+        rng = random.Random()
+        samples: dict[str, List[str]] = {"node": [], "workload": [], "key": []}
+        sizes = {"node": SAMPLE_SIZE_IDS, "workload": SAMPLE_SIZE_IDS, "key": SAMPLE_SIZE_KEYS}
+        seen = {"node": 0, "workload": 0, "key": 0}
+
+        def offer(kind: str, value: str) -> None:
+            # Reservoir sampling: the file may hold millions of entities
+            seen[kind] += 1
+            if len(samples[kind]) < sizes[kind]:
+                samples[kind].append(value)
+            else:
+                slot = rng.randrange(seen[kind])
+                if slot < sizes[kind]:
+                    samples[kind][slot] = value
+
+        with cls._load_lock:
+            with open(path) as f:
+                for line in f:
+                    record = json.loads(line)
+                    offer("key", record["key"])
+                    if record["type"] in ("node", "workload"):
+                        offer(record["type"], record["id"])
+            cls.set(samples["node"], samples["workload"], samples["key"])
+        logging.info(
+            "GlobalSampleData: sampled %s node IDs, %s workload IDs, %s entity keys from %s entities in %s",
+            len(cls.node_ids), len(cls.workload_ids), len(cls.entity_keys), seen["key"], path
+        )
+
+
+class SampleDataBroadcaster:
+    """Loads the sample on the master (or local runner) and sends it to the workers."""
+
+    instance = None
+
+    def __init__(self, environment, refresh_interval: int = SAMPLE_REFRESH_INTERVAL):
+        """
+        Initialize the broadcaster.
+
+        Args:
+            environment: Locust environment object
+            refresh_interval: Seconds between reloads (0 disables refreshing)
+        """
+        self.refresh_interval = refresh_interval
+        self._environment = environment
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _w3(self) -> Arkiv:
+        return Arkiv(web3.HTTPProvider(endpoint_uri=self._environment.host))
+
+    def load_and_broadcast(self, force: bool = False) -> None:
+        """Load the sample (from Arkiv or DC_SAMPLE_KEYS_FILE) and send it to all connected workers."""
+        if SAMPLE_KEYS_FILE:
+            GlobalSampleData.load_from_file(SAMPLE_KEYS_FILE)
+        else:
+            GlobalSampleData.load_from_arkiv(self._w3(), force=force)
+        self.broadcast()
+
+    def broadcast(self, client_id: str | None = None) -> None:
+        """Send the current sample to one worker, or to all of them."""
+        runner = self._environment.runner
+        if not isinstance(runner, MasterRunner) or not GlobalSampleData.initialized:
+            return
+        runner.send_message(SAMPLE_DATA_MESSAGE, GlobalSampleData.to_message(), client_id=client_id)
+
+    def _refresh_loop(self):
+        while not self._stop_event.wait(self.refresh_interval):
+            try:
+                self.load_and_broadcast(force=True)
+            except Exception as e:
+                logging.error("SampleDataBroadcaster: error refreshing sample: %s", e, exc_info=True)
+
+    def start(self):
+        """Start the periodic refresh thread (no-op if refreshing is disabled)."""
+        if self.refresh_interval <= 0:
+            return
+        if self._thread is not None and self._thread.is_alive():
+            logging.warning("SampleDataBroadcaster: Already running")
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, daemon=True)
+        self._thread.start()
+        logging.info("SampleDataBroadcaster: refreshing sample every %ss", self.refresh_interval)
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the periodic refresh thread."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+
+        self._stop_event.set()
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+
+# =============================================================================
+# Locust hooks
+# =============================================================================
+
+@events.init.add_listener
+def on_locust_init(environment, **kwargs):
+    runner = environment.runner
+    if isinstance(runner, (MasterRunner, LocalRunner)):
+        SampleDataBroadcaster.instance = SampleDataBroadcaster(environment)
+
+    if isinstance(runner, MasterRunner):
+        # Workers that missed the broadcast (e.g. joined late) ask for the sample
+        def on_sample_request(environment, msg, **kwargs):
+            SampleDataBroadcaster.instance.broadcast(client_id=msg.node_id)
+
+        runner.register_message(SAMPLE_DATA_REQUEST_MESSAGE, on_sample_request)
+
+    if isinstance(runner, WorkerRunner):
+        def on_sample_data(environment, msg, **kwargs):
+            GlobalSampleData.from_message(msg.data)
+
+        runner.register_message(SAMPLE_DATA_MESSAGE, on_sample_data)
+
+
+@events.test_start.add_listener
+def on_test_start(environment, **kwargs):
+    runner = environment.runner
+    if isinstance(runner, WorkerRunner):
+        if not GlobalSampleData.initialized:
+            runner.send_message(SAMPLE_DATA_REQUEST_MESSAGE, None)
+        return
+
+    broadcaster = SampleDataBroadcaster.instance
+    if broadcaster is None:
+        return
+    # Runs before users are spawned, so users find the sample ready
+    broadcaster.load_and_broadcast(force=True)
+    broadcaster.start()
+
+
+@events.test_stop.add_listener
+def on_test_stop(environment, **kwargs):
+    if SampleDataBroadcaster.instance is not None:
+        SampleDataBroadcaster.instance.stop()
@@ -0,0 +1,258 @@
+"""
+Seeds an entity population for the query benchmarks, as fast as the chain accepts it.
+
+Nodes and workloads come from `dc_data.generate_blocks` (the same attributes
+as the dc_* write tests) and are packed into create transactions of up to
+--max-tx-bytes of operations. The transactions are spread round-robin over
+--accounts seeding accounts (m/44'/60'/{--instance}'/0/{i}, apart from the
+load generator instances), signed with local nonces and submitted and
+confirmed in a window by `TxPipeline`, a round of 4 windows at a time.
+
+The key, type and id of every created entity are appended to --keys (JSON
+lines), which the read tests sample instead of querying Arkiv with
+DC_SAMPLE_KEYS_FILE (see stress.tools.sample_data).
+
+Usage (from stress-tests/):
+    python -m stress.tools.seed_entities --entities 1000000 [--accounts 16] [--fund] [--keys seeded-keys.jsonl]
+
+The seeding accounts must hold funds: --fund transfers them some from the dev
+account of a local dev chain; on the testnet, top them up with
+`python -m stress.tools.testnet_topup --instances <instance> --users <accounts>`.
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+from itertools import islice
+from pathlib import Path
+from typing import Iterator, Optional
+
+file_dir = Path(__file__).resolve().parent
+project_root = file_dir.parent.parent  # Go up from tools/ to stress/ to stress-tests/
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+import requests
+from arkiv.contract import CREATED_EVENT, EVENTS_ABI
+from arkiv.types import CreateOp, Operations
+from arkiv.utils import to_create_op, to_tx_params
+from eth_account.signers.local import LocalAccount
+from eth_utils import event_abi_to_log_topic
+from web3 import Web3
+
+import stress.tools.config as config
+from stress.tools.account_registry import AccountRegistry
+from stress.tools.dc_data import generate_blocks, node_to_arkiv_attributes, workload_to_arkiv_attributes
+from stress.tools.local_prefund import prefund_accounts
+from stress.tools.tx_pipeline import CONFIRMED, PendingTx, RpcError, TxPipeline, rpc_batch
+from stress.tools.utils import account_path
+
+# Instance index of the seeding accounts' paths (load generators use 0..N)
+SEED_INSTANCE = 1000
+# Transaction pools reject transactions over 128 KB: stay below it
+MAX_TX_BYTES = 120_000
+MAX_OPS_PER_TX = 1000
+# Rough RLP overhead of one create operation on top of its payload and attributes
+OP_OVERHEAD_BYTES = 64
+# eth_estimateGas calls per JSON-RPC batch (each carries a full transaction)
+ESTIMATE_BATCH_SIZE = 16
+GAS_MARGIN = 1.2
+CREATOR_ADDRESS = "0x0000000000000000000000000000000000dc0001"
+
+CREATED_TOPIC = "0x" + event_abi_to_log_topic(
+    next(abi for abi in EVENTS_ABI if abi["name"] == CREATED_EVENT)
+).hex()
+
+
+def entity_ops(args: argparse.Namespace, payload_content: Optional[bytes]) -> Iterator[tuple[CreateOp, dict]]:
+    """Create operations of the generated nodes and workloads, with the record of each for the keys file."""
+    blocks = generate_blocks(
+        num_blocks=sys.maxsize,
+        nodes_per_block=args.nodes_per_block,
+        workloads_per_node=args.workloads_per_node,
+        percentage_assigned=args.percentage_assigned,
+        payload_size=args.payload_size,
+        start_block=1,
+        seed=args.seed,
+        payload_content=payload_content,
+    )
+    for block in blocks:
+        entities = [(node, node_to_arkiv_attributes(node, CREATOR_ADDRESS), node.node_id) for node in block.nodes]
+        entities += [
+            (workload, workload_to_arkiv_attributes(workload, CREATOR_ADDRESS), workload.workload_id)
+            for workload in block.workloads
+        ]
+        for entity, attributes, entity_id in entities:
+            op = to_create_op(
+                payload=entity.payload,
+                content_type="application/octet-stream",
+                attributes=attributes,
+                expires_in=args.expires_in,
+            )
+            yield op, {"type": attributes["type"], "id": entity_id}
+
+
+def op_size(op: CreateOp) -> int:
+    """Estimated encoded size of a create operation (brotli only shrinks it)."""
+    attributes = op.attributes or {}
+    return len(op.payload or b"") + sum(len(key) + len(str(value)) for key, value in attributes.items()) + OP_OVERHEAD_BYTES
+
+
+def pack_ops(ops: Iterator[tuple[CreateOp, dict]], max_tx_bytes: int, max_ops: int) -> Iterator[list[tuple[CreateOp, dict]]]:
+    """Group operations into the largest transactions within max_tx_bytes and max_ops."""
+    batch, size = [], 0
+    for op, record in ops:
+        op_bytes = op_size(op)
+        if batch and (size + op_bytes > max_tx_bytes or len(batch) >= max_ops):
+            yield batch
+            batch, size = [], 0
+        batch.append((op, record))
+        size += op_bytes
+    if batch:
+        yield batch
+
+
+class Seeder:
+    """Submits create transactions from several accounts with locally tracked nonces."""
+
+    def __init__(self, url: str, accounts: list[LocalAccount], window: int, session: Optional[requests.Session] = None):
+        self.url = url
+        self.accounts = accounts
+        self.window = window
+        self.session = session or requests.Session()
+        self.pipeline = TxPipeline(url, window=window, poll_interval=0.2, session=self.session)
+        (chain_id, _), (gas_price, _) = rpc_batch(self.session, url, [("eth_chainId", []), ("eth_gasPrice", [])])
+        self.chain_id = int(chain_id, 16)
+        self.gas_price = 2 * int(gas_price, 16)
+        nonces = rpc_batch(self.session, url, [("eth_getTransactionCount", [a.address, "pending"]) for a in accounts])
+        self.nonces = {account.address: int(nonce, 16) for account, (nonce, _) in zip(accounts, nonces)}
+        self._next_account = 0
+
+    def _estimate_gas(self, unsigned: list[dict]) -> list[int]:
+        gas = []
+        for start in range(0, len(unsigned), ESTIMATE_BATCH_SIZE):
+            chunk = unsigned[start:start + ESTIMATE_BATCH_SIZE]
+            calls = [
+                ("eth_estimateGas", [{"from": tx["from"], "to": tx["to"], "data": "0x" + tx["data"].hex()}])
+                for tx in chunk
+            ]
+            for tx, (result, error) in zip(chunk, rpc_batch(self.session, self.url, calls)):
+                if error is not None:
+                    raise RpcError(f"eth_estimateGas from {tx['from']} failed: {error.get('message', error)}")
+                gas.append(int(int(result, 16) * GAS_MARGIN))
+        return gas
+
+    def sign(self, batches: list[list[tuple[CreateOp, dict]]]) -> list[tuple[PendingTx, list[dict]]]:
+        """Sign one transaction per batch of operations, rotating over the accounts."""
+        unsigned, senders = [], []
+        for batch in batches:
+            account = self.accounts[self._next_account]
+            self._next_account = (self._next_account + 1) % len(self.accounts)
+            params = to_tx_params(Operations(creates=[op for op, _ in batch]))
+            unsigned.append({"from": account.address, "to": params["to"], "data": params["data"]})
+            senders.append(account)
+
+        signed = []
+        for tx, account, gas, batch in zip(unsigned, senders, self._estimate_gas(unsigned), batches):
+            nonce = self.nonces[account.address]
+            self.nonces[account.address] = nonce + 1
+            raw = account.sign_transaction(
+                {
+                    "to": tx["to"],
+                    "value": 0,
+                    "data": tx["data"],
+                    "nonce": nonce,
+                    "gas": gas,
+                    "gasPrice": self.gas_price,
+                    "chainId": self.chain_id,
+                }
+            )
+            pending = PendingTx(account.address, nonce, "0x" + raw.raw_transaction.hex(), "0x" + raw.hash.hex())
+            signed.append((pending, [record for _, record in batch]))
+        return signed
+
+    def run(self, batches: list[list[tuple[CreateOp, dict]]]) -> list[dict]:
+        """Seed the batches; returns the records of the created entities, with their keys."""
+        signed = self.sign(batches)
+        self.pipeline.run([pending for pending, _ in signed])
+        created = []
+        for pending, records in signed:
+            if pending.status != CONFIRMED:
+                logging.warning("Transaction %s (%s ops) failed on chain", pending.tx_hash, len(records))
+                continue
+            keys = [log["topics"][1] for log in pending.logs or [] if log["topics"][0] == CREATED_TOPIC]
+            for key, record in zip(keys, records):
+                created.append({"key": key, **record, "block": pending.block_number})
+        return created
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Seed Arkiv with data center nodes and workloads.")
+    parser.add_argument("--entities", type=int, required=True, help="Entities to create")
+    parser.add_argument("--accounts", type=int, default=16, help="Seeding accounts (default: %(default)s)")
+    parser.add_argument("--instance", type=int, default=SEED_INSTANCE,
+                        help="Account path instance index of the seeding accounts (default: %(default)s)")
+    parser.add_argument("--fund", action="store_true",
+                        help="Fund the seeding accounts from the dev account (local dev chains)")
+    parser.add_argument("--host", default=config.host, help="JSON-RPC endpoint (default: %(default)s)")
+    parser.add_argument("--window", type=int, default=256, help="Unconfirmed transactions (default: %(default)s)")
+    parser.add_argument("--max-tx-bytes", type=int, default=MAX_TX_BYTES,
+                        help="Operation bytes per transaction (default: %(default)s)")
+    parser.add_argument("--max-ops", type=int, default=MAX_OPS_PER_TX,
+                        help="Operations per transaction (default: %(default)s)")
+    parser.add_argument("--nodes-per-block", type=int, default=10, help="Generated nodes per block (default: %(default)s)")
+    parser.add_argument("--workloads-per-node", type=int, default=5, help="Workloads per node (default: %(default)s)")
+    parser.add_argument("--percentage-assigned", type=float, default=0.5,
+                        help="Fraction of busy nodes (default: %(default)s)")
+    parser.add_argument("--payload-size", type=int, default=1000, help="Random payload bytes (default: %(default)s)")
+    parser.add_argument("--payload-file", help="Use this file's content as the payload of every entity")
+    parser.add_argument("--expires-in", type=int, default=2592000, help="Entity lifetime in seconds (default: 30 days)")
+    parser.add_argument("--seed", type=int, default=None, help="Generator seed (default: the current time)")
+    parser.add_argument("--keys", default="seeded-keys.jsonl", help="Keys file to append to (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    if args.seed is None:
+        args.seed = int(time.time())
+    payload_content = None
+    if args.payload_file:
+        with open(args.payload_file, "rb") as f:
+            payload_content = f.read()
+
+    registry = AccountRegistry.get()
+    accounts = [registry.account_at(account_path(args.instance, index)) for index in range(args.accounts)]
+    registry.save()
+    session = requests.Session()
+    try:
+        if args.fund:
+            funded = prefund_accounts(
+                args.host, [account.address for account in accounts], Web3.to_wei(100, "ether"),
+                Web3.to_wei(10, "ether"), session=session,
+            )
+            logging.info("Funded %s seeding accounts", funded)
+
+        seeder = Seeder(args.host, accounts, args.window, session)
+        batches = pack_ops(islice(entity_ops(args, payload_content), args.entities), args.max_tx_bytes, args.max_ops)
+        logging.info("Seeding %s entities from %s accounts (generator seed %s)", args.entities, len(accounts), args.seed)
+        seeded = 0
+        start = time.monotonic()
+        with open(args.keys, "a") as keys_file:
+            while round_batches := list(islice(batches, 4 * args.window)):
+                created = seeder.run(round_batches)
+                for record in created:
+                    keys_file.write(json.dumps(record) + "\n")
+                keys_file.flush()
+                seeded += len(created)
+                elapsed = time.monotonic() - start
+                logging.info("%s / %s entities seeded (%.0f/s)", seeded, args.entities, seeded / max(elapsed, 1e-9))
+    except (RpcError, TimeoutError, requests.RequestException) as e:
+        logging.error("Seeding stopped: %s", e)
+        return 1
+    logging.info("Seeded %s entities in %.1fs, keys in %s", seeded, time.monotonic() - start, args.keys)
+    return 0 if seeded == args.entities else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+"""
+Client-side shadow index used as an oracle for query results.
+
+Writers record every entity they create (taken from the transaction
+receipts), and the index keeps a small per-entity version history keyed by
+block number. Only creates are shadowed: dc_read_and_write, the only test
+running the oracle, neither updates nor deletes entities. Readers can then
+check a sampled query against the index: the query is scoped to a single
+owner (`$owner = ...`) and evaluated at the block the node answered from, so
+the expected result set is exact except for entities right at their
+expiration boundary, which are ignored.
+
+One index is shared by all users of a worker process (`ShadowIndex.get()`).
+"""
+
+import logging
+import random
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Mapping, Optional
+
+# Keep only the most recent versions of an entity; checks run close to the head
+MAX_VERSIONS_PER_ENTITY = 4
+
+# Entities whose expiration block is this close to the query block are ignored
+EXPIRATION_GRACE_BLOCKS = 1
+
+# Expired entities are dropped at most once per this many blocks (purging scans the index)
+PURGE_INTERVAL_BLOCKS = 16
+
+
+def normalize_key(key: Any) -> str:
+    """Normalize an entity key (hex string or bytes) for comparisons."""
+    if isinstance(key, (bytes, bytearray)):
+        return "0x" + bytes(key).hex()
+    return str(key).lower()
+
+
+@dataclass
+class EntityVersion:
+    """State of an entity from `block` onwards."""
+    block: int
+    attributes: Mapping[str, Any] | None  # None means deleted
+    expiration_block: int
+
+
+@dataclass
+class OwnerState:
+    """Entities written by one owner (account) in this process."""
+    keys: set[str] = field(default_factory=set)
+    in_flight: int = 0
+    generation: int = 0
+    tainted: bool = False
+
+
+@dataclass
+class OracleResult:
+    """Outcome of a single oracle check."""
+    expected: int
+    returned: int
+    missing: set[str]
+    unexpected: set[str]
+
+    @property
+    def ok(self) -> bool:
+        return not self.missing and not self.unexpected
+
+    @property
+    def ratio(self) -> float:
+        """Ratio of expected to returned result size."""
+        if self.returned == 0:
+            return 1.0 if self.expected == 0 else float("inf")
+        return self.expected / self.returned
+
+
+class ShadowIndex:
+    """In-memory mirror of entities written by this worker, indexed by attribute values."""
+
+    instance = None
+
+    @classmethod
+    def get(cls) -> "ShadowIndex":
+        """Get the worker-wide shadow index instance."""
+        if cls.instance is None:
+            cls.instance = cls()
+        return cls.instance
+
+    def __init__(self, max_entities_per_owner: int = 50_000):
+        self.max_entities_per_owner = max_entities_per_owner
+        self.start_block: Optional[int] = None
+        self._versions: dict[str, list[EntityVersion]] = {}
+        self._owner_of: dict[str, str] = {}
+        self._owners: dict[str, OwnerState] = {}
+        # (attribute, value) -> keys that carried that value in any tracked version
+        self._postings: dict[tuple[str, Any], set[str]] = {}
+        self._purged_at = 0
+        self._lock = threading.Lock()
+
+    # -------------------------------------------------------------------------
+    # Writer side
+    # -------------------------------------------------------------------------
+
+    def begin_write(self, owner: str) -> None:
+        """Mark a write by `owner` as in flight (its effect is not known yet)."""
+        with self._lock:
+            self._owner(owner).in_flight += 1
+
+    def end_write(self, owner: str, failed: bool = False) -> None:
+        """
+        Mark a write by `owner` as finished.
+
+        A failed write may still have been included on chain, so the owner is
+        excluded from further checks.
+        """
+        with self._lock:
+            state = self._owner(owner)
+            state.in_flight = max(0, state.in_flight - 1)
+            state.generation += 1
+            if failed:
+                state.tainted = True
+
+    def record_create(
+        self, owner: str, key: Any, attributes: Mapping[str, Any], block: int, expiration_block: int
+    ) -> None:
+        """Record an entity created at `block` by `owner`."""
+        self._record(owner, normalize_key(key), dict(attributes), block, expiration_block)
+
+    def _record(
+        self, owner: str, key: str, attributes: Mapping[str, Any] | None, block: int, expiration_block: int
+    ) -> None:
+        with self._lock:
+            if self.start_block is None or block < self.start_block:
+                self.start_block = block
+            state = self._owner(owner)
+            if state.tainted:
+                return
+            if key not in state.keys and len(state.keys) >= self.max_entities_per_owner:
+                logging.warning(
+                    "ShadowIndex: owner %s exceeded %s entities, no longer checked", owner, self.max_entities_per_owner
+                )
+                state.tainted = True
+                return
+
+            state.keys.add(key)
+            state.generation += 1
+            self._owner_of[key] = owner
+            versions = self._versions.setdefault(key, [])
+            versions.append(EntityVersion(block, attributes, expiration_block))
+            versions.sort(key=lambda v: v.block)
+            del versions[:-MAX_VERSIONS_PER_ENTITY]
+            for attr_value in (attributes or {}).items():
+                self._postings.setdefault(attr_value, set()).add(key)
+
+    def _owner(self, owner: str) -> OwnerState:
+        owner = owner.lower()
+        state = self._owners.get(owner)
+        if state is None:
+            state = self._owners[owner] = OwnerState()
+        return state
+
+    # -------------------------------------------------------------------------
+    # Reader side
+    # -------------------------------------------------------------------------
+
+    def pick_owner(self, rng: random.Random | None = None) -> Optional[tuple[str, int]]:
+        """
+        Pick an owner that can be checked right now.
+
+        Returns:
+            (owner, generation) or None if no owner is quiescent. The generation
+            must be passed to `check` to detect writes that raced with the query.
+        """
+        rng = rng or random.Random()
+        with self._lock:
+            candidates = [
+                (owner, state.generation)
+                for owner, state in self._owners.items()
+                if state.keys and not state.tainted and state.in_flight == 0
+            ]
+        return rng.choice(candidates) if candidates else None
+
+    def check(
+        self,
+        owner: str,
+        generation: int,
+        expr: Any,
+        block: int,
+        returned: Iterable[tuple[Any, Optional[int]]],
+    ) -> Optional[OracleResult]:
+        """
+        Compare a query result against the index.
+
+        Args:
+            owner: Owner the query was scoped to
+            generation: Owner generation returned by `pick_owner`
+            expr: Query expression with a `matches(attributes)` method
+            block: Block number the node evaluated the query at
+            returned: (entity key, created-at block or None) pairs returned by the node
+
+        Returns:
+            OracleResult, or None if the owner was written to while the query ran
+        """
+        with self._lock:
+            state = self._owner(owner)
+            if state.tainted or state.in_flight or state.generation != generation:
+                return None
+
+            candidates = self._candidates(state.keys, expr)
+            expected: set[str] = set()
+            uncertain: set[str] = set()
+            for key in candidates:
+                version = self._version_at(key, block)
+                if version is None or version.attributes is None:
+                    continue
+                if abs(version.expiration_block - block) <= EXPIRATION_GRACE_BLOCKS:
+                    uncertain.add(key)
+                elif block < version.expiration_block and expr.matches(version.attributes):
+                    expected.add(key)
+
+            returned_keys: set[str] = set()
+            for key, created_at_block in returned:
+                key = normalize_key(key)
+                # Entities from before tracking started (e.g. an earlier run) are unknown
+                if key not in state.keys and created_at_block is not None and self.start_block is not None:
+                    if created_at_block < self.start_block:
+                        continue
+                returned_keys.add(key)
+
+        return OracleResult(
+            expected=len(expected),
+            returned=len(returned_keys),
+            missing=expected - returned_keys - uncertain,
+            unexpected=returned_keys - expected - uncertain,
+        )
+
+    def _candidates(self, keys: set[str], expr: Any) -> set[str]:
+        # Narrow down by top-level equality terms of a conjunction using the postings
+        candidates = keys
+        if getattr(expr, "op", None) != "&&":
+            return candidates
+        for child in expr.children:
+            if getattr(child, "op", None) == "=" and hasattr(child, "attr"):
+                posting = self._postings.get((child.attr, child.value), set())
+                candidates = candidates & posting if len(posting) < len(candidates) else posting & candidates
+        return candidates
+
+    def _version_at(self, key: str, block: int) -> Optional[EntityVersion]:
+        current = None
+        for version in self._versions.get(key, ()):
+            if version.block > block:
+                break
+            current = version
+        return current
+
+    def purge_expired(self, head_block: int) -> int:
+        """
+        Drop entities that expired before `head_block`, unless the last purge is
+        less than PURGE_INTERVAL_BLOCKS blocks ago. Returns the number of dropped entities.
+        """
+        with self._lock:
+            if head_block < self._purged_at + PURGE_INTERVAL_BLOCKS:
+                return 0
+            self._purged_at = head_block
+            expired = [
+                key
+                for key, versions in self._versions.items()
+                if versions[-1].expiration_block + EXPIRATION_GRACE_BLOCKS < head_block
+            ]
+            for key in expired:
+                for version in self._versions.pop(key):
+                    for attr_value in (version.attributes or {}).items():
+                        posting = self._postings.get(attr_value)
+                        if posting is not None:
+                            posting.discard(key)
+                            if not posting:
+                                del self._postings[attr_value]
+                owner = self._owner_of.pop(key, None)
+                if owner is not None:
+                    self._owner(owner).keys.discard(key)
+        return len(expired)
@@ -1,30 +1,134 @@
+"""
+Scans the balances of the load test accounts and reports the underfunded ones.
+
+Balances are fetched with JSON-RPC batches of eth_getBalance, a bounded
+number of batches in flight at a time, across instance and user index
+ranges. The JSON report lists every account below --min-balance (and the
+ones whose balance could not be read) and is consumed by the topup tool:
+
+    python -m stress.tools.testnet_balance_checker --instances 0-49 --users 50 --output underfunded.json
+    python -m stress.tools.testnet_topup --report underfunded.json
+
+Without --instances, the accounts of this instance (INSTANCE_INDEX or the
+hostname, see `build_account_path`) are scanned. Exits with status 1 when
+accounts are underfunded.
+"""
+
+import argparse
+import json
 import logging
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Optional
 
 file_dir = Path(__file__).resolve().parent
 project_root = file_dir.parent.parent  # Go up from tools/ to stress/ to stress-tests/
 if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
-from web3 import Account, Web3
-from eth_account.signers.local import LocalAccount
-import web3
+import requests
+from web3 import Web3
 
 import stress.tools.config as config
-from stress.tools.utils import build_account_path
-
-logging.basicConfig(level=logging.INFO)
-Account.enable_unaudited_hdwallet_features()
-
-w3: Web3 = Web3(web3.HTTPProvider(endpoint_uri=config.host))
-
-if w3.is_connected():
-    for i in range(config.users):
-        account_path = build_account_path(i)
-        account = Account.from_mnemonic(config.mnemonic, account_path=account_path)
-        balance = w3.eth.get_balance(account.address)
-        logging.info(f"Account {i + 1}: {account.address} balance: {balance}")
-else:
-    logging.error("Not connected to Golem Base")
-    raise Exception("Not connected to Golem Base")
+from stress.tools.account_registry import AccountRegistry
+from stress.tools.tx_pipeline import RpcError, rpc_batch
+from stress.tools.utils import account_paths, parse_instances
+
+# eth_getBalance calls per JSON-RPC batch, and batches in flight
+BALANCE_BATCH_SIZE = 100
+BALANCE_CONCURRENCY = 4
+
+
+def scan_balances(
+    url: str,
+    addresses: list[str],
+    batch_size: int = BALANCE_BATCH_SIZE,
+    concurrency: int = BALANCE_CONCURRENCY,
+    session: Optional[requests.Session] = None,
+) -> dict[str, Optional[int]]:
+    """Latest balances of addresses in wei (None where the call failed)."""
+    session = session or requests.Session()
+    chunks = [addresses[start:start + batch_size] for start in range(0, len(addresses), batch_size)]
+
+    def fetch(chunk: list[str]) -> list[Optional[int]]:
+        try:
+            results = rpc_batch(session, url, [("eth_getBalance", [address, "latest"]) for address in chunk])
+        except (RpcError, requests.RequestException, ValueError) as e:
+            logging.error("Balance batch of %s accounts failed: %s", len(chunk), e)
+            return [None] * len(chunk)
+        return [int(result, 16) if result is not None else None for result, error in results]
+
+    balances = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for chunk, chunk_balances in zip(chunks, pool.map(fetch, chunks)):
+            balances.update(zip(chunk, chunk_balances))
+    return balances
+
+
+def build_report(host: str, min_balance: int, accounts: list[tuple[str, str]], balances: dict[str, Optional[int]]) -> dict:
+    """Report of the (path, address) accounts below `min_balance` wei or with an unknown balance."""
+    underfunded = []
+    for path, address in accounts:
+        balance = balances.get(address)
+        if balance is None or balance < min_balance:
+            instance, user = path.split("/")[3].rstrip("'"), path.split("/")[5]
+            underfunded.append(
+                {"instance": int(instance), "user": int(user), "path": path, "address": address, "balance": balance}
+            )
+    return {
+        "host": host,
+        "scanned_at": time.time(),
+        "min_balance": min_balance,
+        "accounts": len(accounts),
+        "unknown": sum(1 for item in underfunded if item["balance"] is None),
+        "underfunded": underfunded,
+    }
+
+
+def load_report(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Report the load test accounts below a minimum balance.")
+    parser.add_argument("--instances", help="Instance indexes, e.g. 0-49 (default: this instance)")
+    parser.add_argument("--users", type=int, default=config.users, help="Accounts per instance (default: %(default)s)")
+    parser.add_argument("--min-balance", type=float, default=0.005,
+                        help="Minimum balance in ETH (default: %(default)s)")
+    parser.add_argument("--host", default=config.host, help="JSON-RPC endpoint (default: %(default)s)")
+    parser.add_argument("--batch-size", type=int, default=BALANCE_BATCH_SIZE,
+                        help="eth_getBalance calls per batch (default: %(default)s)")
+    parser.add_argument("--concurrency", type=int, default=BALANCE_CONCURRENCY,
+                        help="Batches in flight (default: %(default)s)")
+    parser.add_argument("--output", default="-", help="Report file, - for stdout (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    instances = parse_instances(args.instances) if args.instances else None
+    registry = AccountRegistry.get()
+    accounts = [(path, registry.account_at(path).address) for path in account_paths(instances, args.users)]
+    registry.save()
+
+    start = time.monotonic()
+    balances = scan_balances(args.host, [address for _, address in accounts], args.batch_size, args.concurrency)
+    report = build_report(args.host, Web3.to_wei(args.min_balance, "ether"), accounts, balances)
+    logging.info(
+        "Scanned %s accounts in %.1fs: %s below %s ETH (%s unknown)",
+        len(accounts), time.monotonic() - start, len(report["underfunded"]), args.min_balance, report["unknown"],
+    )
+
+    if args.output == "-":
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        logging.info("Report written to %s", args.output)
+    return 1 if report["underfunded"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
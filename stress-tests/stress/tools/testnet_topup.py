@@ -1,25 +1,54 @@
+"""
+Tops up the load test accounts on the testnet through the L2 -> L3 bridge.
+
+Founder nonces are assigned locally and all `bridgeETHTo` deposits are signed
+up front; they are submitted in a window of unconfirmed transactions and
+confirmed with batched receipt lookups (see stress.tools.tx_pipeline).
+Accounts whose L3 balance is already at the target are skipped.
+
+Progress is written to a state file after every batch: running the tool
+again with the same state file resumes, confirming or resubmitting the
+deposits of the interrupted run instead of funding those accounts twice.
+Accounts whose deposit was confirmed less than --credit-blocks L2 blocks ago
+are skipped too (the bridge may not have credited L3 yet); for older deposits
+the L3 balance decides, so the state file can be kept across test runs.
+
+Usage (from stress-tests/):
+    python -m stress.tools.testnet_topup [--instances 0-49] [--users 50] [--amount 0.01] [--target 0.01]
+                                         [--window 64] [--state topup-state.json] [--dry-run]
+    python -m stress.tools.testnet_topup --report underfunded.json
+
+Without --instances, the accounts of this instance (INSTANCE_INDEX or the
+hostname, see `build_account_path`) are topped up. With --report, the
+underfunded accounts of a stress.tools.testnet_balance_checker report are.
+"""
+
+import argparse
+import json
 import logging
+import os
 import sys
 from pathlib import Path
+from typing import Optional
 
 file_dir = Path(__file__).resolve().parent
 project_root = file_dir.parent.parent  # Go up from tools/ to stress/ to stress-tests/
 if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
-from web3 import Account, Web3
+import requests
+from eth_account import Account
 from eth_account.signers.local import LocalAccount
-import web3
-import config
+from web3 import Web3
 
-from stress.tools.utils import build_account_path
-
-logging.basicConfig(level=logging.ERROR)
-Account.enable_unaudited_hdwallet_features()
+import stress.tools.config as config
+from stress.tools.account_registry import AccountRegistry
+from stress.tools.testnet_balance_checker import load_report, scan_balances
+from stress.tools.tx_pipeline import CONFIRMED, FAILED, SENT, SIGNED, PendingTx, RpcError, TxPipeline, rpc_batch
+from stress.tools.utils import account_paths, parse_instances
 
 golembase_l2_host = "https://l2.hoodi.arkiv.network/rpc"
 golembase_l2_chain_id = 393530
-golembase_l3_bridge_address = config.l3_bridge_address
 deposit_abi = [
     {"type": "constructor", "inputs": [], "stateMutability": "nonpayable"},
     {"type": "receive", "stateMutability": "payable"},
@@ -599,42 +628,183 @@ deposit_abi = [
 ]
 
 
-w3: Web3 = Web3(web3.HTTPProvider(endpoint_uri=golembase_l2_host))
-founder_account: LocalAccount = Account.from_key(config.founder_key)
+# Deposit transaction parameters
+DEPOSIT_MIN_GAS_LIMIT = 200000
+DEPOSIT_GAS = 2000000
+DEPOSIT_MAX_FEE_PER_GAS = 2000000000
+DEPOSIT_MAX_PRIORITY_FEE_PER_GAS = 1000000000
 
-if w3.is_connected():
-    logging.info(
-        f"Connected to GolemBase.\nFounder account: {founder_account.address}, balance: {w3.eth.get_balance(founder_account.address)}"
+# L2 blocks after which a confirmed deposit is expected to be credited on L3
+BRIDGE_CREDIT_BLOCKS = 300
+
+class TopupState:
+    """Resume state: the deposits of previous runs, keyed by recipient address."""
+
+    def __init__(self, path: str, founder: str):
+        self.path = path
+        self.founder = founder
+        self.txs: dict[str, PendingTx] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            if data.get("founder") != founder:
+                raise ValueError(f"State file {path} belongs to founder {data.get('founder')}, not {founder}")
+            for item in data["txs"]:
+                self.txs[item["key"]] = PendingTx(**item)
+
+    def save(self, txs: Optional[list[PendingTx]] = None):
+        for tx in txs or []:
+            self.txs[tx.key] = tx
+        data = {"founder": self.founder, "txs": [{**tx.to_dict(), "raw": tx.raw} for tx in self.txs.values()]}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+
+def reconcile(session: requests.Session, url: str, state: TopupState, founder: str) -> tuple[list[PendingTx], int]:
+    """
+    Bring the deposits of an interrupted run up to date.
+
+    Returns the deposits to submit or confirm again, and the next free founder nonce.
+    Deposits still without receipt are resubmitted as they are (same nonce and hash:
+    the node ignores the ones it still has); deposits whose nonce was used by
+    another transaction are dropped from the state, so their accounts get a new one.
+    """
+    unfinished = [tx for tx in state.txs.values() if tx.status in (SIGNED, SENT)]
+    (latest, _), (pending, _) = rpc_batch(
+        session, url, [("eth_getTransactionCount", [founder, "latest"]), ("eth_getTransactionCount", [founder, "pending"])]
     )
-    contract = w3.eth.contract(address=golembase_l3_bridge_address, abi=deposit_abi)
+    latest, pending = int(latest, 16), int(pending, 16)
+    results = rpc_batch(session, url, [("eth_getTransactionReceipt", [tx.tx_hash]) for tx in unfinished])
+    resume = []
+    for tx, (receipt, error) in zip(unfinished, results):
+        if receipt is not None:
+            tx.status = CONFIRMED if int(receipt["status"], 16) == 1 else FAILED
+            tx.block_number = int(receipt["blockNumber"], 16)
+        elif tx.nonce < latest:
+            logging.warning("Nonce %s of the deposit to %s was used by another transaction", tx.nonce, tx.key)
+            del state.txs[tx.key]
+        else:
+            tx.status = SIGNED
+            resume.append(tx)
+    next_nonce = max([pending] + [tx.nonce + 1 for tx in resume])
+    return resume, next_nonce
 
-    for i in range(config.users):
-        account_path = build_account_path(i)
-        account = Account.from_mnemonic(config.mnemonic, account_path=account_path)
-        logging.error(
-            f"Topping up account {i + 1}: {account.address} {account.key.hex()}"
-        )
-        nonce = w3.eth.get_transaction_count(founder_account.address)
 
-        deposit_tx = contract.functions.bridgeETHTo(
-            account.address,
-            200000,
-            b"",
-        ).build_transaction(
-            {
-                "from": founder_account.address,
-                "value": Web3.to_wei(0.01, "ether"),
+def awaiting_credit(tx: PendingTx, head_block: int, credit_blocks: int) -> bool:
+    """Whether the deposit is in flight, or confirmed too recently for its L3 credit to show."""
+    if tx.status in (SIGNED, SENT):
+        return True
+    return tx.status == CONFIRMED and (tx.block_number is None or head_block - tx.block_number < credit_blocks)
+
+
+def sign_deposits(
+    founder: LocalAccount, recipients: list[str], first_nonce: int, value: int, chain_id: int, bridge: str
+) -> list[PendingTx]:
+    """Sign one bridgeETHTo deposit per recipient, with consecutive founder nonces."""
+    contract = Web3().eth.contract(address=Web3.to_checksum_address(bridge), abi=deposit_abi)
+    txs = []
+    for nonce, recipient in enumerate(recipients, start=first_nonce):
+        signed = founder.sign_transaction(
+            {
+                "to": contract.address,
+                "data": contract.encode_abi("bridgeETHTo", args=[recipient, DEPOSIT_MIN_GAS_LIMIT, b""]),
+                "value": value,
                 "nonce": nonce,
-                "gas": 2000000,
-                "maxFeePerGas": 2000000000,
-                "maxPriorityFeePerGas": 1000000000,
+                "gas": DEPOSIT_GAS,
+                "maxFeePerGas": DEPOSIT_MAX_FEE_PER_GAS,
+                "maxPriorityFeePerGas": DEPOSIT_MAX_PRIORITY_FEE_PER_GAS,
+                "chainId": chain_id,
             }
         )
-        signed_tx = founder_account.sign_transaction(deposit_tx)
-        tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-        logging.info(f"Transaction hash: {tx_hash.hex()}")
-        w3.eth.wait_for_transaction_receipt(tx_hash)
-        logging.info(f"Transaction receipt: {w3.eth.get_transaction_receipt(tx_hash)}")
-else:
-    logging.error("Not connected to Golem Base")
-    raise Exception("Not connected to Golem Base")
+        txs.append(PendingTx(recipient, nonce, "0x" + signed.raw_transaction.hex(), "0x" + signed.hash.hex()))
+    return txs
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Top up the load test accounts through the L2 -> L3 bridge.")
+    parser.add_argument("--instances", help="Instance indexes, e.g. 0-49 (default: this instance)")
+    parser.add_argument("--users", type=int, default=config.users, help="Accounts per instance (default: %(default)s)")
+    parser.add_argument("--amount", type=float, default=0.01, help="ETH deposited per account (default: %(default)s)")
+    parser.add_argument("--target", type=float, default=None,
+                        help="Skip accounts whose L3 balance is at least this many ETH (default: --amount)")
+    parser.add_argument("--report", help="Top up the underfunded accounts of a balance checker report "
+                                         "instead of scanning --instances/--users")
+    parser.add_argument("--window", type=int, default=64, help="Unconfirmed deposits in flight (default: %(default)s)")
+    parser.add_argument("--state", default="topup-state.json", help="Resume state file (default: %(default)s)")
+    parser.add_argument("--credit-blocks", type=int, default=BRIDGE_CREDIT_BLOCKS,
+                        help="L2 blocks a confirmed deposit takes to show on L3 (default: %(default)s)")
+    parser.add_argument("--l2-host", default=golembase_l2_host, help="L2 JSON-RPC endpoint (default: %(default)s)")
+    parser.add_argument("--l3-host", default=config.host, help="L3 JSON-RPC endpoint (default: %(default)s)")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be topped up")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    if not config.founder_key:
+        parser.error("FOUNDER_KEY is not set")
+    founder: LocalAccount = Account.from_key(config.founder_key)
+    value = Web3.to_wei(args.amount, "ether")
+    target = Web3.to_wei(args.target if args.target is not None else args.amount, "ether")
+
+    session = requests.Session()
+    state = TopupState(args.state, founder.address)
+    resume, next_nonce = reconcile(session, args.l2_host, state, founder.address)
+
+    if args.report:
+        # The report already lists the accounts below the target
+        addresses = [item["address"] for item in load_report(args.report)["underfunded"]]
+    else:
+        registry = AccountRegistry.get()
+        instances = parse_instances(args.instances) if args.instances else None
+        addresses = [registry.account_at(path).address for path in account_paths(instances, args.users)]
+        registry.save()
+
+    # Accounts with a deposit in flight or not credited yet are not funded again; otherwise the balance decides
+    (head_block, _), = rpc_batch(session, args.l2_host, [("eth_blockNumber", [])])
+    handled = {
+        address for address, tx in state.txs.items() if awaiting_credit(tx, int(head_block, 16), args.credit_blocks)
+    }
+    candidates = [address for address in addresses if address not in handled]
+    if args.report:
+        recipients = candidates
+    else:
+        balances = scan_balances(args.l3_host, candidates, session=session)
+        recipients = [address for address in candidates if balances[address] is None or balances[address] < target]
+    logging.info(
+        "%s accounts: %s with a deposit awaiting credit, %s at the target balance, %s to top up, %s to resume",
+        len(addresses), len(addresses) - len(candidates), len(candidates) - len(recipients), len(recipients),
+        len(resume),
+    )
+
+    (founder_balance, _), (chain_id, _) = rpc_batch(
+        session, args.l2_host, [("eth_getBalance", [founder.address, "latest"]), ("eth_chainId", [])]
+    )
+    required = (len(recipients) + len(resume)) * (value + DEPOSIT_GAS * DEPOSIT_MAX_FEE_PER_GAS)
+    logging.info(
+        "Founder %s: balance %s ETH, up to %s ETH required",
+        founder.address, Web3.from_wei(int(founder_balance, 16), "ether"), Web3.from_wei(required, "ether"),
+    )
+    if int(founder_balance, 16) < required:
+        logging.error("Founder balance is too low for all deposits")
+        return 1
+    if args.dry_run or not (recipients or resume):
+        return 0
+
+    txs = resume + sign_deposits(founder, recipients, next_nonce, value, int(chain_id, 16), config.l3_bridge_address)
+    state.save(txs)
+    logging.info("Submitting %s deposits (nonces %s..%s)", len(txs), txs[0].nonce, txs[-1].nonce)
+
+    pipeline = TxPipeline(args.l2_host, window=args.window, session=session, on_update=state.save)
+    try:
+        pipeline.run(txs)
+    except (RpcError, TimeoutError) as e:
+        logging.error("%s; progress is saved in %s, run again to resume", e, args.state)
+        return 1
+    failed = [tx for tx in txs if tx.status == FAILED]
+    logging.info("%s deposits confirmed, %s failed", len(txs) - len(failed), len(failed))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""
+Pipelined submission of pre-signed transactions.
+
+Tools that send many transactions from one account (topup, prefunding,
+seeding) assign nonces locally and sign everything up front; `TxPipeline`
+then submits the raw transactions in nonce order, keeping at most `window`
+of them unconfirmed, and confirms them with one JSON-RPC batch of receipt
+lookups per poll instead of one blocking `wait_for_transaction_receipt` per
+transaction.
+
+Progress is reported through `on_update(txs)` after every submitted batch
+and every poll that confirmed transactions, so callers can persist a resume
+state.
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+import requests
+
+# Transaction states
+SIGNED = "signed"
+SENT = "sent"
+CONFIRMED = "confirmed"
+FAILED = "failed"  # mined with status 0
+
+# Send errors meaning the node already has the transaction
+_ALREADY_KNOWN = ("already known", "known transaction", "already imported")
+
+
+class RpcError(Exception):
+    pass
+
+
+def rpc_batch(
+    session: requests.Session, url: str, calls: list[tuple[str, list]], timeout: float = 60
+) -> list[tuple[Any, Optional[dict]]]:
+    """Send calls as one JSON-RPC batch; returns (result, error) per call, in call order."""
+    if not calls:
+        return []
+    payload = [{"jsonrpc": "2.0", "id": i, "method": method, "params": params} for i, (method, params) in
+               enumerate(calls)]
+    response = session.post(url, json=payload, timeout=timeout)
+    response.raise_for_status()
+    items = response.json()
+    if not isinstance(items, list):
+        # The whole batch was rejected (e.g. batch size limit)
+        raise RpcError(f"Batch of {len(calls)} calls rejected: {items.get('error', items)}")
+    results: list[tuple[Any, Optional[dict]]] = [(None, {"message": "missing from batch response"})] * len(calls)
+    for item in items:
+        results[item["id"]] = (item.get("result"), item.get("error"))
+    return results
+
+
+@dataclass
+class PendingTx:
+    """A signed transaction and its progress."""
+
+    key: str  # caller's identifier, e.g. the recipient
+    nonce: int
+    raw: str  # 0x-prefixed signed transaction
+    tx_hash: str
+    status: str = SIGNED
+    block_number: Optional[int] = None
+    logs: Optional[list[dict]] = None  # receipt logs, once mined
+
+    def to_dict(self) -> dict:
+        return {
+            "key": self.key,
+            "nonce": self.nonce,
+            "tx_hash": self.tx_hash,
+            "status": self.status,
+            "block_number": self.block_number,
+        }
+
+
+class TxPipeline:
+    """Submits pre-signed transactions in a window and confirms their receipts in bulk."""
+
+    def __init__(
+        self,
+        url: str,
+        window: int = 64,
+        poll_interval: float = 1.0,
+        stall_timeout: float = 300.0,
+        session: Optional[requests.Session] = None,
+        on_update: Optional[Callable[[list[PendingTx]], None]] = None,
+    ):
+        self.url = url
+        self.window = window
+        self.poll_interval = poll_interval
+        self.stall_timeout = stall_timeout
+        self.session = session or requests.Session()
+        self.on_update = on_update or (lambda txs: None)
+
+    def _send(self, txs: list[PendingTx]) -> Optional[str]:
+        """Submit txs as one batch; returns the first unrecoverable error (later txs are not marked sent)."""
+        results = rpc_batch(self.session, self.url, [("eth_sendRawTransaction", [tx.raw]) for tx in txs])
+        for tx, (result, error) in zip(txs, results):
+            if error is not None and not any(known in str(error.get("message", "")).lower()
+                                             for known in _ALREADY_KNOWN):
+                return f"nonce {tx.nonce} ({tx.key}): {error.get('message', error)}"
+            tx.status = SENT
+        return None
+
+    def _confirm(self, txs: list[PendingTx]) -> list[PendingTx]:
+        """Look up the receipts of txs in one batch; returns the confirmed (or failed) ones."""
+        results = rpc_batch(self.session, self.url, [("eth_getTransactionReceipt", [tx.tx_hash]) for tx in txs])
+        done = []
+        for tx, (receipt, error) in zip(txs, results):
+            if receipt is None:
+                continue
+            tx.status = CONFIRMED if int(receipt["status"], 16) == 1 else FAILED
+            tx.block_number = int(receipt["blockNumber"], 16)
+            tx.logs = receipt.get("logs")
+            done.append(tx)
+        return done
+
+    def run(self, txs: list[PendingTx]) -> list[PendingTx]:
+        """
+        Submit and confirm txs (already SENT ones are only confirmed); returns them.
+
+        Raises RpcError when a submission fails (the later transactions are not
+        sent: their nonces would not be minable) and TimeoutError when no
+        transaction got confirmed for `stall_timeout` seconds.
+        """
+        queue = sorted((tx for tx in txs if tx.status == SIGNED), key=lambda tx: tx.nonce)
+        in_flight = [tx for tx in txs if tx.status == SENT]
+        error = None
+        last_progress = time.monotonic()
+        while in_flight or (queue and error is None):
+            if queue and error is None and len(in_flight) < self.window:
+                batch, queue = queue[: self.window - len(in_flight)], queue[self.window - len(in_flight):]
+                error = self._send(batch)
+                in_flight.extend(tx for tx in batch if tx.status == SENT)
+                self.on_update(txs)
+                if error is not None:
+                    logging.error("TxPipeline: submission stopped at %s", error)
+                    continue
+
+            time.sleep(self.poll_interval)
+            done = self._confirm(in_flight)
+            if done:
+                last_progress = time.monotonic()
+                in_flight = [tx for tx in in_flight if tx.status == SENT]
+                self.on_update(txs)
+                failed = sum(1 for tx in done if tx.status == FAILED)
+                logging.info(
+                    "TxPipeline: %s confirmed (%s failed), %s in flight, %s queued",
+                    len(done), failed, len(in_flight), len(queue),
+                )
+            elif time.monotonic() - last_progress > self.stall_timeout:
+                raise TimeoutError(
+                    f"No transaction confirmed for {self.stall_timeout:.0f}s ({len(in_flight)} in flight, "
+                    f"first nonce {min(tx.nonce for tx in in_flight)})"
+                )
+        if error is not None:
+            raise RpcError(f"Submission failed at {error}")
+        return txs
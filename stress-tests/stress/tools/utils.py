@@ -7,6 +7,14 @@ from eth_account.signers.local import LocalAccount
 from testcontainers.core.container import DockerContainer
 from testcontainers.core.waiting_utils import wait_for_logs
 
+# Mount point of a host datadir in the node container
+CONTAINER_DATADIR = "/datadir"
+
+
+def account_path(instance_index: int, user_index: int) -> str:
+    """Account path of user `user_index` on load generator instance `instance_index`."""
+    return f"m/44'/60'/{instance_index}'/0/{user_index}"
+
 
 def build_account_path(user_index: int) -> str:
     """
@@ -27,7 +35,7 @@ def build_account_path(user_index: int) -> str:
     """
     instance_index = int(os.getenv("INSTANCE_INDEX", "-1"))
     if instance_index != -1:
-        return f"m/44'/60'/{instance_index}'/0/{user_index}"
+        return account_path(instance_index, user_index)
 
 
     instance_name = socket.gethostname()
@@ -51,15 +59,36 @@ def build_account_path(user_index: int) -> str:
                 f"Cannot extract index from instance name: {instance_name}"
             ) from None
 
+    return account_path(instance_index, user_index)
+
+
+def parse_instances(spec: str) -> list[int]:
+    """Instance indexes from "3", "0-49" or "0,2,5-7"."""
+    instances = []
+    for part in spec.split(","):
+        first, _, last = part.partition("-")
+        instances.extend(range(int(first), int(last or first) + 1))
+    return instances
+
+
+def account_paths(instances: list[int] | None, users: int) -> list[str]:
+    """Account paths of `users` users on each of `instances` (None: this instance, see build_account_path)."""
+    if instances is None:
+        return [build_account_path(user_index) for user_index in range(users)]
+    return [account_path(instance, user_index) for instance in instances for user_index in range(users)]
+
 
-def launch_image(image_to_run: str):
+def launch_image(image_to_run: str, datadir: str | None = None):
+    """Start the node in dev mode; with `datadir`, on that (host) datadir and the chain it holds."""
     port = 8545
+    datadir_args = ["--datadir", CONTAINER_DATADIR] if datadir else []
     golem_base = (
         DockerContainer(image_to_run)
         .with_bind_ports(port, port)
         .with_command(
             [
                 "--dev",
+                *datadir_args,
                 "--http",
                 "--http.api",
                 "eth,web3,net,debug,golembase",
@@ -81,6 +110,8 @@ def launch_image(image_to_run: str):
             ]
         )
     )
+    if datadir:
+        golem_base = golem_base.with_volume_mapping(datadir, CONTAINER_DATADIR, "rw")
     golem_base.start()
     wait_for_logs(golem_base, "HTTP server started")
     return golem_base
@@ -0,0 +1,232 @@
+"""
+Read-your-writes visibility probe.
+
+A probe creates one entity carrying a unique `probeId` attribute, then polls
+both `query_entities` (by `probeId`) and `get_entity` (by key) with backoff
+until each path returns the entity. The time from submitting the transaction
+and from receiving its receipt to visibility is recorded per path.
+
+Probed entities are then handed to the process-wide `ExpiryWatcher`, which
+checks that they disappear once their expiration block has been reached.
+"""
+
+import logging
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Optional
+
+import web3
+from arkiv import Arkiv
+from arkiv.types import KEY, Operations
+from arkiv.utils import to_create_op, to_query_options, to_receipt, to_tx_params
+from locust import events
+
+from stress.tools.metrics import Metrics
+
+PROBE_ENTITY_TYPE = "VisibilityProbe"
+
+# Give up waiting for visibility (or disappearance) after this many seconds
+PROBE_TIMEOUT = float(os.getenv("VISIBILITY_PROBE_TIMEOUT_SEC", "60"))
+
+# Polling backoff: starts at the initial delay and doubles up to the maximum
+PROBE_INITIAL_BACKOFF = 0.05
+PROBE_MAX_BACKOFF = 1.0
+
+# Probes should expire during the test so disappearance can be confirmed
+PROBE_EXPIRATION_TIME: timedelta = timedelta(seconds=float(os.getenv("VISIBILITY_PROBE_EXPIRATION_SEC", 60)))
+
+PATHS = ("query", "get_entity")
+
+
+@dataclass
+class ProbeResult:
+    """Timings of a single visibility probe (seconds, relative to submission)."""
+    key: str
+    receipt_block: int
+    expiration_block: int
+    receipt_after: float
+    visible_after: dict[str, Optional[float]] = field(default_factory=dict)
+
+
+def _fire(name: str, response_time_ms: float, exception: Optional[Exception] = None) -> None:
+    events.request.fire(
+        request_type="probe",
+        name=name,
+        response_time=response_time_ms,
+        response_length=0,
+        exception=exception,
+        context={},
+        response=None,
+    )
+
+
+def _is_visible(w3: Arkiv, path: str, key: str, probe_id: str) -> bool:
+    if path == "query":
+        page = w3.arkiv.query_entities_page(
+            f'probeId="{probe_id}" && ArkivEntityType="{PROBE_ENTITY_TYPE}"',
+            options=to_query_options(fields=KEY),
+        )
+        return any(str(entity.key).lower() == key for entity in page.entities)
+    try:
+        w3.arkiv.get_entity(key, fields=KEY)
+        return True
+    except ValueError:
+        # get_entity raises ValueError when the query returns no entity
+        return False
+
+
+def run_probe(w3: Arkiv, expires_in: int, timeout: float = PROBE_TIMEOUT) -> ProbeResult:
+    """
+    Create a probe entity and wait until it is visible through all read paths.
+
+    Args:
+        w3: Arkiv client with a funded account
+        expires_in: Expiration of the probe entity in seconds
+        timeout: Seconds to wait for visibility after the receipt
+
+    Returns:
+        ProbeResult; paths that never became visible have None timings
+    """
+    probe_id = str(uuid.uuid4())
+    create_op = to_create_op(
+        payload=b"probe",
+        content_type="text/plain",
+        attributes={"ArkivEntityType": PROBE_ENTITY_TYPE, "probeId": probe_id},
+        expires_in=expires_in,
+    )
+    tx_params = to_tx_params(Operations(creates=[create_op]))
+
+    submitted_at = time.perf_counter()
+    tx_hash = w3.eth.send_transaction(tx_params)
+    tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+    receipt_after = time.perf_counter() - submitted_at
+
+    receipt = to_receipt(w3.arkiv.contract, tx_receipt["transactionHash"], tx_receipt)
+    created = receipt.creates[0]
+    result = ProbeResult(
+        key=str(created.key).lower(),
+        receipt_block=receipt.block_number,
+        expiration_block=created.expiration_block,
+        receipt_after=receipt_after,
+        visible_after={path: None for path in PATHS},
+    )
+
+    metrics = Metrics.get_metrics()
+    backoff = PROBE_INITIAL_BACKOFF
+    deadline = time.perf_counter() + timeout
+    pending = list(PATHS)
+    while pending:
+        for path in list(pending):
+            if _is_visible(w3, path, result.key, probe_id):
+                visible_after = time.perf_counter() - submitted_at
+                result.visible_after[path] = visible_after
+                pending.remove(path)
+                metrics.record_visibility(
+                    path,
+                    timedelta(seconds=visible_after),
+                    timedelta(seconds=visible_after - receipt_after),
+                )
+                _fire(f"visibility[{path}]", (visible_after - receipt_after) * 1000)
+        if not pending:
+            break
+        if time.perf_counter() >= deadline:
+            for path in pending:
+                metrics.record_probe_outcome("timeout")
+                _fire(
+                    f"visibility[{path}]",
+                    timeout * 1000,
+                    TimeoutError(f"Entity {result.key} not visible via {path} after {timeout}s"),
+                )
+            return result
+        time.sleep(backoff)
+        backoff = min(backoff * 2, PROBE_MAX_BACKOFF)
+
+    metrics.record_probe_outcome("visible")
+    return result
+
+
+class ExpiryWatcher:
+    """Background thread that confirms probe entities disappear after their expiration block."""
+
+    instance = None
+
+    @classmethod
+    def get(cls, host: str, block_duration: int) -> "ExpiryWatcher":
+        """Get the process-wide watcher, starting it on first use."""
+        if cls.instance is None:
+            cls.instance = cls(host, block_duration)
+        cls.instance.start()
+        return cls.instance
+
+    def __init__(self, host: str, block_duration: int):
+        self.host = host
+        self.block_duration = block_duration
+        self._pending: list[ProbeResult] = []
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def watch(self, probe: ProbeResult) -> None:
+        """Check that `probe` disappears once its expiration block is reached."""
+        with self._lock:
+            self._pending.append(probe)
+
+    def _check_loop(self):
+        w3 = Arkiv(web3.HTTPProvider(endpoint_uri=self.host))
+        while not self._stop_event.wait(self.block_duration):
+            with self._lock:
+                if not self._pending:
+                    continue
+                due = list(self._pending)
+            try:
+                head = w3.eth.block_number
+            except Exception as e:
+                logging.error("ExpiryWatcher: error fetching block number: %s", e)
+                continue
+
+            for probe in due:
+                if head < probe.expiration_block:
+                    continue
+                try:
+                    gone = not _is_visible(w3, "get_entity", probe.key, "")
+                except Exception as e:
+                    logging.error("ExpiryWatcher: error checking entity %s: %s", probe.key, e)
+                    continue
+
+                lag_blocks = head - probe.expiration_block
+                timed_out = lag_blocks * self.block_duration > PROBE_TIMEOUT
+                if gone or timed_out:
+                    with self._lock:
+                        if probe in self._pending:
+                            self._pending.remove(probe)
+                    Metrics.get_metrics().record_expiry(lag_blocks, gone)
+                    _fire(
+                        "expiry[get_entity]",
+                        lag_blocks * self.block_duration * 1000,
+                        None if gone else TimeoutError(
+                            f"Entity {probe.key} still visible {lag_blocks} blocks after expiration"
+                        ),
+                    )
+
+    def start(self):
+        """Start the background thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._check_loop, daemon=True)
+        self._thread.start()
+        logging.info("ExpiryWatcher: Started background thread")
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the background thread; probes still pending are dropped."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._stop_event.set()
+        self._thread.join(timeout=timeout)
+        self._thread = None
+        with self._lock:
+            self._pending.clear()